@@ -1,25 +1,26 @@
 from __future__ import annotations
 
+import asyncio
 import uuid
 from datetime import datetime
 import os
 
-import redis.asyncio as aioredis
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import ValidationError
-from sqlalchemy import select
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import deps
 from app.api import schemas
 from app.api.auth import verify_internal_token
 from app.config import Settings
-from app.db import models
-from app.metrics import alerts_received
+from app.metrics import alerts_duplicate, alerts_received
+from app.services.dedupe import SeenAlertFilter
+from app.services.health import HealthProber
+from app.services.ingest import AlertIngestor, TradeDispatcher
 from app.services.reporting import daily_pnl_report
 from app.utils.crypto import verify_hmac
-from app.workers.tasks import enqueue_trade_task
+from app.utils.serialization import loads
+from app.workers.tasks import enqueue_trade_task, send_trade_batches
 
 router = APIRouter()
 
@@ -44,10 +45,46 @@ async def _verify_signature(request: Request, settings: Settings) -> bytes:
     return raw_body
 
 
+def _alert_row(payload: schemas.AlertIn) -> dict:
+    return {
+        "id": payload.id,
+        "symbol": payload.symbol,
+        "side": payload.side,
+        "price": payload.price,
+        "confidence": payload.confidence,
+        "timeframe": payload.timeframe,
+        "strategy": payload.strategy,
+        "received_at": datetime.utcnow(),
+    }
+
+
+def _parse_batch(raw_body: bytes) -> list[tuple[object, str | None]]:
+    """Split a JSON array or NDJSON body into ``(item, decode_error)`` pairs."""
+    body = raw_body.strip()
+    if body.startswith(b"["):
+        try:
+            return [(item, None) for item in loads(body)]
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"invalid JSON: {exc}"
+            ) from exc
+    items: list[tuple[object, str | None]] = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append((loads(line), None))
+        except ValueError as exc:
+            items.append((None, f"invalid JSON: {exc}"))
+    return items
+
+
 @router.post("/webhook/tradingview", response_model=schemas.AlertResponse)
 async def tradingview_webhook(
     request: Request,
-    db: Session = Depends(deps.get_db_dep),
+    ingestor: AlertIngestor = Depends(deps.get_alert_ingestor_dep),
+    seen_filter: SeenAlertFilter = Depends(deps.get_seen_filter_dep),
+    dispatcher: TradeDispatcher | None = Depends(deps.get_trade_dispatcher_dep),
     settings: Settings = Depends(deps.get_settings_dep),
 ):
     raw_body = await _verify_signature(request, settings)
@@ -59,53 +96,118 @@ async def tradingview_webhook(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=exc.errors()
         ) from exc
 
-    alert = models.Alert(
-        id=payload.id,
-        symbol=payload.symbol,
-        side=payload.side,
-        price=payload.price,
-        confidence=payload.confidence,
-        timeframe=payload.timeframe,
-        received_at=datetime.utcnow(),
-    )
+    if await seen_filter.seen(payload.id):
+        alerts_duplicate.labels("filter").inc()
+        return schemas.AlertResponse(status="duplicate", alert_id=payload.id)
 
-    db.add(alert)
-    try:
-        db.commit()
-    except IntegrityError:
-        db.rollback()
-        # Duplicate alert, still return queued to keep TV happy but don't re-enqueue
+    inserted = await ingestor.submit(_alert_row(payload))
+    await seen_filter.mark([payload.id])
+    if not inserted:
+        # Duplicate alert, still return 200 to keep TV happy but don't re-enqueue
+        alerts_duplicate.labels("db").inc()
         return schemas.AlertResponse(status="duplicate", alert_id=payload.id)
 
     alerts_received.inc()
-    enqueue_trade_task.delay(str(payload.id))
+    if dispatcher is not None:
+        await dispatcher.dispatch(str(payload.id), payload.symbol)
+    else:
+        enqueue_trade_task.delay(str(payload.id), shard_key=payload.symbol)
     return schemas.AlertResponse(status="queued", alert_id=payload.id)
 
 
-@router.get("/healthz", response_model=schemas.HealthResponse)
-async def healthz(
-    db: Session = Depends(deps.get_db_dep),
+@router.post("/webhook/tradingview/batch", response_model=schemas.BatchAlertResponse)
+async def tradingview_webhook_batch(
+    request: Request,
+    ingestor: AlertIngestor = Depends(deps.get_alert_ingestor_dep),
+    seen_filter: SeenAlertFilter = Depends(deps.get_seen_filter_dep),
     settings: Settings = Depends(deps.get_settings_dep),
 ):
-    build_sha = os.getenv("GIT_SHA", "dev")
+    raw_body = await _verify_signature(request, settings)
+    items = _parse_batch(raw_body)
+    if len(items) > settings.webhook_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"batch exceeds {settings.webhook_batch_max_items} items",
+        )
 
-    try:
-        db.execute(select(1))
-        db_status = "ok"
-    except Exception:  # noqa: BLE001
-        db_status = "error"
+    results: list[schemas.BatchItemResult] = []
+    valid: list[tuple[int, schemas.AlertIn]] = []
+    for index, (item, decode_error) in enumerate(items):
+        if decode_error:
+            results.append(
+                schemas.BatchItemResult(
+                    index=index, status="invalid", errors=[{"msg": decode_error}]
+                )
+            )
+            continue
+        try:
+            payload = schemas.AlertIn.model_validate(item)
+        except ValidationError as exc:
+            errors = exc.errors(include_url=False, include_context=False)
+            results.append(schemas.BatchItemResult(index=index, status="invalid", errors=errors))
+            continue
+        valid.append((index, payload))
+
+    seen = await seen_filter.seen_many([payload.id for _, payload in valid])
+    fresh = []
+    for (index, payload), known in zip(valid, seen, strict=True):
+        if known:
+            results.append(
+                schemas.BatchItemResult(index=index, status="duplicate", alert_id=payload.id)
+            )
+        else:
+            fresh.append((index, payload))
+    if len(fresh) < len(valid):
+        alerts_duplicate.labels("filter").inc(len(valid) - len(fresh))
+
+    inserted = await ingestor.submit_many([_alert_row(payload) for _, payload in fresh])
+    await seen_filter.mark([payload.id for _, payload in fresh])
+    queued: list[tuple[str, str]] = []
+    for (index, payload), is_new in zip(fresh, inserted, strict=True):
+        results.append(
+            schemas.BatchItemResult(
+                index=index, status="queued" if is_new else "duplicate", alert_id=payload.id
+            )
+        )
+        if is_new:
+            queued.append((str(payload.id), payload.symbol))
+    if len(queued) < len(fresh):
+        alerts_duplicate.labels("db").inc(len(fresh) - len(queued))
+
+    if queued:
+        alerts_received.inc(len(queued))
+        # one producer connection for every shard/TRADE_BATCH_SIZE message, off the event loop
+        await asyncio.to_thread(send_trade_batches, queued, settings.trade_batch_size)
+
+    results.sort(key=lambda result: result.index)
+    return schemas.BatchAlertResponse(
+        queued=len(queued),
+        duplicate=len(valid) - len(queued),
+        invalid=len(items) - len(valid),
+        results=results,
+    )
 
-    redis_status = "ok"
-    client = aioredis.from_url(settings.redis_url)
-    try:
-        await client.ping()
-    except Exception:  # noqa: BLE001
-        redis_status = "error"
-    finally:
-        await client.close()
 
+@router.get("/healthz", response_model=schemas.HealthResponse)
+async def healthz(prober: HealthProber = Depends(deps.get_health_prober_dep)):
+    build_sha = os.getenv("GIT_SHA", "dev")
+    snapshot = await prober.current()
+    checks = {
+        name: schemas.HealthCheck(
+            status=check.status, latency_ms=check.latency_ms, error=check.error
+        )
+        for name, check in snapshot.checks.items()
+    }
     return schemas.HealthResponse(
-        status="ok", build_sha=build_sha, db=db_status, redis=redis_status
+        status="ok" if snapshot.ok else "degraded",
+        build_sha=build_sha,
+        db=checks["db"].status,
+        redis=checks["redis"].status,
+        broker=checks["broker"].status,
+        checks=checks,
+        breakers=snapshot.breakers,
+        checked_at=snapshot.checked_at,
+        age_seconds=round(snapshot.age_seconds(), 3),
     )
 
 
@@ -115,8 +217,8 @@ async def healthz(
     dependencies=[Depends(verify_internal_token)],
 )
 async def daily_report(
-    db: Session = Depends(deps.get_db_dep),
+    db: AsyncSession = Depends(deps.get_async_db_dep),
 ):
     target_date = datetime.utcnow().date()
-    report = daily_pnl_report(db, target_date)
+    report = await db.run_sync(daily_pnl_report, target_date)
     return [schemas.ReportResponse(**row) for row in report]
@@ -10,6 +10,7 @@ class AlertIn(BaseModel):
     side: str
     confidence: float | None = Field(default=None, ge=0, le=1)
     timeframe: str | None = None
+    strategy: str | None = Field(default=None, max_length=50)
     price: float
     ts: datetime | None = None
 
@@ -19,11 +20,37 @@ class AlertResponse(BaseModel):
     alert_id: UUID
 
 
+class BatchItemResult(BaseModel):
+    index: int
+    status: str
+    alert_id: UUID | None = None
+    errors: list[dict] | None = None
+
+
+class BatchAlertResponse(BaseModel):
+    queued: int
+    duplicate: int
+    invalid: int
+    results: list[BatchItemResult]
+
+
+class HealthCheck(BaseModel):
+    status: str
+    latency_ms: float
+    error: str | None = None
+
+
 class HealthResponse(BaseModel):
     status: str
     build_sha: str
     db: str
     redis: str
+    broker: str
+    checks: dict[str, HealthCheck]
+    # Coinbase circuit breakers per call type: closed, half_open or open
+    breakers: dict[str, str] = {}
+    checked_at: datetime
+    age_seconds: float
 
 
 class ReportResponse(BaseModel):
@@ -2,13 +2,16 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
+from pathlib import Path
 
 from sqlalchemy import func
 
 from app.config import get_settings
 from app.db.session import SessionLocal
 from app.db import models
+from app.services.candles import GRANULARITIES, get_candle_store, read_csv
 from app.services.reporting import daily_pnl_report
+from app.workers.routing import queue_for_symbol, rebalance_plan
 
 
 def seed_demo() -> None:
@@ -38,6 +41,40 @@ def report(day: str | None) -> None:
         session.close()
 
 
+def shard_plan(new_shards: int, old_shards: int | None, symbols: list[str] | None) -> None:
+    settings = get_settings()
+    old_shards = settings.trade_shards if old_shards is None else old_shards
+    if not symbols:
+        session = SessionLocal()
+        try:
+            known = session.query(models.Position.symbol).all()
+        finally:
+            session.close()
+        symbols = sorted(set(settings.base_assets) | {symbol for (symbol,) in known})
+    plan = rebalance_plan(symbols, old_shards, new_shards)
+    print(f"{old_shards} -> {new_shards} shards: {len(plan)}/{len(symbols)} symbols move")
+    for symbol in symbols:
+        if symbol in plan:
+            old, new = plan[symbol]
+            print(f"  {symbol}: {old} -> {new}")
+        else:
+            print(f"  {symbol}: {queue_for_symbol(symbol, new_shards)} (unchanged)")
+    sources = sorted({old for old, _ in plan.values()})
+    targets = sorted({new for _, new in plan.values()})
+    if plan:
+        print("pause consumers of:", ", ".join(targets))
+        print("wait until drained:", ", ".join(sources))
+
+
+def import_candles(symbol: str, granularity: str, paths: list[str]) -> None:
+    store = get_candle_store()
+    for path in paths:
+        candles = read_csv(Path(path))
+        written = store.append(symbol, granularity, candles)
+        print(f"{path}: {written}/{len(candles)} new candles")
+    print(f"{store.path(symbol, granularity)}: last candle at {store.last_ts(symbol, granularity)}")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="TradingBot CLI")
     sub = parser.add_subparsers(dest="command")
@@ -47,11 +84,27 @@ def main() -> None:
     report_parser = sub.add_parser("report")
     report_parser.add_argument("--day", dest="day", help="YYYY-MM-DD", default=None)
 
+    shard_parser = sub.add_parser("shard-plan", help="show symbol moves for a new shard count")
+    shard_parser.add_argument("--to", dest="new_shards", type=int, required=True)
+    shard_parser.add_argument("--from", dest="old_shards", type=int, default=None)
+    shard_parser.add_argument("--symbols", nargs="*", default=None)
+
+    candles_parser = sub.add_parser(
+        "import-candles", help="append ts,open,high,low,close,volume CSV files to the candle store"
+    )
+    candles_parser.add_argument("--symbol", required=True)
+    candles_parser.add_argument("--granularity", choices=sorted(GRANULARITIES), required=True)
+    candles_parser.add_argument("paths", nargs="+", help="CSV files, oldest first")
+
     args = parser.parse_args()
     if args.command == "seed-demo":
         seed_demo()
     elif args.command == "report":
         report(args.day)
+    elif args.command == "shard-plan":
+        shard_plan(args.new_shards, args.old_shards, args.symbols)
+    elif args.command == "import-candles":
+        import_candles(args.symbol, args.granularity, args.paths)
     else:
         parser.print_help()
 
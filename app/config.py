@@ -14,19 +14,86 @@ class Settings(BaseSettings):
     coinbase_api_key: str | None = Field(default=None, alias="COINBASE_API_KEY")
     coinbase_api_secret: str | None = Field(default=None, alias="COINBASE_API_SECRET")
     coinbase_api_passphrase: str | None = Field(default=None, alias="COINBASE_API_PASSPHRASE")
+    coinbase_timeout_seconds: float = Field(10, alias="COINBASE_TIMEOUT_SECONDS")
+    coinbase_http2: bool = Field(False, alias="COINBASE_HTTP2")
+    coinbase_max_connections: int = Field(20, alias="COINBASE_MAX_CONNECTIONS")
+    coinbase_max_keepalive: int = Field(10, alias="COINBASE_MAX_KEEPALIVE")
+    coinbase_keepalive_expiry: float = Field(60, alias="COINBASE_KEEPALIVE_EXPIRY")
+    # request budgets shared by all workers through Redis (Coinbase: 30/s private, 10/s public)
+    coinbase_private_rps: float = Field(30, alias="COINBASE_PRIVATE_RPS")
+    coinbase_public_rps: float = Field(10, alias="COINBASE_PUBLIC_RPS")
+    # tokens reads leave for order placement, and how long each may wait for a token
+    coinbase_order_reserve: float = Field(5, alias="COINBASE_ORDER_RESERVE")
+    coinbase_order_max_wait_ms: float = Field(2000, alias="COINBASE_ORDER_MAX_WAIT_MS")
+    coinbase_read_max_wait_ms: float = Field(250, alias="COINBASE_READ_MAX_WAIT_MS")
+    # per call type (quote, order, account) "CALL=TIMEOUT_SECONDS[/fail|pass]", see breaker.py;
+    # unlisted calls use COINBASE_TIMEOUT_SECONDS and fail fast while their breaker is open
+    coinbase_call_policies: str = Field("quote=2", alias="COINBASE_CALL_POLICIES")
+    # re-send a live order (same client_order_id) when the first send is this slow; 0 disables
+    coinbase_order_hedge_ms: float = Field(1000, alias="COINBASE_ORDER_HEDGE_MS")
+    coinbase_breaker_window: int = Field(20, alias="COINBASE_BREAKER_WINDOW")
+    coinbase_breaker_min_calls: int = Field(10, alias="COINBASE_BREAKER_MIN_CALLS")
+    coinbase_breaker_failure_rate: float = Field(0.5, alias="COINBASE_BREAKER_FAILURE_RATE")
+    coinbase_breaker_slow_ms: float = Field(2000, alias="COINBASE_BREAKER_SLOW_MS")
+    coinbase_breaker_slow_rate: float = Field(0.8, alias="COINBASE_BREAKER_SLOW_RATE")
+    coinbase_breaker_open_seconds: float = Field(30, alias="COINBASE_BREAKER_OPEN_SECONDS")
     trading_mode: str = Field("paper", alias="TRADING_MODE")
     base_assets: List[str] = Field(default_factory=lambda: ["BTC-USD"], alias="BASE_ASSETS")
     max_pos_pct: float = Field(0.25, alias="MAX_POS_PCT")
     max_daily_risk_pct: float = Field(0.5, alias="MAX_DAILY_RISK_PCT")
     order_slippage_pct: float = Field(0.1, alias="ORDER_SLIPPAGE_PCT")
     throttle_seconds: int = Field(30, alias="THROTTLE_SECONDS")
+    # "BTC-USD=3/60;strategy:momentum=10/60/5" (COUNT/SECONDS[/BURST]), see idempotency.py
+    throttle_policies: str = Field("", alias="THROTTLE_POLICIES")
+    quote_max_age_ms: float = Field(500, alias="QUOTE_MAX_AGE_MS")
+    # per-symbol max ages, "BTC-USD=250;SOL-USD=1000"
+    quote_max_age_overrides: str = Field("", alias="QUOTE_MAX_AGE_OVERRIDES")
+    quote_max_stale_ms: float = Field(5000, alias="QUOTE_MAX_STALE_MS")
+    quote_stream_enabled: bool = Field(False, alias="QUOTE_STREAM_ENABLED")
+    quote_stream_url: str = Field("wss://advanced-trade-ws.coinbase.com", alias="QUOTE_STREAM_URL")
+    quote_stream_max_age_ms: float = Field(2000, alias="QUOTE_STREAM_MAX_AGE_MS")
+    quote_stream_ttl_seconds: int = Field(60, alias="QUOTE_STREAM_TTL_SECONDS")
+    # beat period of the bulk best_bid_ask prefetch into the same store; 0 disables it
+    quote_prefetch_seconds: float = Field(0, alias="QUOTE_PREFETCH_SECONDS")
+    # memory-mapped OHLCV files, {CANDLE_DIR}/{symbol}/{granularity}.ohlcv
+    candle_dir: str = Field("./data/candles", alias="CANDLE_DIR")
+    # volatility sizing: Wilder ATR period / realized window in bars, RiskMetrics decay, and the
+    # candle granularity it follows ("" disables)
+    vol_window: int = Field(14, alias="VOL_WINDOW")
+    vol_ewma_lambda: float = Field(0.94, alias="VOL_EWMA_LAMBDA")
+    vol_granularity: str = Field("", alias="VOL_GRANULARITY")
+    pretrade_threads: int = Field(4, alias="PRETRADE_THREADS")
+    # at most (DB_POOL_SIZE + DB_MAX_OVERFLOW) / 2: an alert may hold two connections
+    aio_worker_concurrency: int = Field(15, alias="AIO_WORKER_CONCURRENCY")
     paper_cash_usd: float = Field(100000, alias="PAPER_CASH_USD")
 
     # infrastructure
     db_url: str = Field(..., alias="DB_URL")
+    async_db_url: str | None = Field(default=None, alias="ASYNC_DB_URL")
+    db_pool_size: int = Field(10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(20, alias="DB_MAX_OVERFLOW")
     redis_url: str = Field(..., alias="REDIS_URL")
+    redis_max_connections: int = Field(50, alias="REDIS_MAX_CONNECTIONS")
+    redis_socket_timeout: float = Field(1.0, alias="REDIS_SOCKET_TIMEOUT")
     prometheus_port: int = Field(9000, alias="PROMETHEUS_PORT")
     internal_auth_token: str = Field(..., alias="INTERNAL_AUTH_TOKEN")
+    ingest_max_rows: int = Field(500, alias="INGEST_MAX_ROWS")
+    ingest_max_delay_ms: float = Field(5, alias="INGEST_MAX_DELAY_MS")
+    webhook_batch_max_items: int = Field(1000, alias="WEBHOOK_BATCH_MAX_ITEMS")
+    trade_queue: str = Field("trades", alias="TRADE_QUEUE")
+    trade_shards: int = Field(1, alias="TRADE_SHARDS")
+    trade_batch_size: int = Field(50, alias="TRADE_BATCH_SIZE")
+    trade_batch_window_ms: float = Field(0, alias="TRADE_BATCH_WINDOW_MS")
+    seen_alerts_max_local: int = Field(100_000, alias="SEEN_ALERTS_MAX_LOCAL")
+    seen_alerts_ttl_seconds: int = Field(86_400, alias="SEEN_ALERTS_TTL_SECONDS")
+    risk_event_buffer: int = Field(10_000, alias="RISK_EVENT_BUFFER")
+    risk_event_flush_rows: int = Field(500, alias="RISK_EVENT_FLUSH_ROWS")
+    risk_event_flush_ms: float = Field(200, alias="RISK_EVENT_FLUSH_MS")
+    risk_event_block_ms: float = Field(50, alias="RISK_EVENT_BLOCK_MS")
+    # a reservation this old with no order behind it is given back by the reclaim beat task
+    risk_reservation_ttl_seconds: float = Field(900, alias="RISK_RESERVATION_TTL_SECONDS")
+    health_probe_interval_seconds: float = Field(5, alias="HEALTH_PROBE_INTERVAL_SECONDS")
+    health_probe_timeout_seconds: float = Field(2, alias="HEALTH_PROBE_TIMEOUT_SECONDS")
 
     class Config:
         env_file = ".env"
@@ -1,7 +1,16 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import JSON, DateTime, Float, ForeignKey, Numeric, String, UniqueConstraint
+from sqlalchemy import (
+    JSON,
+    DateTime,
+    Float,
+    ForeignKey,
+    Integer,
+    Numeric,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -17,6 +26,7 @@ class Alert(Base):
     price: Mapped[float] = mapped_column(Numeric(18, 8), nullable=False)
     confidence: Mapped[float | None] = mapped_column(Float, nullable=True)
     timeframe: Mapped[str | None] = mapped_column(String(20))
+    strategy: Mapped[str | None] = mapped_column(String(50))
     received_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
     orders: Mapped[list["Order"]] = relationship(back_populates="alert")
@@ -27,7 +37,7 @@ class Order(Base):
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     alert_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("alerts.id", ondelete="CASCADE"), nullable=False
+        UUID(as_uuid=True), ForeignKey("alerts.id", ondelete="CASCADE"), nullable=False, index=True
     )
     symbol: Mapped[str] = mapped_column(String(50), nullable=False)
     side: Mapped[str] = mapped_column(String(10), nullable=False)
@@ -35,6 +45,9 @@ class Order(Base):
     limit_price: Mapped[float] = mapped_column(Numeric(18, 8), nullable=False)
     status: Mapped[str] = mapped_column(String(20), default="pending")
     mode: Mapped[str] = mapped_column(String(10), default="paper")
+    # live orders: our idempotency key (derived from the alert) and the exchange's order id
+    client_order_id: Mapped[str | None] = mapped_column(String(64), unique=True, nullable=True)
+    exchange_order_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
     alert: Mapped[Alert] = relationship(back_populates="orders", foreign_keys=[alert_id])
@@ -63,6 +76,8 @@ class Position(Base):
     symbol: Mapped[str] = mapped_column(String(50), primary_key=True)
     qty: Mapped[float] = mapped_column(Numeric(24, 8), default=0)
     avg_price: Mapped[float] = mapped_column(Numeric(18, 8), default=0)
+    # bumped by every compare-and-swap update from app.services.positions
+    version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
 
@@ -83,3 +98,15 @@ class DailyRisk(Base):
     trade_day: Mapped[str] = mapped_column(String(10), nullable=False)
     notional_used: Mapped[float] = mapped_column(Numeric(18, 2), default=0)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+
+
+class DailyRiskReservation(Base):
+    """One alert's share of ``daily_risk.notional_used``, so it is never charged twice and a
+    reservation orphaned by a crashed worker can be found and given back."""
+
+    __tablename__ = "daily_risk_reservations"
+
+    trade_day: Mapped[str] = mapped_column(String(10), primary_key=True)
+    alert_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+    notional: Mapped[float] = mapped_column(Numeric(18, 2), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
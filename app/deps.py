@@ -1,8 +1,13 @@
-from fastapi import Depends
+import redis.asyncio as aioredis
+from fastapi import Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import Settings, get_settings
-from app.db.session import get_db
+from app.db.session import get_async_db, get_db
+from app.services.dedupe import SeenAlertFilter
+from app.services.health import HealthProber
+from app.services.ingest import AlertIngestor, TradeDispatcher, get_alert_ingestor
 
 
 def get_settings_dep() -> Settings:
@@ -11,3 +16,27 @@ def get_settings_dep() -> Settings:
 
 def get_db_dep(db: Session = Depends(get_db)) -> Session:
     return db
+
+
+def get_async_db_dep(db: AsyncSession = Depends(get_async_db)) -> AsyncSession:
+    return db
+
+
+def get_alert_ingestor_dep() -> AlertIngestor:
+    return get_alert_ingestor()
+
+
+def get_redis_dep(request: Request) -> aioredis.Redis:
+    return request.app.state.redis
+
+
+def get_seen_filter_dep(request: Request) -> SeenAlertFilter:
+    return request.app.state.seen_filter
+
+
+def get_health_prober_dep(request: Request) -> HealthProber:
+    return request.app.state.health
+
+
+def get_trade_dispatcher_dep(request: Request) -> TradeDispatcher | None:
+    return request.app.state.dispatcher
@@ -1,40 +1,93 @@
 from __future__ import annotations
 
 import logging
+import time
+from contextlib import asynccontextmanager
 from typing import Callable
 
+import redis.asyncio as aioredis
 from fastapi import FastAPI, Request, Response
-from fastapi.responses import PlainTextResponse
-from prometheus_client import generate_latest
+from fastapi.datastructures import Default
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from app.api import routes
 from app.config import get_settings
-from app.metrics import request_latency
+from app.db.session import async_engine
+from app.metrics import mark_process_dead, render_latest, request_latency
+from app.services.dedupe import SeenAlertFilter
+from app.services.health import HealthProber
+from app.services.ingest import TradeDispatcher
 from app.utils.logging import configure_logging
+from app.utils.serialization import ORJSONResponse
+from app.workers.tasks import enqueue_trade_batch
 
 configure_logging()
 logger = logging.getLogger("app")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    logger.info("starting tradingbot", extra={"mode": settings.trading_mode})
+    app.state.health.start()
+    try:
+        yield
+    finally:
+        await app.state.health.stop()
+        await app.state.redis.aclose()
+        await async_engine.dispose()
+        mark_process_dead()
+
+
 def create_app() -> FastAPI:
-    app = FastAPI(title="TradingBot API", version="0.1.0")
+    settings = get_settings()
+    app = FastAPI(
+        title="TradingBot API",
+        version="0.1.0",
+        lifespan=lifespan,
+        # wrapped in Default() so response_model routes keep pydantic's direct-to-bytes path
+        default_response_class=Default(ORJSONResponse),
+    )
+
+    # one pooled client per process; connections are opened lazily and closed by the lifespan
+    app.state.redis = aioredis.from_url(
+        settings.redis_url,
+        max_connections=settings.redis_max_connections,
+        socket_connect_timeout=settings.redis_socket_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+    )
+    app.state.seen_filter = SeenAlertFilter(
+        app.state.redis,
+        max_local=settings.seen_alerts_max_local,
+        ttl_seconds=settings.seen_alerts_ttl_seconds,
+    )
+    app.state.health = HealthProber(async_engine, app.state.redis, settings)
+    # batching consumer mode: coalesce single webhooks into enqueue_trade_batch messages
+    app.state.dispatcher = (
+        TradeDispatcher(
+            enqueue_trade_batch.delay,
+            max_rows=settings.trade_batch_size,
+            max_delay=settings.trade_batch_window_ms / 1000,
+        )
+        if settings.trade_batch_window_ms > 0
+        else None
+    )
 
     @app.middleware("http")
     async def metrics_middleware(request: Request, call_next: Callable):
-        with request_latency.labels(request.method, request.url.path).time():
-            response = await call_next(request)
+        started = time.perf_counter()
+        response = await call_next(request)
+        # label by route template so arbitrary URLs cannot create new series
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", None) or "unmatched"
+        request_latency.labels(request.method, endpoint).observe(time.perf_counter() - started)
         return response
 
     app.include_router(routes.router)
 
     @app.get("/metrics")
     async def metrics() -> Response:
-        return PlainTextResponse(generate_latest().decode())
-
-    @app.on_event("startup")
-    async def _startup():
-        settings = get_settings()
-        logger.info("starting tradingbot", extra={"mode": settings.trading_mode})
+        return Response(render_latest(), media_type=CONTENT_TYPE_LATEST)
 
     return app
 
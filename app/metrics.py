@@ -1,10 +1,131 @@
-from prometheus_client import Counter, Histogram
+"""Process-wide Prometheus metrics.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (several uvicorn workers or Celery prefork children),
+every process writes its samples to that directory and ``render_latest`` aggregates them.
+Gauges added here must pass ``multiprocess_mode``.
+"""
+
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
 
 request_latency = Histogram(
     "tradingbot_request_latency_seconds", "HTTP request latency", ["method", "endpoint"]
 )
 alerts_received = Counter("tradingbot_alerts_received_total", "Trading alerts received")
+alerts_duplicate = Counter(
+    "tradingbot_alerts_duplicate_total", "Duplicate alerts rejected", ["source"]
+)
 orders_sent = Counter("tradingbot_orders_sent_total", "Orders submitted")
 orders_filled = Counter("tradingbot_orders_filled_total", "Orders filled")
 risk_blocked = Counter("tradingbot_risk_blocked_total", "Alerts blocked by risk")
 trade_latency = Histogram("tradingbot_trade_latency_seconds", "Trade task latency")
+quote_cache_requests = Counter(
+    "tradingbot_quote_cache_requests_total",
+    "Quote lookups by result: hit, miss (fetched), shared (waited on an in-flight fetch), stale",
+    ["result"],
+)
+quote_age = Histogram(
+    "tradingbot_quote_age_seconds",
+    "Age of cached quotes when served",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+quote_sources = Counter(
+    "tradingbot_quote_source_total",
+    "Quote fetches by source: stream (Redis top of book) or rest",
+    ["source"],
+)
+quote_stream_updates = Counter(
+    "tradingbot_quote_stream_updates_total", "Top-of-book updates written by the stream"
+)
+trade_stage_latency = Histogram(
+    "tradingbot_trade_stage_seconds",
+    "Pre-trade pipeline stage latency (quote runs concurrently with throttle)",
+    ["stage"],
+)
+coinbase_requests = Counter("tradingbot_coinbase_requests_total", "Coinbase HTTP responses")
+coinbase_connections_opened = Counter(
+    "tradingbot_coinbase_connections_opened_total",
+    "Coinbase connections opened; requests minus this is keep-alive reuse",
+)
+coinbase_rate_limited = Counter(
+    "tradingbot_coinbase_rate_limited_total",
+    "Coinbase requests held by the client-side budget: waited for a token, or rejected",
+    ["priority", "outcome"],
+)
+coinbase_rate_limit_responses = Counter(
+    "tradingbot_coinbase_429_total", "Coinbase responses rejected with 429"
+)
+coinbase_breaker_state = Gauge(
+    "tradingbot_coinbase_breaker_state",
+    "Coinbase circuit breaker per call type: 0 closed, 1 half-open, 2 open (worst live process)",
+    ["call"],
+    multiprocess_mode="livemax",
+)
+coinbase_breaker_transitions = Counter(
+    "tradingbot_coinbase_breaker_transitions_total",
+    "Coinbase circuit breaker state changes by call type and new state",
+    ["call", "state"],
+)
+coinbase_fast_failed = Counter(
+    "tradingbot_coinbase_fast_failed_total",
+    "Coinbase calls failed without being sent because their breaker was open",
+    ["call"],
+)
+coinbase_order_hedges = Counter(
+    "tradingbot_coinbase_order_hedges_total",
+    "Order submissions re-sent with the same client_order_id after COINBASE_ORDER_HEDGE_MS",
+)
+coinbase_order_lookups = Counter(
+    "tradingbot_coinbase_order_lookups_total",
+    "Orders looked up by client_order_id after an unanswered or duplicate submission",
+)
+
+position_conflicts = Counter(
+    "tradingbot_position_conflicts_total",
+    "Position compare-and-swap updates that lost to another writer and re-read the row",
+)
+risk_events_written = Counter(
+    "tradingbot_risk_events_written_total", "Risk events flushed by the write-behind sink"
+)
+risk_events_backpressure = Counter(
+    "tradingbot_risk_events_backpressure_total",
+    "Risk events that found the write-behind buffer full and had to wait",
+)
+risk_events_dropped = Counter(
+    "tradingbot_risk_events_dropped_total",
+    "Risk events lost to a full buffer or a failed flush",
+)
+
+
+def multiprocess_enabled() -> bool:
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+def collector_registry() -> CollectorRegistry:
+    """Registry to expose: the aggregated multiprocess view, or this process's default."""
+    if not multiprocess_enabled():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_latest() -> bytes:
+    return generate_latest(collector_registry())
+
+
+def mark_process_dead(pid: int | None = None) -> None:
+    """Drop live-gauge files of an exited process so they stop being aggregated."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
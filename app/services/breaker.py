@@ -0,0 +1,293 @@
+"""Per-endpoint circuit breakers for Coinbase calls.
+
+Each call type (``quote``, ``order``, ``account``) has its own breaker over a rolling window of
+its last calls. Once the window holds ``min_calls`` outcomes and either the failure rate
+(transport errors and 5xx) or the slow-call rate reaches its threshold, the breaker opens.
+With the ``fail`` policy, calls then raise at once instead of waiting out the httpx timeout and
+tenacity's retries. After ``open_seconds`` it half-opens and lets ``half_open_calls`` probes
+through: if they all succeed it closes, and any failure reopens it.
+
+Breakers are per process. Transitions update ``tradingbot_coinbase_breaker_state`` and mark
+open breakers in Redis (``coinbase:breaker:{call}:{host}:{pid}``) for ``/healthz``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+
+import redis
+
+from app.config import Settings, get_settings
+from app.metrics import coinbase_breaker_state, coinbase_breaker_transitions
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+QUOTE = "quote"
+ORDER = "order"
+ACCOUNT = "account"
+CALL_TYPES = (QUOTE, ORDER, ACCOUNT)
+
+KEY_PREFIX = "coinbase:breaker:"
+
+
+def call_type_for(method: str, path: str) -> str:
+    if path.startswith("/brokerage/orders"):
+        return ORDER if method.upper() == "POST" else ACCOUNT
+    if path.startswith(("/brokerage/products", "/brokerage/best_bid_ask", "/brokerage/market")):
+        return QUOTE
+    return ACCOUNT
+
+
+@dataclass(frozen=True)
+class BreakerConfig:
+    window: int = 20
+    min_calls: int = 10
+    failure_rate: float = 0.5
+    slow_seconds: float = 2.0
+    slow_rate: float = 0.8
+    open_seconds: float = 30.0
+    half_open_calls: int = 1
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    """Per call type: httpx timeout, and whether an open breaker fails calls fast."""
+
+    timeout: float
+    fail_fast: bool = True
+
+
+def parse_call_policies(spec: str, default_timeout: float) -> dict[str, CallPolicy]:
+    """Parse ``COINBASE_CALL_POLICIES``: ``CALL=TIMEOUT_SECONDS[/fail|pass]`` entries by ``;``.
+
+    ``pass`` keeps sending calls while the breaker is open (it still reports the state).
+    """
+    policies = {call: CallPolicy(default_timeout) for call in CALL_TYPES}
+    for entry in spec.split(";"):
+        entry = entry.strip()
+        if not entry:
+            continue
+        call, _, value = entry.partition("=")
+        call = call.strip()
+        timeout, _, mode = value.partition("/")
+        if call not in policies or mode not in {"", "fail", "pass"}:
+            raise ValueError(f"invalid call policy {entry!r}")
+        policies[call] = CallPolicy(float(timeout), mode != "pass")
+    return policies
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        config: BreakerConfig,
+        on_change: Callable[[str, str], None] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.config = config
+        self.on_change = on_change
+        self.clock = clock
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._outcomes: deque[tuple[bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._probes = 0
+        self._probes_ok = 0
+        self._changes: list[str] = []
+        self._lock = threading.Lock()
+        self._notify_lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._expire_open()
+            state = self._state
+        self._notify()
+        return state
+
+    def _expire_open(self) -> None:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.config.open_seconds:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str) -> None:
+        # called with the lock held
+        self._state = state
+        self._probes = self._probes_ok = 0
+        if state == OPEN:
+            self._opened_at = self.clock()
+        if state != HALF_OPEN:
+            self._outcomes.clear()
+            self._failures = self._slow = 0
+        if self.on_change is not None:
+            self._changes.append(state)
+
+    def _notify(self) -> None:
+        # transitions are reported after the state lock is released, in the order they happened
+        if not self._changes:
+            return
+        with self._notify_lock:
+            with self._lock:
+                changes, self._changes = self._changes, []
+            for state in changes:
+                self.on_change(self.name, state)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; half-open admits a limited number of probes."""
+        with self._lock:
+            self._expire_open()
+            if self._state == CLOSED:
+                allowed = True
+            elif self._state == HALF_OPEN and self._probes < self.config.half_open_calls:
+                self._probes += 1
+                allowed = True
+            else:
+                allowed = False
+        self._notify()
+        return allowed
+
+    def release(self) -> None:
+        """Give back a probe slot taken by :meth:`allow` for a call with no outcome to record."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > self._probes_ok:
+                self._probes -= 1
+
+    def record(self, ok: bool, seconds: float) -> None:
+        slow = seconds >= self.config.slow_seconds
+        with self._lock:
+            self._record(ok, slow)
+        self._notify()
+
+    def _record(self, ok: bool, slow: bool) -> None:
+        # called with the lock held
+        if self._state == HALF_OPEN:
+            if not ok or slow:
+                self._transition(OPEN)
+            else:
+                self._probes_ok += 1
+                if self._probes_ok >= self.config.half_open_calls:
+                    self._transition(CLOSED)
+            return
+        if self._state == OPEN:
+            # a call admitted by a pass policy; the breaker only reopens on probes
+            return
+        self._outcomes.append((not ok, slow))
+        self._failures += not ok
+        self._slow += slow
+        if len(self._outcomes) > self.config.window:
+            failed, was_slow = self._outcomes.popleft()
+            self._failures -= failed
+            self._slow -= was_slow
+        calls = len(self._outcomes)
+        if calls >= self.config.min_calls and (
+            self._failures / calls >= self.config.failure_rate
+            or self._slow / calls >= self.config.slow_rate
+        ):
+            self._transition(OPEN)
+
+
+class _StatePublisher:
+    """Reports transitions to metrics, logs and the Redis markers ``/healthz`` reads.
+
+    The Redis writes go through a queue to a background thread, so a transition never blocks
+    the calling thread (or the asyncio worker's event loop) on a Redis round trip.
+    """
+
+    def __init__(self, redis_client: redis.Redis | None, open_seconds: float) -> None:
+        self.redis = redis_client
+        self.open_seconds = open_seconds
+        self._queue: queue.SimpleQueue[tuple[str, str]] = queue.SimpleQueue()
+        self._writer_pid: int | None = None
+        self._start_lock = threading.Lock()
+
+    def __call__(self, call: str, state: str) -> None:
+        coinbase_breaker_state.labels(call).set(STATE_VALUES[state])
+        coinbase_breaker_transitions.labels(call, state).inc()
+        log = logger.warning if state == OPEN else logger.info
+        log("coinbase breaker %s", state, extra={"call": call})
+        if self.redis is None:
+            return
+        self._ensure_writer()
+        self._queue.put((call, state))
+
+    def _ensure_writer(self) -> None:
+        # per pid: the publisher may be created before a prefork child forks
+        pid = os.getpid()
+        if self._writer_pid == pid:
+            return
+        with self._start_lock:
+            if self._writer_pid != pid:
+                threading.Thread(target=self._run, name="breaker-publisher", daemon=True).start()
+                self._writer_pid = pid
+
+    def _run(self) -> None:
+        while True:
+            call, state = self._queue.get()
+            self.publish(call, state)
+
+    def publish(self, call: str, state: str) -> None:
+        key = f"{KEY_PREFIX}{call}:{socket.gethostname()}:{os.getpid()}"
+        try:
+            if state == CLOSED:
+                self.redis.delete(key)
+            else:
+                # outlives the open period so a probe has time to report; expires if we die
+                self.redis.set(key, state, px=int(self.open_seconds * 2000) + 60_000)
+        except redis.RedisError as exc:
+            logger.warning("breaker state not published", extra={"error": str(exc)})
+
+
+class Breakers:
+    """The process's breakers and call policies, one per call type."""
+
+    def __init__(
+        self,
+        config: BreakerConfig,
+        policies: dict[str, CallPolicy],
+        on_change: Callable[[str, str], None] | None = None,
+    ) -> None:
+        self.policies = policies
+        self.breakers = {call: CircuitBreaker(call, config, on_change) for call in CALL_TYPES}
+
+    @classmethod
+    def from_settings(cls, settings: Settings, redis_client: redis.Redis | None = None) -> Breakers:
+        config = BreakerConfig(
+            window=settings.coinbase_breaker_window,
+            min_calls=settings.coinbase_breaker_min_calls,
+            failure_rate=settings.coinbase_breaker_failure_rate,
+            slow_seconds=settings.coinbase_breaker_slow_ms / 1000,
+            slow_rate=settings.coinbase_breaker_slow_rate,
+            open_seconds=settings.coinbase_breaker_open_seconds,
+        )
+        policies = parse_call_policies(
+            settings.coinbase_call_policies, settings.coinbase_timeout_seconds
+        )
+        return cls(config, policies, _StatePublisher(redis_client, config.open_seconds))
+
+    def get(self, call: str) -> CircuitBreaker:
+        return self.breakers[call]
+
+    def states(self) -> dict[str, str]:
+        return {call: breaker.state for call, breaker in self.breakers.items()}
+
+
+@lru_cache
+def get_breakers() -> Breakers:
+    settings = get_settings()
+    client = redis.Redis.from_url(settings.redis_url, socket_timeout=settings.redis_socket_timeout)
+    return Breakers.from_settings(settings, client)
@@ -0,0 +1,141 @@
+"""Local OHLCV history: one append-only, memory-mapped file per symbol and granularity.
+
+A file is a headerless array of fixed-width little-endian records (``CANDLE_DTYPE``, 48 bytes:
+int64 epoch-second open time and float64 open/high/low/close/volume) in strictly increasing
+time order, so the row count is the file size over 48 and a range read is a binary search plus
+a slice of the mapping. Reads return NumPy views into the page cache, not copies, so any number
+of worker processes can share the files without touching the database. Appends write whole
+records at the end of the file; readers ignore a trailing partial record.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import threading
+from collections.abc import Iterable
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+from app.config import get_settings
+
+CANDLE_DTYPE = np.dtype(
+    [
+        ("ts", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("volume", "<f8"),
+    ]
+)
+
+# Coinbase candle granularities, in seconds
+GRANULARITIES = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "30m": 1800,
+    "1h": 3600,
+    "2h": 7200,
+    "6h": 21600,
+    "1d": 86400,
+}
+
+_EMPTY = np.empty(0, dtype=CANDLE_DTYPE)
+
+
+def candles_from_rows(rows: Iterable[Iterable]) -> np.ndarray:
+    """Pack ``(ts, open, high, low, close, volume)`` rows into a ``CANDLE_DTYPE`` array."""
+    return np.array([tuple(row) for row in rows], dtype=CANDLE_DTYPE)
+
+
+def read_csv(path: Path) -> np.ndarray:
+    """Candles from a ``ts,open,high,low,close,volume`` file (epoch seconds, header row)."""
+    with open(path, newline="") as handle:
+        reader = csv.reader(handle)
+        next(reader, None)
+        return candles_from_rows(
+            (int(float(row[0])), *map(float, row[1:6])) for row in reader if row
+        )
+
+
+class CandleStore:
+    def __init__(self, root: Path | str) -> None:
+        self.root = Path(root)
+        self._maps: dict[Path, np.memmap] = {}
+        self._lock = threading.Lock()
+
+    def path(self, symbol: str, granularity: str) -> Path:
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"unknown granularity {granularity!r}")
+        return self.root / symbol / f"{granularity}.ohlcv"
+
+    def _mapping(self, path: Path) -> np.ndarray:
+        try:
+            rows = os.stat(path).st_size // CANDLE_DTYPE.itemsize
+        except FileNotFoundError:
+            return _EMPTY
+        if rows == 0:
+            return _EMPTY
+        mapped = self._maps.get(path)
+        if mapped is None or len(mapped) != rows:
+            # the file only grows, so a longer mapping replaces the old one; views already
+            # handed out keep the old mapping alive until they are dropped
+            mapped = np.memmap(path, dtype=CANDLE_DTYPE, mode="r", shape=(rows,))
+            with self._lock:
+                self._maps[path] = mapped
+        return mapped
+
+    def read(
+        self,
+        symbol: str,
+        granularity: str,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> np.ndarray:
+        """Candles with ``start <= ts < end`` as a read-only view; columns by ``["close"]``."""
+        candles = self._mapping(self.path(symbol, granularity))
+        timestamps = candles["ts"]
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        hi = len(candles) if end is None else int(np.searchsorted(timestamps, end, side="left"))
+        return candles[lo:hi]
+
+    def last_ts(self, symbol: str, granularity: str) -> int | None:
+        candles = self._mapping(self.path(symbol, granularity))
+        return int(candles["ts"][-1]) if len(candles) else None
+
+    def append(self, symbol: str, granularity: str, candles: np.ndarray) -> int:
+        """Append candles newer than the file's last one; returns the number of rows written.
+
+        Input is sorted and deduplicated by ``ts`` (the last row of a duplicate wins). One
+        writer per file: concurrent appenders would interleave records.
+        """
+        path = self.path(symbol, granularity)
+        candles = np.asarray(candles, dtype=CANDLE_DTYPE)
+        if len(candles) == 0:
+            return 0
+        # keep the last of each timestamp: unique over the reversed, stably sorted array
+        ordered = candles[np.argsort(candles["ts"], kind="stable")][::-1]
+        _, first = np.unique(ordered["ts"], return_index=True)
+        fresh = ordered[first]
+        last = self.last_ts(symbol, granularity)
+        if last is not None:
+            fresh = fresh[fresh["ts"] > last]
+        if len(fresh) == 0:
+            return 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as handle:
+            torn = handle.tell() % CANDLE_DTYPE.itemsize
+            if torn:
+                # a crashed append left a partial record that readers already ignore
+                handle.truncate(handle.tell() - torn)
+            handle.write(np.ascontiguousarray(fresh).tobytes())
+        return len(fresh)
+
+
+@lru_cache
+def get_candle_store() -> CandleStore:
+    return CandleStore(get_settings().candle_dir)
@@ -1,20 +1,61 @@
 from __future__ import annotations
 
+import asyncio
 import base64
-import hmac
 import hashlib
-import json
+import hmac
+import threading
 import time
+import uuid
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from dataclasses import dataclass
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Any
+from urllib.parse import urlencode
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_not_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
 
 from app.config import Settings, get_settings
+from app.metrics import (
+    coinbase_connections_opened,
+    coinbase_fast_failed,
+    coinbase_order_hedges,
+    coinbase_order_lookups,
+    coinbase_rate_limit_responses,
+    coinbase_requests,
+)
+from app.services.breaker import Breakers, CallPolicy, CircuitBreaker, call_type_for, get_breakers
+from app.services.ratelimit import (
+    AsyncRateLimiter,
+    RateLimiter,
+    get_rate_limiter,
+    priority_for,
+    scope_for,
+)
+from app.utils.serialization import dumps, loads
 
 COINBASE_API_URL = "https://api.coinbase.com/api/v3"
 
+# fixed namespace: the same alert always maps to the same client_order_id
+ORDER_ID_NAMESPACE = uuid.UUID("6f1c2f4e-2b7a-5d0c-9a43-1c8e7b2d9f60")
+
+
+def client_order_id_for(alert_id: uuid.UUID) -> str:
+    """Idempotency key for an alert's order; Coinbase accepts one order per client_order_id.
+
+    Derived from the alert id alone, with no attempt counter: a retry, a redelivered task and a
+    hedged re-send must all carry the same id, or the exchange could accept a second order.
+    """
+    return str(uuid.uuid5(ORDER_ID_NAMESPACE, str(alert_id)))
+
 
 class CoinbaseError(Exception):
     pass
@@ -24,70 +65,182 @@ class CoinbaseRateLimitError(CoinbaseError):
     pass
 
 
+class CoinbaseBudgetExceeded(CoinbaseRateLimitError):
+    """The client-side rate budget had no token within the call's max wait; nothing was sent."""
+
+
+class CoinbaseCircuitOpen(CoinbaseError):
+    """The call type's circuit breaker is open and its policy fails fast; nothing was sent."""
+
+
+_backoff = wait_exponential(multiplier=1, min=1, max=4)
+
+
+def _retry_wait(retry_state: RetryCallState) -> float:
+    if isinstance(retry_state.outcome.exception(), CoinbaseRateLimitError):
+        # the 429's Retry-After paused the rate limiter, which paces the next attempt
+        return 0.0
+    return _backoff(retry_state)
+
+
+# an exhausted budget or open breaker fails fast: a retry would meet the same refusal
+_retrying = retry(
+    wait=_retry_wait,
+    stop=stop_after_attempt(3),
+    retry=retry_if_not_exception_type((CoinbaseBudgetExceeded, CoinbaseCircuitOpen)),
+)
+
+
+@lru_cache
+def _hedge_pool() -> ThreadPoolExecutor:
+    # created lazily so each prefork child gets its own threads after fork
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="order-leg")
+
+
+class _OrderLegs:
+    """Outcome of the legs (first send and hedges) of one order submission.
+
+    All legs carry the same client_order_id, so at most one order exists. A leg that raised
+    after it may have reached the exchange, or a duplicate-id rejection, leaves the outcome
+    unknown until the order is looked up by its client id.
+    """
+
+    def __init__(self) -> None:
+        self.rejection: dict[str, Any] | None = None
+        self.error: BaseException | None = None
+        self.unknown = False
+
+    def add(self, result: dict[str, Any] | BaseException) -> dict[str, Any] | None:
+        """Record a finished leg; returns the response when the order was accepted."""
+        if isinstance(result, (CoinbaseBudgetExceeded, CoinbaseCircuitOpen)):
+            # refused client-side: this leg never left the process
+            self.error = self.error or result
+            return None
+        if isinstance(result, BaseException):
+            self.error, self.unknown = result, True
+            return None
+        if result.get("success", True) is not False:
+            return result
+        self.rejection = result
+        if "DUPLICATE" in str(result.get("error_response") or "").upper():
+            self.unknown = True
+        return None
+
+    def settle(self, found: dict[str, Any] | None, client_order_id: str) -> dict[str, Any]:
+        if found is not None:
+            return {
+                "success": True,
+                "success_response": {
+                    "order_id": found.get("order_id"),
+                    "product_id": found.get("product_id"),
+                    "client_order_id": client_order_id,
+                },
+                "recovered": True,
+            }
+        if self.rejection is not None:
+            return self.rejection
+        raise self.error
+
+
 @dataclass
 class BidAsk:
     best_bid: float
     best_ask: float
 
 
-class CoinbaseClient:
-    def __init__(self, settings: Settings | None = None) -> None:
+class _CoinbaseBase:
+    """Signing, pool settings and payload shapes shared by the sync and async clients."""
+
+    def __init__(self, settings: Settings | None = None, breakers: Breakers | None = None) -> None:
         self.settings = settings or get_settings()
-        self.client = httpx.Client(timeout=10)
+        self.breakers = breakers or get_breakers()
+        self._streams: weakref.WeakSet = weakref.WeakSet()
 
-    def _signed_headers(self, method: str, path: str, body: str = "") -> Dict[str, str]:
-        timestamp = str(int(time.time()))
-        message = f"{timestamp}{method.upper()}{path}{body}"
-        secret = self.settings.coinbase_api_secret or ""
-        signature = hmac.new(secret.encode(), message.encode(), hashlib.sha256).digest()
-        encoded = base64.b64encode(signature).decode()
+    def _admit(self, method: str, path: str) -> tuple[CircuitBreaker, CallPolicy]:
+        call = call_type_for(method, path)
+        breaker, policy = self.breakers.get(call), self.breakers.policies[call]
+        if not breaker.allow() and policy.fail_fast:
+            coinbase_fast_failed.labels(call).inc()
+            raise CoinbaseCircuitOpen(f"{call} circuit open: {method} {path}")
+        return breaker, policy
+
+    @staticmethod
+    def _abandon(breaker: CircuitBreaker, exc: BaseException, started: float | None) -> None:
+        # every admitted call settles its breaker slot, or a half-open probe would leak
+        if started is not None and isinstance(exc, httpx.TransportError):
+            breaker.record(False, time.perf_counter() - started)
+        else:
+            # never sent, or cancelled (a losing hedge leg) before the exchange answered
+            breaker.release()
+
+    @staticmethod
+    def _record(breaker: CircuitBreaker, response: httpx.Response, started: float) -> None:
+        # 4xx (429 included) means the exchange is up; only 5xx counts against it
+        breaker.record(response.status_code < 500, time.perf_counter() - started)
+
+    def _client_options(self) -> dict[str, Any]:
+        settings = self.settings
         return {
-            "CB-ACCESS-KEY": self.settings.coinbase_api_key or "",
-            "CB-ACCESS-SIGN": encoded,
-            "CB-ACCESS-TIMESTAMP": timestamp,
-            "CB-ACCESS-PASSPHRASE": self.settings.coinbase_api_passphrase or "",
-            "Content-Type": "application/json",
+            "timeout": settings.coinbase_timeout_seconds,
+            "http2": settings.coinbase_http2,
+            "limits": httpx.Limits(
+                max_connections=settings.coinbase_max_connections,
+                max_keepalive_connections=settings.coinbase_max_keepalive,
+                keepalive_expiry=settings.coinbase_keepalive_expiry,
+            ),
         }
 
-    def _request(
-        self, method: str, path: str, json_body: Dict[str, Any] | None = None
-    ) -> Dict[str, Any]:
-        body_str = json.dumps(json_body) if json_body else ""
-        headers = self._signed_headers(method, path, body_str)
-        response = self.client.request(
-            method, f"{COINBASE_API_URL}{path}", headers=headers, json=json_body
-        )
+    def _count_connection(self, response: httpx.Response) -> None:
+        coinbase_requests.inc()
+        stream = response.extensions.get("network_stream")
+        if stream is not None and stream not in self._streams:
+            self._streams.add(stream)
+            coinbase_connections_opened.inc()
+
+    def _prepare(
+        self, method: str, path: str, json_body: dict[str, Any] | None
+    ) -> tuple[dict[str, str], bytes]:
+        # sign exactly the bytes that go on the wire
+        body = dumps(json_body) if json_body else b""
+        return self._signed_headers(method, path, body.decode()), body
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> dict[str, Any]:
         if response.status_code == 429:
+            coinbase_rate_limit_responses.inc()
             raise CoinbaseRateLimitError("rate limited")
         response.raise_for_status()
-        return response.json()
+        return loads(response.content)
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=4), stop=stop_after_attempt(3))
-    def get_accounts(self) -> Dict[str, Any]:
-        return self._request("GET", "/brokerage/accounts")
-
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=4), stop=stop_after_attempt(3))
-    def get_best_bid_ask(self, symbol: str) -> BidAsk:
-        data = self._request("GET", f"/brokerage/products/{symbol}")
+    @staticmethod
+    def _bid_ask(data: dict[str, Any]) -> BidAsk:
         price = data.get("price") or {}
         return BidAsk(
             best_bid=float(price.get("best_bid", 0)), best_ask=float(price.get("best_ask", 0))
         )
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=4), stop=stop_after_attempt(3))
-    def place_order(
-        self,
+    @staticmethod
+    def _pricebooks(data: dict[str, Any]) -> dict[str, BidAsk]:
+        books = {}
+        for book in data.get("pricebooks") or []:
+            bids, asks = book.get("bids") or [{}], book.get("asks") or [{}]
+            books[book["product_id"]] = BidAsk(
+                best_bid=float(bids[0].get("price", 0)), best_ask=float(asks[0].get("price", 0))
+            )
+        return books
+
+    @staticmethod
+    def _order_payload(
         symbol: str,
         side: str,
         size: float,
         limit_price: float,
-        time_in_force: str = "IOC",
-    ) -> Dict[str, Any]:
-        side = side.upper()
-        payload = {
-            "client_order_id": str(time.time_ns()),
+        client_order_id: str,
+    ) -> dict[str, Any]:
+        return {
+            "client_order_id": client_order_id,
             "product_id": symbol,
-            "side": side,
+            "side": side.upper(),
             "order_configuration": {
                 "limit_limit_gtc": {
                     "base_size": str(size),
@@ -96,11 +249,286 @@ class CoinbaseClient:
                 }
             },
         }
-        return self._request("POST", "/brokerage/orders", payload)
 
-    def get_fills(self, order_id: str) -> Dict[str, Any]:
+    @staticmethod
+    def _order_lookup_path(client_order_id: str) -> str:
+        return (
+            f"/brokerage/orders/historical/batch?{urlencode({'client_order_id': client_order_id})}"
+        )
+
+    @staticmethod
+    def _match_order(data: dict[str, Any], client_order_id: str) -> dict[str, Any] | None:
+        # filtered here as well: only an exact client id match proves the order exists
+        for order in data.get("orders") or []:
+            if order.get("client_order_id") == client_order_id:
+                return order
+        return None
+
+    def _hedge_after(self, hedge_after: float | None) -> float:
+        return self.settings.coinbase_order_hedge_ms / 1000 if hedge_after is None else hedge_after
+
+    def _signed_headers(self, method: str, path: str, body: str = "") -> dict[str, str]:
+        timestamp = str(int(time.time()))
+        message = f"{timestamp}{method.upper()}{path}{body}"
+        secret = self.settings.coinbase_api_secret or ""
+        signature = hmac.new(secret.encode(), message.encode(), hashlib.sha256).digest()
+        encoded = base64.b64encode(signature).decode()
+        return {
+            "CB-ACCESS-KEY": self.settings.coinbase_api_key or "",
+            "CB-ACCESS-SIGN": encoded,
+            "CB-ACCESS-TIMESTAMP": timestamp,
+            "CB-ACCESS-PASSPHRASE": self.settings.coinbase_api_passphrase or "",
+            "Content-Type": "application/json",
+        }
+
+
+class CoinbaseClient(_CoinbaseBase):
+    def __init__(
+        self,
+        settings: Settings | None = None,
+        http_client: httpx.Client | None = None,
+        limiter: RateLimiter | None = None,
+        breakers: Breakers | None = None,
+    ) -> None:
+        super().__init__(settings, breakers)
+        self.client = http_client or self._build_http_client()
+        self.limiter = limiter or get_rate_limiter()
+
+    def _build_http_client(self) -> httpx.Client:
+        return httpx.Client(
+            **self._client_options(), event_hooks={"response": [self._track_connection]}
+        )
+
+    def _track_connection(self, response: httpx.Response) -> None:
+        self._count_connection(response)
+
+    def close(self) -> None:
+        self.client.close()
+
+    def _request(
+        self, method: str, path: str, json_body: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        breaker, policy = self._admit(method, path)
+        scope = scope_for(path)
+        started: float | None = None
+        try:
+            if not self.limiter.acquire(scope, priority_for(method, path)):
+                raise CoinbaseBudgetExceeded(f"{scope} request budget exhausted: {method} {path}")
+            headers, body = self._prepare(method, path, json_body)
+            started = time.perf_counter()
+            response = self.client.request(
+                method,
+                f"{COINBASE_API_URL}{path}",
+                headers=headers,
+                content=body or None,
+                timeout=policy.timeout,
+            )
+        except BaseException as exc:
+            self._abandon(breaker, exc, started)
+            raise
+        self._record(breaker, response, started)
+        self.limiter.observe(scope, response.status_code, response.headers)
+        return self._parse(response)
+
+    @_retrying
+    def get_accounts(self) -> dict[str, Any]:
+        return self._request("GET", "/brokerage/accounts")
+
+    @_retrying
+    def get_best_bid_ask(self, symbol: str) -> BidAsk:
+        return self._bid_ask(self._request("GET", f"/brokerage/products/{symbol}"))
+
+    @_retrying
+    def get_best_bid_asks(self, symbols: list[str]) -> dict[str, BidAsk]:
+        """Top of book for many products in one ``/brokerage/best_bid_ask`` request."""
+        query = urlencode({"product_ids": symbols}, doseq=True)
+        return self._pricebooks(self._request("GET", f"/brokerage/best_bid_ask?{query}"))
+
+    def place_order(
+        self,
+        symbol: str,
+        side: str,
+        size: float,
+        limit_price: float,
+        *,
+        client_order_id: str,
+    ) -> dict[str, Any]:
+        # never retried with a fresh id: resends go through submit_order under the same one
+        return self.submit_order(symbol, side, size, limit_price, client_order_id)
+
+    def submit_order(
+        self,
+        symbol: str,
+        side: str,
+        size: float,
+        limit_price: float,
+        client_order_id: str,
+        hedge_after: float | None = None,
+    ) -> dict[str, Any]:
+        """Place an order exactly once, re-sending it if the first send is slow.
+
+        If no response arrives within ``hedge_after`` seconds (``COINBASE_ORDER_HEDGE_MS``; 0
+        disables), the same payload is sent again and the first acceptance wins; the shared
+        ``client_order_id`` keeps it one order. When no leg gives a clear answer, the order is
+        looked up by its client id before the error is raised.
+        """
+        payload = self._order_payload(symbol, side, size, limit_price, client_order_id)
+        hedge_after = self._hedge_after(hedge_after)
+        legs = _OrderLegs()
+        if hedge_after <= 0:
+            try:
+                result = self._request("POST", "/brokerage/orders", payload)
+            except Exception as exc:  # noqa: BLE001
+                result = exc
+            accepted = legs.add(result)
+            if accepted is not None:
+                return accepted
+        else:
+            pool = _hedge_pool()
+            pending = [pool.submit(self._request, "POST", "/brokerage/orders", payload)]
+            done, _ = wait(pending, timeout=hedge_after, return_when=FIRST_COMPLETED)
+            if not done:
+                coinbase_order_hedges.inc()
+                pending.append(pool.submit(self._request, "POST", "/brokerage/orders", payload))
+            for leg in as_completed(pending):
+                accepted = legs.add(leg.exception() or leg.result())
+                if accepted is not None:
+                    return accepted
+        found = self.get_order_by_client_id(client_order_id) if legs.unknown else None
+        return legs.settle(found, client_order_id)
+
+    @_retrying
+    def get_order_by_client_id(self, client_order_id: str) -> dict[str, Any] | None:
+        """The exchange's order for ``client_order_id``, or None if it was never created."""
+        coinbase_order_lookups.inc()
+        data = self._request("GET", self._order_lookup_path(client_order_id))
+        return self._match_order(data, client_order_id)
+
+    def get_fills(self, order_id: str) -> dict[str, Any]:
         return self._request("GET", f"/brokerage/orders/{order_id}")
 
 
+class AsyncCoinbaseClient(_CoinbaseBase):
+    """``httpx.AsyncClient`` twin of :class:`CoinbaseClient` for the asyncio worker."""
+
+    def __init__(
+        self,
+        settings: Settings | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        limiter: AsyncRateLimiter | None = None,
+        breakers: Breakers | None = None,
+    ) -> None:
+        super().__init__(settings, breakers)
+        self.client = http_client or httpx.AsyncClient(
+            **self._client_options(), event_hooks={"response": [self._track_connection]}
+        )
+        self.limiter = limiter or AsyncRateLimiter.from_settings(None, self.settings)
+
+    async def _track_connection(self, response: httpx.Response) -> None:
+        self._count_connection(response)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def _request(
+        self, method: str, path: str, json_body: dict[str, Any] | None = None
+    ) -> dict[str, Any]:
+        breaker, policy = self._admit(method, path)
+        scope = scope_for(path)
+        started: float | None = None
+        try:
+            if not await self.limiter.acquire(scope, priority_for(method, path)):
+                raise CoinbaseBudgetExceeded(f"{scope} request budget exhausted: {method} {path}")
+            headers, body = self._prepare(method, path, json_body)
+            started = time.perf_counter()
+            response = await self.client.request(
+                method,
+                f"{COINBASE_API_URL}{path}",
+                headers=headers,
+                content=body or None,
+                timeout=policy.timeout,
+            )
+        except BaseException as exc:
+            self._abandon(breaker, exc, started)
+            raise
+        self._record(breaker, response, started)
+        await self.limiter.observe(scope, response.status_code, response.headers)
+        return self._parse(response)
+
+    @_retrying
+    async def get_best_bid_ask(self, symbol: str) -> BidAsk:
+        return self._bid_ask(await self._request("GET", f"/brokerage/products/{symbol}"))
+
+    async def place_order(
+        self,
+        symbol: str,
+        side: str,
+        size: float,
+        limit_price: float,
+        *,
+        client_order_id: str,
+    ) -> dict[str, Any]:
+        return await self.submit_order(symbol, side, size, limit_price, client_order_id)
+
+    async def submit_order(
+        self,
+        symbol: str,
+        side: str,
+        size: float,
+        limit_price: float,
+        client_order_id: str,
+        hedge_after: float | None = None,
+    ) -> dict[str, Any]:
+        """:meth:`CoinbaseClient.submit_order` on the event loop."""
+        payload = self._order_payload(symbol, side, size, limit_price, client_order_id)
+        hedge_after = self._hedge_after(hedge_after)
+        legs = _OrderLegs()
+        pending = [asyncio.ensure_future(self._request("POST", "/brokerage/orders", payload))]
+        if hedge_after > 0:
+            done, _ = await asyncio.wait(pending, timeout=hedge_after)
+            if not done:
+                coinbase_order_hedges.inc()
+                pending.append(
+                    asyncio.ensure_future(self._request("POST", "/brokerage/orders", payload))
+                )
+        try:
+            for leg in asyncio.as_completed(pending):
+                try:
+                    accepted = legs.add(await leg)
+                except Exception as exc:  # noqa: BLE001
+                    accepted = legs.add(exc)
+                if accepted is not None:
+                    return accepted
+        finally:
+            # a leg still in flight can only repeat the accepted order's client id
+            for leg in pending:
+                leg.cancel()
+        found = await self.get_order_by_client_id(client_order_id) if legs.unknown else None
+        return legs.settle(found, client_order_id)
+
+    @_retrying
+    async def get_order_by_client_id(self, client_order_id: str) -> dict[str, Any] | None:
+        coinbase_order_lookups.inc()
+        data = await self._request("GET", self._order_lookup_path(client_order_id))
+        return self._match_order(data, client_order_id)
+
+
+_shared_client: CoinbaseClient | None = None
+_shared_lock = threading.Lock()
+
+
 def get_coinbase_client() -> CoinbaseClient:
-    return CoinbaseClient()
+    """Process-wide client whose keep-alive pool is reused by every task in the worker."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = CoinbaseClient()
+        return _shared_client
+
+
+def close_coinbase_client() -> None:
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from uuid import UUID
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+
+class SeenAlertFilter:
+    """Fast-path duplicate detection in front of the alert insert.
+
+    Ids are remembered in an in-process LRU and in Redis keys with a TTL so every API replica
+    shares them. A hit means the alert is already stored; a miss proves nothing and the insert
+    (``ON CONFLICT DO NOTHING``) stays the final authority.
+    """
+
+    key_prefix = "alert:seen:"
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis | None = None,
+        max_local: int = 100_000,
+        ttl_seconds: int = 86_400,
+        redis_cooldown: float = 5.0,
+    ) -> None:
+        self.redis = redis_client
+        self.max_local = max_local
+        self.ttl_seconds = ttl_seconds
+        self.redis_cooldown = redis_cooldown
+        self._local: OrderedDict[str, float] = OrderedDict()
+        self._redis_down_until = 0.0
+
+    def _seen_locally(self, key: str, now: float) -> bool:
+        expires_at = self._local.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < now:
+            del self._local[key]
+            return False
+        self._local.move_to_end(key)
+        return True
+
+    def _remember_locally(self, key: str, now: float) -> None:
+        self._local[key] = now + self.ttl_seconds
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_local:
+            self._local.popitem(last=False)
+
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, exc: Exception) -> None:
+        # back off so an unreachable Redis costs one failed call per cooldown, not per alert
+        self._redis_down_until = time.monotonic() + self.redis_cooldown
+        logger.warning("seen-alert filter redis unavailable", extra={"error": str(exc)})
+
+    async def seen(self, alert_id: UUID | str) -> bool:
+        return (await self.seen_many([alert_id]))[0]
+
+    async def seen_many(self, alert_ids: Iterable[UUID | str]) -> list[bool]:
+        now = time.time()
+        keys = [str(alert_id) for alert_id in alert_ids]
+        results = [self._seen_locally(key, now) for key in keys]
+        unknown = [i for i, hit in enumerate(results) if not hit]
+        if not unknown or not self._redis_available():
+            return results
+        try:
+            values = await self.redis.mget([self.key_prefix + keys[i] for i in unknown])
+        except Exception as exc:  # noqa: BLE001
+            self._redis_failed(exc)
+            return results
+        for i, value in zip(unknown, values, strict=True):
+            if value is not None:
+                results[i] = True
+                self._remember_locally(keys[i], now)
+        return results
+
+    async def mark(self, alert_ids: Iterable[UUID | str]) -> None:
+        """Record ids that are known to be stored (inserted or confirmed duplicate)."""
+        now = time.time()
+        keys = [str(alert_id) for alert_id in alert_ids]
+        for key in keys:
+            self._remember_locally(key, now)
+        if not keys or not self._redis_available():
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(self.key_prefix + key, 1, ex=self.ttl_seconds)
+                await pipe.execute()
+        except Exception as exc:  # noqa: BLE001
+            self._redis_failed(exc)
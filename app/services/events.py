@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import atexit
+import datetime as dt
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Any
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.db import models
+from app.metrics import risk_events_backpressure, risk_events_dropped, risk_events_written
+from app.utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+_COPY_SQL = "COPY risk_events (id, type, details, created_at) FROM STDIN"
+
+
+class RiskEventSink:
+    """Write-behind buffer for ``risk_events`` rows.
+
+    ``emit`` puts rows on a bounded queue; a daemon thread writes them in bulk (``COPY`` with
+    psycopg, a multi-row ``INSERT`` elsewhere) every ``flush_rows`` rows or ``flush_interval``
+    seconds. When the queue is full ``emit`` waits up to ``block_timeout`` and then drops the
+    row, counting both in metrics. ``close`` drains everything still buffered.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_buffer: int = 10_000,
+        flush_rows: int = 500,
+        flush_interval: float = 0.2,
+        block_timeout: float = 0.05,
+    ) -> None:
+        self.engine = engine
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self._queue: queue.Queue[dict[str, Any]] = queue.Queue(maxsize=max_buffer)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="risk-event-sink", daemon=True)
+            self._thread.start()
+
+    def emit(self, event_type: str, details: dict) -> bool:
+        """Buffer one event; False when it had to be dropped."""
+        row = {
+            "id": uuid.uuid4(),
+            "type": event_type,
+            "details": details,
+            "created_at": dt.datetime.utcnow(),
+        }
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            risk_events_backpressure.inc()
+        try:
+            self._queue.put(row, timeout=self.block_timeout)
+            return True
+        except queue.Full:
+            risk_events_dropped.inc()
+            logger.warning("risk event dropped", extra={"event_type": event_type})
+            return False
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the writer thread after it has flushed every buffered event."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # thread never started (or timed out): write the rest from the caller
+        self._drain()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            rows = self._collect()
+            if rows:
+                self._write(rows)
+        self._drain()
+
+    def _collect(self) -> list[dict[str, Any]]:
+        rows: list[dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.flush_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                rows.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _drain(self) -> None:
+        while True:
+            rows = []
+            while len(rows) < self.flush_rows:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not rows:
+                return
+            self._write(rows)
+
+    def _write(self, rows: list[dict[str, Any]]) -> None:
+        try:
+            if self.engine.dialect.driver == "psycopg":
+                self._copy(rows)
+            else:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(models.RiskEvent), rows)
+            risk_events_written.inc(len(rows))
+        except Exception:  # noqa: BLE001
+            risk_events_dropped.inc(len(rows))
+            logger.exception("risk event flush failed", extra={"rows": len(rows)})
+
+    def _copy(self, rows: list[dict[str, Any]]) -> None:
+        raw = self.engine.raw_connection()
+        try:
+            with raw.cursor() as cursor, cursor.copy(_COPY_SQL) as copy:
+                for row in rows:
+                    copy.write_row(
+                        (row["id"], row["type"], dumps(row["details"]).decode(), row["created_at"])
+                    )
+            raw.commit()
+        except Exception:
+            raw.rollback()
+            raise
+        finally:
+            raw.close()
+
+
+_sink: RiskEventSink | None = None
+_sink_lock = threading.Lock()
+
+
+def install_event_sink(engine: Engine, **options: Any) -> RiskEventSink:
+    """Start this process's write-behind sink; ``RiskEngine`` uses it once installed."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = RiskEventSink(engine, **options)
+            _sink.start()
+            atexit.register(close_event_sink)
+        return _sink
+
+
+def get_event_sink() -> RiskEventSink | None:
+    return _sink
+
+
+def close_event_sink() -> None:
+    global _sink
+    with _sink_lock:
+        sink, _sink = _sink, None
+    if sink is not None:
+        sink.close()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import redis.asyncio as aioredis
+from kombu import Connection
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import Settings
+from app.services.breaker import CALL_TYPES, CLOSED, KEY_PREFIX, STATE_VALUES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProbeResult:
+    status: str
+    latency_ms: float
+    error: str | None = None
+
+
+@dataclass
+class HealthSnapshot:
+    checks: dict[str, ProbeResult]
+    checked_at: datetime
+    monotonic_at: float
+    # worst Coinbase breaker state per call type across worker processes (informational)
+    breakers: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return all(check.status == "ok" for check in self.checks.values())
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.monotonic_at
+
+
+class HealthProber:
+    """Refreshes DB, Redis and broker health in the background.
+
+    ``/healthz`` serves the latest snapshot instead of probing on every load-balancer hit.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        redis: aioredis.Redis,
+        settings: Settings,
+    ) -> None:
+        self.engine = engine
+        self.redis = redis
+        self.settings = settings
+        self.interval = settings.health_probe_interval_seconds
+        self.timeout = settings.health_probe_timeout_seconds
+        self.snapshot: HealthSnapshot | None = None
+        self._task: asyncio.Task | None = None
+
+    async def _probe_db(self) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execute(select(1))
+
+    async def _probe_redis(self) -> None:
+        await self.redis.ping()
+
+    def _ping_broker(self) -> None:
+        with Connection(self.settings.redis_url, connect_timeout=self.timeout) as conn:
+            conn.ensure_connection(max_retries=1, interval_start=0, timeout=self.timeout)
+
+    async def _probe_broker(self) -> None:
+        await asyncio.to_thread(self._ping_broker)
+
+    async def _breaker_states(self) -> dict[str, str]:
+        """Worst state per call type from the markers workers keep for non-closed breakers."""
+        states = dict.fromkeys(CALL_TYPES, CLOSED)
+        try:
+            async with asyncio.timeout(self.timeout):
+                async for key in self.redis.scan_iter(match=f"{KEY_PREFIX}*", count=100):
+                    value = await self.redis.get(key)
+                    call = (key.decode() if isinstance(key, bytes) else key)[len(KEY_PREFIX) :]
+                    call = call.split(":", 1)[0]
+                    state = value.decode() if isinstance(value, bytes) else value
+                    if call in states and STATE_VALUES.get(state, 0) > STATE_VALUES[states[call]]:
+                        states[call] = state
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("breaker states unavailable", extra={"error": str(exc)})
+            return {}
+        return states
+
+    async def _timed(self, probe: Callable[[], Awaitable[None]]) -> ProbeResult:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+        except Exception as exc:  # noqa: BLE001
+            latency = (time.perf_counter() - started) * 1000
+            return ProbeResult("error", round(latency, 3), str(exc) or type(exc).__name__)
+        return ProbeResult("ok", round((time.perf_counter() - started) * 1000, 3))
+
+    async def refresh(self) -> HealthSnapshot:
+        db, redis, broker, breakers = await asyncio.gather(
+            self._timed(self._probe_db),
+            self._timed(self._probe_redis),
+            self._timed(self._probe_broker),
+            self._breaker_states(),
+        )
+        self.snapshot = HealthSnapshot(
+            checks={"db": db, "redis": redis, "broker": broker},
+            checked_at=datetime.utcnow(),
+            monotonic_at=time.monotonic(),
+            breakers=breakers,
+        )
+        return self.snapshot
+
+    async def current(self) -> HealthSnapshot:
+        """Latest snapshot; probes inline only when the background loop is not running."""
+        snapshot = self.snapshot
+        running = self._task is not None and not self._task.done()
+        if snapshot is None or (not running and snapshot.age_seconds() > self.interval):
+            snapshot = await self.refresh()
+        return snapshot
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:  # noqa: BLE001
+                logger.exception("health probe failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
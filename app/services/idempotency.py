@@ -1,29 +1,188 @@
 from __future__ import annotations
 
+import logging
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import dataclass
 
 import redis
+import redis.asyncio as aioredis
 
 from app.config import get_settings
 
+logger = logging.getLogger(__name__)
 
-class _MemoryStore:
-    def __init__(self) -> None:
-        self.store: dict[str, tuple[int, int | None]] = {}
+# KEYS: bucket keys; ARGV: now, then burst and rate for each key.
+# Every bucket must hold a token before any is spent, so a multi-key check is all-or-nothing.
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local levels = {}
+for i, key in ipairs(KEYS) do
+  local burst = tonumber(ARGV[i * 2])
+  local rate = tonumber(ARGV[i * 2 + 1])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or burst
+  local ts = tonumber(state[2]) or now
+  tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+  if tokens < 1 then
+    return 0
+  end
+  levels[i] = tokens
+end
+for i, key in ipairs(KEYS) do
+  local burst = tonumber(ARGV[i * 2])
+  local rate = tonumber(ARGV[i * 2 + 1])
+  redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+  redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000))
+end
+return 1
+"""
 
-    def get(self, key: str):
-        value = self.store.get(key)
-        if not value:
-            return None
-        ts, expires_at = value
-        if expires_at and expires_at < int(time.time()):
-            self.store.pop(key, None)
-            return None
-        return str(ts).encode()
 
-    def set(self, key: str, value: int, ex: int | None = None):
-        expires_at = int(time.time()) + ex if ex else None
-        self.store[key] = (value, expires_at)
+@dataclass(frozen=True)
+class ThrottlePolicy:
+    """Token bucket: up to ``burst`` alerts at once, refilled at ``rate`` tokens per second."""
+
+    burst: float
+    rate: float
+
+    @classmethod
+    def per_window(cls, window_seconds: float) -> ThrottlePolicy:
+        # one alert per window, the original THROTTLE_SECONDS behaviour
+        return cls(1, 1 / max(window_seconds, 1e-9))
+
+    @property
+    def idle_seconds(self) -> float:
+        """Time after which an untouched bucket is full again and need not be stored."""
+        return self.burst / self.rate
+
+
+def parse_policies(spec: str) -> dict[str, ThrottlePolicy]:
+    """Parse ``THROTTLE_POLICIES``: ``KEY=COUNT/SECONDS[/BURST]`` entries separated by ``;``.
+
+    ``KEY`` is a symbol (``BTC-USD``) or ``strategy:<name>``; ``BURST`` defaults to ``COUNT``.
+    """
+    policies = {}
+    for entry in spec.split(";"):
+        entry = entry.strip()
+        if not entry:
+            continue
+        key, _, value = entry.partition("=")
+        parts = value.split("/")
+        if len(parts) not in {2, 3}:
+            raise ValueError(f"invalid throttle policy {entry!r}")
+        count, seconds = float(parts[0]), float(parts[1])
+        burst = float(parts[2]) if len(parts) == 3 else count
+        policies[key.strip()] = ThrottlePolicy(burst, count / seconds)
+    return policies
+
+
+class _MemoryBuckets:
+    """Process-local token buckets used when Redis is unreachable.
+
+    At most ``max_keys`` buckets are kept (least recently used go first), and buckets idle long
+    enough to be full again are swept every ``sweep_interval`` seconds.
+    """
+
+    def __init__(self, max_keys: int = 10_000, sweep_interval: float = 60.0) -> None:
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, buckets: list[tuple[str, ThrottlePolicy]], now: float) -> bool:
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            levels = []
+            for key, policy in buckets:
+                tokens, ts, _ = self._buckets.get(key, (policy.burst, now, 0.0))
+                tokens = min(policy.burst, tokens + max(0.0, now - ts) * policy.rate)
+                if tokens < 1:
+                    return False
+                levels.append(tokens)
+            for (key, policy), tokens in zip(buckets, levels, strict=True):
+                self._buckets[key] = (tokens - 1, now, now + policy.idle_seconds)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return True
+
+    def _sweep(self, now: float) -> None:
+        expired = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in expired:
+            del self._buckets[key]
+        self._next_sweep = now + self.sweep_interval
+
+
+class _ThrottleBase:
+    key_prefix = "throttle:"
+
+    def __init__(
+        self,
+        redis_client: redis.Redis | aioredis.Redis | None,
+        policies: dict[str, ThrottlePolicy] | None = None,
+        memory: _MemoryBuckets | None = None,
+    ) -> None:
+        self.redis = redis_client
+        self.policies = policies or {}
+        self.memory = memory or _MemoryBuckets()
+        self._script = redis_client.register_script(_TOKEN_BUCKET_LUA) if redis_client else None
+
+    def _buckets(
+        self, symbol: str, strategy: str | None, default: ThrottlePolicy
+    ) -> list[tuple[str, ThrottlePolicy]]:
+        buckets = [(f"{self.key_prefix}{symbol}", self.policies.get(symbol, default))]
+        if strategy and f"strategy:{strategy}" in self.policies:
+            key = f"strategy:{strategy}"
+            buckets.append((f"{self.key_prefix}{key}", self.policies[key]))
+        return buckets
+
+    @staticmethod
+    def _script_args(buckets: list[tuple[str, ThrottlePolicy]], now: float) -> dict:
+        args: list[float] = [now]
+        for _, policy in buckets:
+            args.extend((policy.burst, policy.rate))
+        return {"keys": [key for key, _ in buckets], "args": args}
+
+
+class Throttle(_ThrottleBase):
+    """Atomic per-symbol / per-strategy alert throttle.
+
+    One ``EVALSHA`` checks and spends a token from every bucket that applies to an alert, so
+    concurrent workers can never both pass. Falls back to :class:`_MemoryBuckets` without Redis.
+    """
+
+    def allow(self, symbol: str, default: ThrottlePolicy, strategy: str | None = None) -> bool:
+        buckets = self._buckets(symbol, strategy, default)
+        now = time.time()
+        if self._script is not None:
+            try:
+                return bool(self._script(**self._script_args(buckets, now)))
+            except redis.RedisError as exc:
+                logger.warning("throttle redis unavailable", extra={"error": str(exc)})
+        return self.memory.take(buckets, now)
+
+
+class AsyncThrottle(_ThrottleBase):
+    """:class:`Throttle` over ``redis.asyncio``, sharing the same Redis buckets."""
+
+    async def allow(
+        self, symbol: str, default: ThrottlePolicy, strategy: str | None = None
+    ) -> bool:
+        buckets = self._buckets(symbol, strategy, default)
+        now = time.time()
+        if self._script is not None:
+            try:
+                return bool(await self._script(**self._script_args(buckets, now)))
+            except redis.RedisError as exc:
+                logger.warning("throttle redis unavailable", extra={"error": str(exc)})
+        return self.memory.take(buckets, now)
 
 
 settings = get_settings()
@@ -31,14 +190,14 @@ try:
     _redis_client = redis.Redis.from_url(settings.redis_url)
     _redis_client.ping()
 except Exception:  # noqa: BLE001
-    _redis_client = _MemoryStore()
+    _redis_client = None
+
+_throttle = Throttle(_redis_client, parse_policies(settings.throttle_policies))
+
 
+def throttle_symbol(symbol: str, window_seconds: int, strategy: str | None = None) -> bool:
+    """Spend a throttle token for ``symbol`` (and ``strategy``); False when throttled.
 
-def throttle_symbol(symbol: str, window_seconds: int) -> bool:
-    key = f"throttle:{symbol}"
-    now = int(time.time())
-    last = _redis_client.get(key)
-    if last and now - int(last) < window_seconds:
-        return False
-    _redis_client.set(key, now, ex=window_seconds)
-    return True
+    Symbols without a ``THROTTLE_POLICIES`` entry allow one alert per ``window_seconds``.
+    """
+    return _throttle.allow(symbol, ThrottlePolicy.per_window(window_seconds), strategy)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import logging
+from collections.abc import Callable
+from contextlib import suppress
+from functools import lru_cache
+from typing import Any, Generic, TypeVar
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import get_settings
+from app.db import models
+from app.db.session import AsyncSessionLocal
+from app.workers.routing import group_by_queue
+
+logger = logging.getLogger(__name__)
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+
+class _Batch(Generic[ItemT, ResultT]):
+    def __init__(self) -> None:
+        self.items: list[ItemT] = []
+        self.futures: list[asyncio.Future[ResultT]] = []
+        self.full = asyncio.Event()
+
+
+class _GroupWriter(abc.ABC, Generic[ItemT, ResultT]):
+    """Collects items from concurrent callers and hands them to ``_write`` in one batch.
+
+    A batch closes after ``max_delay`` seconds or ``max_rows`` items, whichever comes first.
+    """
+
+    name = "group write"
+
+    def __init__(self, max_rows: int, max_delay: float) -> None:
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._batch: _Batch[ItemT, ResultT] | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit_many(self, items: list[ItemT]) -> list[ResultT]:
+        loop = asyncio.get_running_loop()
+        futures = []
+        for item in items:
+            batch = self._batch
+            if batch is None:
+                batch = self._batch = _Batch()
+                task = loop.create_task(self._run(batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            future: asyncio.Future[ResultT] = loop.create_future()
+            batch.items.append(item)
+            batch.futures.append(future)
+            futures.append(future)
+            if len(batch.items) >= self.max_rows:
+                self._batch = None
+                batch.full.set()
+        return list(await asyncio.gather(*futures))
+
+    async def _run(self, batch: _Batch[ItemT, ResultT]) -> None:
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(batch.full.wait(), self.max_delay)
+        if self._batch is batch:
+            self._batch = None
+        try:
+            results = await self._write(batch.items)
+        except Exception as exc:  # noqa: BLE001
+            logger.exception("%s failed", self.name, extra={"rows": len(batch.items)})
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for future, result in zip(batch.futures, results, strict=True):
+            if not future.done():
+                future.set_result(result)
+
+    @abc.abstractmethod
+    async def _write(self, items: list[ItemT]) -> list[ResultT]:
+        """Write one batch; returns one result per item, in order."""
+
+
+class AlertIngestor(_GroupWriter[dict[str, Any], bool]):
+    """Group-commit writer for webhook alerts.
+
+    Concurrent requests are collected for up to ``max_delay`` seconds (or ``max_rows`` rows)
+    and written with a single ``INSERT ... ON CONFLICT DO NOTHING RETURNING id``. Each caller
+    learns whether its row was newly inserted or a duplicate.
+    """
+
+    name = "alert group commit"
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        max_rows: int = 500,
+        max_delay: float = 0.005,
+    ) -> None:
+        super().__init__(max_rows, max_delay)
+        self.session_factory = session_factory
+
+    async def submit(self, row: dict[str, Any]) -> bool:
+        """Queue ``row`` for the next group commit; True if inserted, False if duplicate."""
+        return (await self.submit_many([row]))[0]
+
+    async def _write(self, rows: list[dict[str, Any]]) -> list[bool]:
+        inserted = await self._flush(rows)
+        results = []
+        for row in rows:
+            # an id repeated inside one batch is only "new" for its first occurrence
+            results.append(row["id"] in inserted)
+            inserted.discard(row["id"])
+        return results
+
+    async def _flush(self, rows: list[dict[str, Any]]) -> set:
+        unique: dict[Any, dict[str, Any]] = {}
+        for row in rows:
+            unique.setdefault(row["id"], row)
+        async with self.session_factory() as session:
+            insert = _INSERTS[session.bind.dialect.name]
+            stmt = (
+                insert(models.Alert)
+                .values(list(unique.values()))
+                .on_conflict_do_nothing(index_elements=["id"])
+                .returning(models.Alert.id)
+            )
+            result = await session.execute(stmt)
+            inserted = set(result.scalars())
+            await session.commit()
+        return inserted
+
+
+class TradeDispatcher(_GroupWriter[tuple[str, str], None]):
+    """Coalesces queued alert ids into batch task messages of at most ``max_rows`` ids.
+
+    Ids are grouped by shard queue and each group is sent with a ``shard_key`` so the router
+    keeps one writer per symbol: ``publish(alert_ids, shard_key=symbol)`` is a blocking broker
+    call (e.g. ``enqueue_trade_batch.delay``) and runs in a worker thread.
+    """
+
+    name = "trade dispatch"
+
+    def __init__(self, publish: Callable[..., Any], max_rows: int, max_delay: float) -> None:
+        super().__init__(max_rows, max_delay)
+        self.publish = publish
+
+    async def dispatch(self, alert_id: str, symbol: str) -> None:
+        await self.submit_many([(alert_id, symbol)])
+
+    def _publish(self, items: list[tuple[str, str]]) -> None:
+        for group in group_by_queue(items).values():
+            self.publish([alert_id for alert_id, _ in group], shard_key=group[0][1])
+
+    async def _write(self, items: list[tuple[str, str]]) -> list[None]:
+        await asyncio.to_thread(self._publish, items)
+        return [None] * len(items)
+
+
+@lru_cache
+def get_alert_ingestor() -> AlertIngestor:
+    settings = get_settings()
+    return AlertIngestor(
+        max_rows=settings.ingest_max_rows, max_delay=settings.ingest_max_delay_ms / 1000
+    )
@@ -1,33 +1,131 @@
 from __future__ import annotations
 
 import logging
+import time
 
 from app.config import Settings, get_settings
-from app.services.coinbase import CoinbaseClient
+from app.metrics import quote_sources
+from app.services.coinbase import AsyncCoinbaseClient, BidAsk, CoinbaseClient
+from app.services.quotes import QuoteCache, get_quote_cache
+from app.services.topofbook import (
+    AsyncTopOfBookStore,
+    TopOfBook,
+    TopOfBookStore,
+    get_top_of_book_store,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class QuoteUnavailable(RuntimeError):
+    """No fresh quote and no stale one within ``ORDER_SLIPPAGE_PCT`` of the alert price."""
+
+
+def _offline_price(settings: Settings, symbol: str, fallback: float | None) -> float | None:
+    """Price to use without calling Coinbase (paper mode without API keys), else None."""
+    if settings.trading_mode == "paper" and not settings.coinbase_api_key:
+        if fallback is not None:
+            logger.info("using fallback price for %s in paper mode", symbol)
+            return fallback
+        return 0.0
+    return None
+
+
+def _unpriced(
+    settings: Settings, symbol: str, fallback: float | None, exc: Exception | None
+) -> float:
+    """Paper trading may fill at the alert price without a quote; live trading must not."""
+    if settings.trading_mode == "paper" and fallback is not None:
+        logger.warning("market data fallback", extra={"symbol": symbol, "error": str(exc)})
+        return fallback
+    raise QuoteUnavailable(f"no usable quote for {symbol}") from exc
+
+
+def _streamed_mid(settings: Settings, book: TopOfBook | None) -> float | None:
+    """Mid from the stream's top of book if it is fresh enough to trade on."""
+    if book is None or not book.mid:
+        return None
+    if book.age(time.time()) > settings.quote_stream_max_age_ms / 1000:
+        return None
+    quote_sources.labels("stream").inc()
+    return book.mid
+
+
+def _mid(bid_ask: BidAsk) -> float:
+    if bid_ask.best_bid and bid_ask.best_ask:
+        return (bid_ask.best_bid + bid_ask.best_ask) / 2
+    return bid_ask.best_ask or bid_ask.best_bid or 0.0
+
+
 class MarketDataService:
     def __init__(
-        self, client: CoinbaseClient | None = None, settings: Settings | None = None
+        self,
+        client: CoinbaseClient | None = None,
+        settings: Settings | None = None,
+        cache: QuoteCache | None = None,
+        books: TopOfBookStore | None = None,
     ) -> None:
         self.client = client or CoinbaseClient(settings)
         self.settings = settings or get_settings()
+        self.cache = cache or get_quote_cache()
+        self.books = books or get_top_of_book_store()
+
+    def _fetch_mid(self, symbol: str) -> float:
+        if self.books is not None:
+            streamed = _streamed_mid(self.settings, self.books.read(symbol))
+            if streamed is not None:
+                return streamed
+        quote_sources.labels("rest").inc()
+        return _mid(self.client.get_best_bid_ask(symbol))
 
     def get_mid_price(self, symbol: str, fallback: float | None = None) -> float:
-        if self.settings.trading_mode == "paper" and not self.settings.coinbase_api_key:
-            if fallback is not None:
-                logger.info("using fallback price for %s in paper mode", symbol)
-                return fallback
-            return 0.0
+        offline = _offline_price(self.settings, symbol, fallback)
+        if offline is not None:
+            return offline
+        try:
+            mid = self.cache.get(
+                symbol,
+                lambda: self._fetch_mid(symbol),
+                reference=fallback,
+                tolerance=self.settings.order_slippage_pct,
+            )
+        except Exception as exc:  # noqa: BLE001
+            return _unpriced(self.settings, symbol, fallback, exc)
+        return mid or _unpriced(self.settings, symbol, fallback, None)
+
+
+class AsyncMarketDataService:
+    def __init__(
+        self,
+        client: AsyncCoinbaseClient,
+        settings: Settings | None = None,
+        cache: QuoteCache | None = None,
+        books: AsyncTopOfBookStore | None = None,
+    ) -> None:
+        self.client = client
+        self.settings = settings or get_settings()
+        self.cache = cache or get_quote_cache()
+        self.books = books
+
+    async def _fetch_mid(self, symbol: str) -> float:
+        if self.books is not None:
+            streamed = _streamed_mid(self.settings, await self.books.read(symbol))
+            if streamed is not None:
+                return streamed
+        quote_sources.labels("rest").inc()
+        return _mid(await self.client.get_best_bid_ask(symbol))
+
+    async def get_mid_price(self, symbol: str, fallback: float | None = None) -> float:
+        offline = _offline_price(self.settings, symbol, fallback)
+        if offline is not None:
+            return offline
         try:
-            bid_ask = self.client.get_best_bid_ask(symbol)
-        except Exception as exc:  # pragma: no cover - network dependent
-            if fallback is not None:
-                logger.warning("market data fallback", extra={"symbol": symbol, "error": str(exc)})
-                return fallback
-            raise
-        if bid_ask.best_bid and bid_ask.best_ask:
-            return (bid_ask.best_bid + bid_ask.best_ask) / 2
-        return bid_ask.best_ask or bid_ask.best_bid or (fallback or 0.0)
+            mid = await self.cache.aget(
+                symbol,
+                lambda: self._fetch_mid(symbol),
+                reference=fallback,
+                tolerance=self.settings.order_slippage_pct,
+            )
+        except Exception as exc:  # noqa: BLE001
+            return _unpriced(self.settings, symbol, fallback, exc)
+        return mid or _unpriced(self.settings, symbol, fallback, None)
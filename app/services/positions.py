@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.metrics import position_conflicts
+
+logger = logging.getLogger(__name__)
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+_MAX_ATTEMPTS = 5
+
+
+class PositionConflict(RuntimeError):
+    """A symbol kept changing under us for ``_MAX_ATTEMPTS`` compare-and-swap rounds."""
+
+
+@dataclass(frozen=True, slots=True)
+class PositionRecord:
+    qty: float = 0.0
+    avg_price: float = 0.0
+    # -1 means the symbol has no row yet
+    version: int = -1
+
+    def after_fill(self, side: str, qty: float, price: float) -> PositionRecord:
+        if side == "buy":
+            total_qty = self.qty + qty
+            avg_price = (
+                (self.qty * self.avg_price + qty * price) / total_qty if total_qty else price
+            )
+            return PositionRecord(total_qty, avg_price, self.version + 1)
+        return PositionRecord(self.qty - qty, self.avg_price, self.version + 1)
+
+
+_FLAT = PositionRecord()
+
+
+class PositionBook:
+    """Per-worker copy of ``positions`` for zero-query risk checks.
+
+    All rows are loaded once; writes are ``UPDATE ... WHERE version = :seen`` on the caller's
+    session, and a symbol is re-read only when that update misses because another writer moved
+    its version. Records written by a transaction become visible through ``publish`` after
+    the caller commits, so a rollback never leaks into the book.
+    """
+
+    def __init__(self) -> None:
+        self._records: dict[str, PositionRecord] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, db: Session) -> None:
+        rows = db.execute(
+            select(
+                models.Position.symbol,
+                models.Position.qty,
+                models.Position.avg_price,
+                models.Position.version,
+            )
+        ).all()
+        with self._lock:
+            self._records = {
+                symbol: PositionRecord(float(qty), float(avg_price), version)
+                for symbol, qty, avg_price, version in rows
+            }
+            self._loaded = True
+        logger.info("position book loaded", extra={"symbols": len(rows)})
+
+    def invalidate(self) -> None:
+        """Forget everything; the next read reloads the whole book."""
+        with self._lock:
+            self._records = {}
+            self._loaded = False
+
+    def get(self, db: Session, symbol: str) -> PositionRecord:
+        if not self._loaded:
+            self.load(db)
+        return self._records.get(symbol, _FLAT)
+
+    def refresh(self, db: Session, symbol: str) -> PositionRecord:
+        row = db.execute(
+            select(models.Position.qty, models.Position.avg_price, models.Position.version).where(
+                models.Position.symbol == symbol
+            )
+        ).first()
+        record = PositionRecord(float(row[0]), float(row[1]), row[2]) if row else _FLAT
+        with self._lock:
+            self._records[symbol] = record
+        return record
+
+    def apply_fill(
+        self, db: Session, symbol: str, side: str, qty: float, price: float
+    ) -> PositionRecord:
+        """Write a fill into ``symbol``'s row; the returned record still needs ``publish``."""
+        current = self.get(db, symbol)
+        for _ in range(_MAX_ATTEMPTS):
+            record = current.after_fill(side, qty, price)
+            if self._swap(db, symbol, current, record):
+                return record
+            position_conflicts.inc()
+            current = self.refresh(db, symbol)
+        raise PositionConflict(symbol)
+
+    def publish(self, records: dict[str, PositionRecord]) -> None:
+        with self._lock:
+            self._records.update(records)
+
+    def _swap(
+        self, db: Session, symbol: str, current: PositionRecord, record: PositionRecord
+    ) -> bool:
+        now = dt.datetime.utcnow()
+        if current.version < 0:
+            insert = _INSERTS[db.get_bind().dialect.name]
+            stmt = (
+                insert(models.Position)
+                .values(
+                    symbol=symbol,
+                    qty=record.qty,
+                    avg_price=record.avg_price,
+                    version=record.version,
+                    updated_at=now,
+                )
+                .on_conflict_do_nothing(index_elements=["symbol"])
+            )
+        else:
+            stmt = (
+                update(models.Position)
+                .where(
+                    models.Position.symbol == symbol,
+                    models.Position.version == current.version,
+                )
+                .values(
+                    qty=record.qty,
+                    avg_price=record.avg_price,
+                    version=record.version,
+                    updated_at=now,
+                )
+            )
+        return db.execute(stmt).rowcount == 1
+
+
+@lru_cache
+def get_position_book() -> PositionBook:
+    return PositionBook()
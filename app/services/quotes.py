@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from functools import lru_cache
+
+from app.config import get_settings
+from app.metrics import quote_age, quote_cache_requests
+
+
+@dataclass(frozen=True)
+class CachedQuote:
+    mid: float
+    fetched_at: float
+
+    def age(self, now: float) -> float:
+        return now - self.fetched_at
+
+
+def parse_max_ages(spec: str) -> dict[str, float]:
+    """Parse ``QUOTE_MAX_AGE_OVERRIDES``: ``SYMBOL=MILLISECONDS`` entries separated by ``;``."""
+    ages = {}
+    for entry in spec.split(";"):
+        symbol, _, millis = entry.strip().partition("=")
+        if symbol:
+            ages[symbol.strip()] = float(millis) / 1000
+    return ages
+
+
+class QuoteCache:
+    """Per-process mid-price cache with single-flight fetches.
+
+    A quote younger than its symbol's max age is served as is. Otherwise one caller fetches it
+    while concurrent callers for the same symbol wait on that fetch. If the fetch fails, a
+    quote up to ``max_stale`` old is still served when it lies within ``tolerance`` of the
+    caller's reference price; past that the error propagates.
+    """
+
+    def __init__(
+        self,
+        max_age: float = 0.5,
+        max_ages: dict[str, float] | None = None,
+        max_stale: float = 5.0,
+    ) -> None:
+        self.max_age = max_age
+        self.max_ages = max_ages or {}
+        self.max_stale = max_stale
+        self._quotes: dict[str, CachedQuote] = {}
+        self._inflight: dict[str, Future[float]] = {}
+        self._ainflight: dict[str, asyncio.Future[float]] = {}
+        self._lock = threading.Lock()
+
+    def max_age_for(self, symbol: str) -> float:
+        return self.max_ages.get(symbol, self.max_age)
+
+    def put(self, symbol: str, mid: float, fetched_at: float | None = None) -> None:
+        with self._lock:
+            self._quotes[symbol] = CachedQuote(
+                mid, time.monotonic() if fetched_at is None else fetched_at
+            )
+
+    def _fresh(self, symbol: str, now: float) -> tuple[CachedQuote | None, bool]:
+        quote = self._quotes.get(symbol)
+        return quote, quote is not None and quote.age(now) <= self.max_age_for(symbol)
+
+    def _serve(self, result: str, quote: CachedQuote, now: float) -> float:
+        quote_cache_requests.labels(result).inc()
+        quote_age.observe(quote.age(now))
+        return quote.mid
+
+    def _stale_or_raise(
+        self,
+        quote: CachedQuote | None,
+        reference: float | None,
+        tolerance: float,
+        exc: BaseException,
+    ) -> float:
+        now = time.monotonic()
+        if (
+            quote is not None
+            and reference
+            and quote.age(now) <= self.max_stale
+            and abs(quote.mid - reference) / reference <= tolerance
+        ):
+            return self._serve("stale", quote, now)
+        raise exc
+
+    def get(
+        self,
+        symbol: str,
+        fetch: Callable[[], float],
+        reference: float | None = None,
+        tolerance: float = 0.0,
+    ) -> float:
+        now = time.monotonic()
+        with self._lock:
+            quote, fresh = self._fresh(symbol, now)
+            if fresh:
+                return self._serve("hit", quote, now)
+            future = self._inflight.get(symbol)
+            leader = future is None
+            if leader:
+                future = self._inflight[symbol] = Future()
+        quote_cache_requests.labels("miss" if leader else "shared").inc()
+        if leader:
+            try:
+                mid = fetch()
+                if mid:
+                    self.put(symbol, mid)
+                future.set_result(mid)
+            except BaseException as exc:  # noqa: BLE001
+                future.set_exception(exc)
+            finally:
+                with self._lock:
+                    self._inflight.pop(symbol, None)
+        try:
+            return future.result()
+        except Exception as exc:  # noqa: BLE001
+            return self._stale_or_raise(quote, reference, tolerance, exc)
+
+    async def aget(
+        self,
+        symbol: str,
+        fetch: Callable[[], Awaitable[float]],
+        reference: float | None = None,
+        tolerance: float = 0.0,
+    ) -> float:
+        """:meth:`get` for coroutines; waiters share one fetch task per event loop."""
+        now = time.monotonic()
+        quote, fresh = self._fresh(symbol, now)
+        if fresh:
+            return self._serve("hit", quote, now)
+        future = self._ainflight.get(symbol)
+        quote_cache_requests.labels("shared" if future else "miss").inc()
+        if future is None:
+            future = self._ainflight[symbol] = asyncio.ensure_future(self._afetch(symbol, fetch))
+        try:
+            return await asyncio.shield(future)
+        except Exception as exc:  # noqa: BLE001
+            return self._stale_or_raise(quote, reference, tolerance, exc)
+
+    async def _afetch(self, symbol: str, fetch: Callable[[], Awaitable[float]]) -> float:
+        try:
+            mid = await fetch()
+            if mid:
+                self.put(symbol, mid)
+            return mid
+        finally:
+            self._ainflight.pop(symbol, None)
+
+
+@lru_cache
+def get_quote_cache() -> QuoteCache:
+    settings = get_settings()
+    return QuoteCache(
+        max_age=settings.quote_max_age_ms / 1000,
+        max_ages=parse_max_ages(settings.quote_max_age_overrides),
+        max_stale=settings.quote_max_stale_ms / 1000,
+    )
@@ -0,0 +1,277 @@
+"""Client-side budget for Coinbase REST calls, shared by every worker process through Redis.
+
+Coinbase limits private (signed) endpoints per API key and public ones per IP. Requests take a
+token from the matching bucket before they go out instead of finding out from a 429. Orders may
+drain a bucket completely; quote and account reads must leave ``order_reserve`` tokens behind,
+so a burst of reads cannot starve order placement. A 429 (or an exhausted
+``x-ratelimit-remaining``) pauses the whole scope until ``Retry-After`` / the reset time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+
+import redis
+import redis.asyncio as aioredis
+
+from app.config import Settings, get_settings
+from app.metrics import coinbase_rate_limited
+
+logger = logging.getLogger(__name__)
+
+ORDER = "order"
+READ = "read"
+
+# KEYS: bucket, pause marker; ARGV: now, burst, rate, reserve.
+# Returns 0 when a token was spent, else milliseconds until one could be.
+_ACQUIRE_LUA = """
+local now = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+local paused = tonumber(redis.call('GET', KEYS[2]) or '0')
+if paused > now then
+  return math.ceil((paused - now) * 1000)
+end
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+if tokens - reserve < 1 then
+  return math.max(1, math.ceil((1 + reserve - tokens) / rate * 1000))
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    burst: float
+    rate: float
+
+
+def scope_for(path: str) -> str:
+    """``public`` for unauthenticated market endpoints, ``private`` for everything signed."""
+    return "public" if path.startswith("/brokerage/market/") else "private"
+
+
+def priority_for(method: str, path: str) -> str:
+    return ORDER if method.upper() == "POST" and path.startswith("/brokerage/orders") else READ
+
+
+def _header_float(headers: Mapping, name: str) -> float | None:
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def pause_seconds(status_code: int, headers: Mapping, now: float) -> float:
+    """How long the server asked us to back off, from ``Retry-After`` or the rate-limit headers."""
+    if status_code == 429:
+        retry_after = headers.get("retry-after")
+        seconds = _header_float(headers, "retry-after")
+        if seconds is None and isinstance(retry_after, str):
+            try:
+                seconds = email.utils.parsedate_to_datetime(retry_after).timestamp() - now
+            except (TypeError, ValueError):
+                seconds = None
+        return max(seconds if seconds is not None else 1.0, 0.0)
+    if _header_float(headers, "x-ratelimit-remaining") == 0:
+        reset = _header_float(headers, "x-ratelimit-reset")
+        if reset is not None:
+            # an epoch timestamp or seconds until the window resets
+            return max(reset - now if reset > 1e9 else reset, 0.0)
+    return 0.0
+
+
+class _MemoryBudget:
+    """Process-local buckets when Redis is unreachable (limits are then per process)."""
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._paused: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def take(self, scope: str, limit: RateLimit, reserve: float, now: float) -> float:
+        with self._lock:
+            paused = self._paused.get(scope, 0.0)
+            if paused > now:
+                return paused - now
+            tokens, ts = self._buckets.get(scope, (limit.burst, now))
+            tokens = min(limit.burst, tokens + max(0.0, now - ts) * limit.rate)
+            if tokens - reserve < 1:
+                return (1 + reserve - tokens) / limit.rate
+            self._buckets[scope] = (tokens - 1, now)
+            return 0.0
+
+    def pause(self, scope: str, until: float) -> None:
+        with self._lock:
+            self._paused[scope] = max(self._paused.get(scope, 0.0), until)
+
+
+class _RateLimiterBase:
+    """Shared buckets in Redis; a Redis failure falls back to ``memory`` for ``redis_cooldown``."""
+
+    key_prefix = "coinbase:ratelimit:"
+
+    def __init__(
+        self,
+        redis_client: redis.Redis | aioredis.Redis | None,
+        limits: dict[str, RateLimit],
+        order_reserve: float = 0.0,
+        max_wait: dict[str, float] | None = None,
+        redis_cooldown: float = 5.0,
+    ) -> None:
+        self.redis = redis_client
+        self.limits = limits
+        self.order_reserve = order_reserve
+        self.max_wait = max_wait or {ORDER: 2.0, READ: 0.25}
+        self.redis_cooldown = redis_cooldown
+        self.memory = _MemoryBudget()
+        self._script = redis_client.register_script(_ACQUIRE_LUA) if redis_client else None
+        self._redis_down_until = 0.0
+
+    @classmethod
+    def from_settings(
+        cls, redis_client: redis.Redis | aioredis.Redis | None, settings: Settings
+    ) -> _RateLimiterBase:
+        return cls(
+            redis_client,
+            {
+                "private": RateLimit(settings.coinbase_private_rps, settings.coinbase_private_rps),
+                "public": RateLimit(settings.coinbase_public_rps, settings.coinbase_public_rps),
+            },
+            order_reserve=settings.coinbase_order_reserve,
+            max_wait={
+                ORDER: settings.coinbase_order_max_wait_ms / 1000,
+                READ: settings.coinbase_read_max_wait_ms / 1000,
+            },
+        )
+
+    def _args(self, scope: str, priority: str, now: float) -> dict:
+        limit = self.limits[scope]
+        reserve = 0.0 if priority == ORDER else self.order_reserve
+        return {
+            "keys": [f"{self.key_prefix}{scope}", f"{self.key_prefix}{scope}:paused"],
+            "args": [now, limit.burst, limit.rate, reserve],
+        }
+
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_down_until
+
+    def _redis_failed(self, exc: Exception) -> None:
+        # back off so an unreachable Redis costs one failed call per cooldown, not per request
+        self._redis_down_until = time.monotonic() + self.redis_cooldown
+        logger.warning("rate limiter redis unavailable", extra={"error": str(exc)})
+
+    def _memory_take(self, scope: str, priority: str, now: float) -> float:
+        reserve = 0.0 if priority == ORDER else self.order_reserve
+        return self.memory.take(scope, self.limits[scope], reserve, now)
+
+    @staticmethod
+    def _outcome(priority: str, waited: bool, granted: bool) -> bool:
+        if waited or not granted:
+            coinbase_rate_limited.labels(priority, "waited" if granted else "rejected").inc()
+        return granted
+
+
+class RateLimiter(_RateLimiterBase):
+    def acquire(self, scope: str, priority: str) -> bool:
+        """Wait for a token; False when none frees up within ``max_wait`` for ``priority``."""
+        deadline = time.monotonic() + self.max_wait[priority]
+        waited = False
+        while True:
+            wait = self._try(scope, priority)
+            if wait <= 0:
+                return self._outcome(priority, waited, True)
+            if time.monotonic() + wait > deadline:
+                return self._outcome(priority, waited, False)
+            waited = True
+            time.sleep(wait)
+
+    def _try(self, scope: str, priority: str) -> float:
+        now = time.time()
+        if self._redis_available():
+            try:
+                return self._script(**self._args(scope, priority, now)) / 1000
+            except redis.RedisError as exc:
+                self._redis_failed(exc)
+        return self._memory_take(scope, priority, now)
+
+    def observe(self, scope: str, status_code: int, headers: Mapping) -> None:
+        """Pause ``scope`` for every process when the response asks us to back off."""
+        now = time.time()
+        seconds = pause_seconds(status_code, headers, now)
+        if seconds <= 0:
+            return
+        logger.warning("coinbase rate limit pause", extra={"scope": scope, "seconds": seconds})
+        self.memory.pause(scope, now + seconds)
+        if self._redis_available():
+            try:
+                self.redis.set(
+                    f"{self.key_prefix}{scope}:paused",
+                    now + seconds,
+                    px=max(int(seconds * 1000), 1),
+                )
+            except redis.RedisError as exc:
+                self._redis_failed(exc)
+
+
+class AsyncRateLimiter(_RateLimiterBase):
+    """:class:`RateLimiter` over ``redis.asyncio``, sharing the same buckets."""
+
+    async def acquire(self, scope: str, priority: str) -> bool:
+        deadline = time.monotonic() + self.max_wait[priority]
+        waited = False
+        while True:
+            wait = await self._try(scope, priority)
+            if wait <= 0:
+                return self._outcome(priority, waited, True)
+            if time.monotonic() + wait > deadline:
+                return self._outcome(priority, waited, False)
+            waited = True
+            await asyncio.sleep(wait)
+
+    async def _try(self, scope: str, priority: str) -> float:
+        now = time.time()
+        if self._redis_available():
+            try:
+                return await self._script(**self._args(scope, priority, now)) / 1000
+            except redis.RedisError as exc:
+                self._redis_failed(exc)
+        return self._memory_take(scope, priority, now)
+
+    async def observe(self, scope: str, status_code: int, headers: Mapping) -> None:
+        now = time.time()
+        seconds = pause_seconds(status_code, headers, now)
+        if seconds <= 0:
+            return
+        logger.warning("coinbase rate limit pause", extra={"scope": scope, "seconds": seconds})
+        self.memory.pause(scope, now + seconds)
+        if self._redis_available():
+            try:
+                await self.redis.set(
+                    f"{self.key_prefix}{scope}:paused",
+                    now + seconds,
+                    px=max(int(seconds * 1000), 1),
+                )
+            except redis.RedisError as exc:
+                self._redis_failed(exc)
+
+
+@lru_cache
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter on the shared Redis buckets, per-process ones while Redis is down."""
+    settings = get_settings()
+    client = redis.Redis.from_url(settings.redis_url, socket_timeout=settings.redis_socket_timeout)
+    return RateLimiter.from_settings(client, settings)
@@ -1,25 +1,47 @@
 from __future__ import annotations
 
 import datetime as dt
+import uuid
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
 
-from sqlalchemy import select
+from sqlalchemy import Connection, delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from app.config import Settings
 from app.db import models
+from app.services.events import get_event_sink
+from app.services.positions import PositionBook, get_position_book
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+@dataclass
+class RiskReservation:
+    trade_day: str
+    alert_id: uuid.UUID
+    notional: float
+    # committed on its own; False when it is part of the caller's transaction instead
+    shared: bool = True
 
 
 @dataclass
 class RiskResult:
     ok: bool
     reason: str | None = None
+    reservation: RiskReservation | None = None
 
 
 class RiskEngine:
-    def __init__(self, db: Session, settings: Settings):
+    def __init__(self, db: Session, settings: Settings, positions: PositionBook | None = None):
         self.db = db
         self.settings = settings
+        self.positions = positions or get_position_book()
+        # events held for the write-behind sink until the caller's unit of work commits
+        self._pending_events: list[tuple[str, dict]] = []
 
     def _portfolio_notional(self) -> float:
         # In paper mode we use configured cash; in live mode we assume same for now
@@ -29,9 +51,7 @@ class RiskEngine:
         self, symbol: str, proposed_qty: float, price: float, side: str
     ) -> RiskResult:
         limit = self._portfolio_notional() * self.settings.max_pos_pct
-        stmt = select(models.Position).where(models.Position.symbol == symbol)
-        position = self.db.execute(stmt).scalar_one_or_none()
-        current_qty = float(position.qty) if position else 0.0
+        current_qty = self.positions.get(self.db, symbol).qty
         delta_qty = proposed_qty if side == "buy" else -proposed_qty
         projected_qty = current_qty + delta_qty
         projected_notional = abs(projected_qty * price)
@@ -39,21 +59,112 @@ class RiskEngine:
             return RiskResult(False, "position limit exceeded")
         return RiskResult(True)
 
-    def check_daily_risk(self, proposed_notional: float) -> RiskResult:
+    def _shared_ledger(self) -> bool:
+        # single-writer sqlite: a second connection would wait on the session's own write lock
+        return self.db.get_bind().dialect.name != "sqlite"
+
+    @contextmanager
+    def _ledger(self) -> Iterator[Connection | Session]:
+        """Run daily-risk statements in their own short transaction.
+
+        A reservation is visible to other workers immediately and no lock on the
+        ``daily_risk`` row is held while the rest of the pipeline runs. On SQLite the
+        statements run in the caller's unit of work instead and commit or roll back with it.
+        """
+        if not self._shared_ledger():
+            yield self.db
+            return
+        bind = self.db.get_bind()
+        engine = getattr(bind, "engine", bind)
+        with engine.begin() as conn:
+            yield conn
+
+    def reserve_daily_risk(self, notional: float, alert_id: uuid.UUID) -> RiskReservation | None:
+        """Atomically add ``notional`` to today's usage if it stays within the budget.
+
+        The reservation is recorded against ``alert_id`` in the same transaction: a redelivered
+        alert gets its earlier reservation back instead of being charged twice, and one left
+        behind by a worker that died before committing is found by :meth:`reclaim_daily_risk`.
+        """
         today = dt.datetime.utcnow().date().isoformat()
-        stmt = select(models.DailyRisk).where(models.DailyRisk.trade_day == today)
-        record = self.db.execute(stmt).scalar_one_or_none()
         limit = self._portfolio_notional() * self.settings.max_daily_risk_pct
-        current = float(record.notional_used) if record else 0.0
-        if current + proposed_notional > limit:
+        if notional > limit:
+            return None
+        shared = self._shared_ledger()
+        held = models.DailyRiskReservation
+        now = dt.datetime.utcnow()
+        upsert = _INSERTS[self.db.get_bind().dialect.name](models.DailyRisk).values(
+            trade_day=today, notional_used=notional, updated_at=now
+        )
+        used = models.DailyRisk.notional_used + upsert.excluded.notional_used
+        stmt = upsert.on_conflict_do_update(
+            index_elements=["trade_day"],
+            set_={"notional_used": used, "updated_at": now},
+            where=used <= limit,
+        ).returning(models.DailyRisk.notional_used)
+        with self._ledger() as conn:
+            previous = conn.execute(
+                select(held.notional).where(held.trade_day == today, held.alert_id == alert_id)
+            ).scalar()
+            if previous is not None:
+                return RiskReservation(today, alert_id, float(previous), shared)
+            if conn.execute(stmt).first() is None:
+                return None
+            conn.execute(
+                insert(held).values(
+                    trade_day=today, alert_id=alert_id, notional=notional, created_at=now
+                )
+            )
+        return RiskReservation(today, alert_id, notional, shared)
+
+    def release_daily_risk(self, reservation: RiskReservation) -> None:
+        """Give back a reservation whose order was blocked or not filled."""
+        held = models.DailyRiskReservation
+        with self._ledger() as conn:
+            self._give_back(
+                conn, held.trade_day == reservation.trade_day, held.alert_id == reservation.alert_id
+            )
+
+    def reclaim_daily_risk(self, max_age: float) -> float:
+        """Give back today's reservations older than ``max_age`` seconds with no order behind them.
+
+        Such a reservation was taken by an alert whose unit of work never committed (the worker
+        died in between). Reservations of earlier days are dropped. Returns the notional given
+        back.
+        """
+        held = models.DailyRiskReservation
+        today = dt.datetime.utcnow().date().isoformat()
+        cutoff = dt.datetime.utcnow() - dt.timedelta(seconds=max_age)
+        ordered = select(models.Order.id).where(models.Order.alert_id == held.alert_id).exists()
+        with self._ledger() as conn:
+            conn.execute(delete(held).where(held.trade_day < today))
+            return self._give_back(
+                conn, held.trade_day == today, held.created_at < cutoff, ~ordered
+            )
+
+    @staticmethod
+    def _give_back(conn: Connection | Session, *where) -> float:
+        # the amount comes from the rows actually deleted, so a reservation released and
+        # reclaimed at the same time is only given back once
+        held = models.DailyRiskReservation
+        rows = conn.execute(delete(held).where(*where).returning(held.trade_day, held.notional))
+        per_day: dict[str, float] = defaultdict(float)
+        for trade_day, notional in rows:
+            per_day[trade_day] += float(notional)
+        now = dt.datetime.utcnow()
+        for trade_day, notional in per_day.items():
+            conn.execute(
+                update(models.DailyRisk)
+                .where(models.DailyRisk.trade_day == trade_day)
+                .values(notional_used=models.DailyRisk.notional_used - notional, updated_at=now)
+            )
+        return sum(per_day.values())
+
+    def check_daily_risk(self, proposed_notional: float, alert_id: uuid.UUID) -> RiskResult:
+        reservation = self.reserve_daily_risk(proposed_notional, alert_id)
+        if reservation is None:
             return RiskResult(False, "daily risk limit exceeded")
-        if record:
-            record.notional_used = current + proposed_notional
-        else:
-            record = models.DailyRisk(trade_day=today, notional_used=proposed_notional)
-            self.db.add(record)
-        self.db.commit()
-        return RiskResult(True)
+        return RiskResult(True, reservation=reservation)
 
     def check_slippage(self, alert_price: float, market_price: float) -> RiskResult:
         deviation = abs(market_price - alert_price) / alert_price if alert_price else 0
@@ -62,6 +173,30 @@ class RiskEngine:
         return RiskResult(True)
 
     def record_risk_event(self, event_type: str, details: dict) -> None:
+        """Record an audit event as part of the caller's unit of work.
+
+        With a write-behind sink installed the event is held until ``publish_events``;
+        otherwise it is added to the session and commits with the trade.
+        """
+        if get_event_sink() is not None:
+            self._pending_events.append((event_type, details))
+            return
         event = models.RiskEvent(type=event_type, details=details)
         self.db.add(event)
-        self.db.commit()
+
+    def take_events(self) -> list[tuple[str, dict]]:
+        """Remove and return the held events, to publish later with ``publish_events``."""
+        events, self._pending_events = self._pending_events, []
+        return events
+
+    def publish_events(self, events: list[tuple[str, dict]] | None = None) -> None:
+        """Hand events of a committed unit of work (the held ones by default) to the sink."""
+        sink = get_event_sink()
+        if events is None:
+            events = self.take_events()
+        if sink is not None:
+            for event_type, details in events:
+                sink.emit(event_type, details)
+
+    def discard_events(self) -> None:
+        self._pending_events = []
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+import redis
+import redis.asyncio as aioredis
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "quote:"
+
+
+@dataclass(frozen=True)
+class TopOfBook:
+    bid: float
+    ask: float
+    # exchange event time and local receive time, both epoch seconds
+    exchange_ts: float
+    received_at: float
+
+    @property
+    def mid(self) -> float:
+        if self.bid and self.ask:
+            return (self.bid + self.ask) / 2
+        return self.ask or self.bid
+
+    def age(self, now: float | None = None) -> float:
+        return (time.time() if now is None else now) - self.received_at
+
+    def to_mapping(self) -> dict[str, float]:
+        return {
+            "bid": self.bid,
+            "ask": self.ask,
+            "ts": self.exchange_ts,
+            "recv": self.received_at,
+        }
+
+    @classmethod
+    def from_mapping(cls, mapping: dict) -> TopOfBook | None:
+        if not mapping:
+            return None
+        values = {
+            key.decode() if isinstance(key, bytes) else key: float(value)
+            for key, value in mapping.items()
+        }
+        return cls(values["bid"], values["ask"], values["ts"], values["recv"])
+
+
+class TopOfBookStore:
+    """Reads the ``quote:{symbol}`` hashes the market-data stream keeps current.
+
+    A Redis failure turns the store off for ``redis_cooldown`` seconds; callers then use REST.
+    """
+
+    def __init__(self, redis_client: redis.Redis, redis_cooldown: float = 5.0) -> None:
+        self.redis = redis_client
+        self.redis_cooldown = redis_cooldown
+        self._down_until = 0.0
+
+    def read(self, symbol: str) -> TopOfBook | None:
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            return TopOfBook.from_mapping(self.redis.hgetall(KEY_PREFIX + symbol))
+        except redis.RedisError as exc:
+            self._down_until = time.monotonic() + self.redis_cooldown
+            logger.warning("top-of-book store unavailable", extra={"error": str(exc)})
+            return None
+
+    def write_many(self, books: dict[str, TopOfBook], ttl_seconds: int = 60) -> None:
+        with self.redis.pipeline(transaction=False) as pipe:
+            for symbol, book in books.items():
+                pipe.hset(KEY_PREFIX + symbol, mapping=book.to_mapping())
+                pipe.expire(KEY_PREFIX + symbol, ttl_seconds)
+            pipe.execute()
+
+
+class AsyncTopOfBookStore:
+    """``redis.asyncio`` side of the store: the stream writes, the asyncio worker reads."""
+
+    def __init__(self, redis_client: aioredis.Redis, ttl_seconds: int = 60) -> None:
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    async def read(self, symbol: str) -> TopOfBook | None:
+        try:
+            return TopOfBook.from_mapping(await self.redis.hgetall(KEY_PREFIX + symbol))
+        except redis.RedisError as exc:
+            logger.warning("top-of-book store unavailable", extra={"error": str(exc)})
+            return None
+
+    async def write_many(self, books: dict[str, TopOfBook]) -> None:
+        # the TTL clears quotes of a stream that died, so readers fall back to REST
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for symbol, book in books.items():
+                pipe.hset(KEY_PREFIX + symbol, mapping=book.to_mapping())
+                pipe.expire(KEY_PREFIX + symbol, self.ttl_seconds)
+            await pipe.execute()
+
+
+@lru_cache
+def get_top_of_book_store() -> TopOfBookStore | None:
+    """The process's store, or None when neither the stream nor the prefetch fills it."""
+    settings = get_settings()
+    if not (settings.quote_stream_enabled or settings.quote_prefetch_seconds > 0):
+        return None
+    client = redis.Redis.from_url(settings.redis_url, socket_timeout=settings.redis_socket_timeout)
+    return TopOfBookStore(client)
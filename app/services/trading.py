@@ -2,34 +2,144 @@ from __future__ import annotations
 
 import logging
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.config import Settings
 from app.db import models
-from app.metrics import orders_filled, orders_sent, risk_blocked, trade_latency
+from app.metrics import (
+    orders_filled,
+    orders_sent,
+    risk_blocked,
+    trade_latency,
+    trade_stage_latency,
+)
 from app.services import marketdata, sizing
-from app.services.coinbase import CoinbaseClient
+from app.services.coinbase import CoinbaseClient, client_order_id_for, get_coinbase_client
+from app.services.events import get_event_sink
 from app.services.idempotency import throttle_symbol
-from app.services.risk import RiskEngine
+from app.services.positions import PositionRecord
+from app.services.risk import RiskEngine, RiskReservation, RiskResult
+from app.services.volatility import VolatilityEngine, get_volatility_engine
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass(frozen=True)
+class PreTrade:
+    """Throttle verdict and quote fetched ahead of ``execute_alert`` (by the asyncio worker)."""
+
+    allowed: bool
+    # None when allowed but no usable quote was found: the alert is blocked
+    market_price: float | None = None
+
+
+@lru_cache
+def _stage_pool(threads: int) -> ThreadPoolExecutor:
+    # created lazily so each prefork child gets its own threads after fork
+    return ThreadPoolExecutor(max_workers=threads, thread_name_prefix="pretrade")
+
+
 class TradingService:
-    def __init__(self, db: Session, settings: Settings):
+    def __init__(
+        self,
+        db: Session,
+        settings: Settings,
+        coinbase_client: CoinbaseClient | None = None,
+        volatility: VolatilityEngine | None = None,
+        batch_commit: bool = False,
+    ):
         self.db = db
         self.settings = settings
         self.risk = RiskEngine(db, settings)
-        self.coinbase_client = CoinbaseClient(settings)
+        self.positions = self.risk.positions
+        self._staged_positions: dict[str, PositionRecord] = {}
+        # with batch_commit the session's commits only release savepoints: events and
+        # reservations wait for the caller's outer commit (``batch_committed``/``batch_failed``)
+        self.batch_commit = batch_commit
+        self._batch_events: list[tuple[str, dict]] = []
+        self._batch_reserved: list[RiskReservation] = []
+        self.coinbase_client = coinbase_client or get_coinbase_client()
         self.marketdata = marketdata.MarketDataService(self.coinbase_client, settings)
+        self.volatility = volatility or get_volatility_engine()
 
     def _load_alert(self, alert_id: uuid.UUID) -> models.Alert | None:
-        stmt = select(models.Alert).where(models.Alert.id == alert_id)
-        return self.db.execute(stmt).scalar_one_or_none()
+        # identity-map hit when execute_alerts preloaded the batch
+        return self.db.get(models.Alert, alert_id)
 
-    def execute_alert(self, alert_id: uuid.UUID) -> None:
+    def execute_alerts(self, alert_ids: list[uuid.UUID]) -> None:
+        """Run a batch of alerts on this service's session and clients.
+
+        Alerts are loaded with one query (positions come from the in-memory book); a failing
+        alert is rolled back on its own and the rest of the batch continues.
+        """
+        # held in a local so the identity map (weakly referencing) keeps them for the loop
+        alerts = (
+            self.db.execute(select(models.Alert).where(models.Alert.id.in_(alert_ids)))
+            .scalars()
+            .all()
+        )
+        for alert_id in alert_ids:
+            try:
+                self.execute_alert(alert_id)
+            except Exception:  # noqa: BLE001
+                # execute_alert already rolled the alert back
+                logger.exception("trade task failed", extra={"alert_id": str(alert_id)})
+        del alerts
+
+    def execute_alert(self, alert_id: uuid.UUID, pretrade: PreTrade | None = None) -> None:
+        """Run one alert as a single unit of work.
+
+        The order, fill, position update and audit events commit together; on any failure
+        the transaction is rolled back and the daily-risk reservation is released. With
+        ``pretrade`` the throttle and quote stages are taken from it instead of run here.
+        """
+        reserved: list[RiskReservation] = []
+        self._staged_positions = {}
+        try:
+            self._execute(alert_id, reserved, pretrade)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            self.risk.discard_events()
+            for reservation in reserved:
+                # an unshared reservation was rolled back with the unit of work
+                if reservation.shared:
+                    self.risk.release_daily_risk(reservation)
+            raise
+        # the book is per process, so the batch's later alerts see this fill before the
+        # outer commit; batch_failed drops it again
+        self.positions.publish(self._staged_positions)
+        if self.batch_commit:
+            self._batch_events.extend(self.risk.take_events())
+            self._batch_reserved.extend(r for r in reserved if r.shared)
+            return
+        self.risk.publish_events()
+
+    def batch_committed(self) -> None:
+        """The caller's outer transaction committed: hand the batch's events to the sink."""
+        events, self._batch_events = self._batch_events, []
+        self._batch_reserved = []
+        self.risk.publish_events(events)
+
+    def batch_failed(self) -> None:
+        """The outer transaction rolled back: undo what the batch's alerts handed out."""
+        self.positions.invalidate()
+        self._batch_events = []
+        reserved, self._batch_reserved = self._batch_reserved, []
+        for reservation in reserved:
+            try:
+                self.risk.release_daily_risk(reservation)
+            except Exception:  # noqa: BLE001
+                logger.exception("daily risk release failed", extra={"day": reservation.trade_day})
+
+    def _execute(
+        self, alert_id: uuid.UUID, reserved: list[RiskReservation], pretrade: PreTrade | None
+    ) -> None:
         alert = self._load_alert(alert_id)
         if not alert:
             logger.warning("alert missing", extra={"alert_id": str(alert_id)})
@@ -43,40 +153,77 @@ class TradingService:
             self._risk_block(alert, "invalid_side")
             return
 
-        if not throttle_symbol(alert.symbol, self.settings.throttle_seconds):
-            self._risk_block(alert, "throttled")
-            return
-
         with trade_latency.time():
             alert_price = float(alert.price)
-            market_price = self.marketdata.get_mid_price(alert.symbol, fallback=alert_price)
-            cash = float(self.settings.paper_cash_usd)
-            qty, sizing_mode = sizing.position_size_vol_scaled(
-                market_price, None, self.settings.max_pos_pct, cash
-            )
-            if qty <= 0:
-                self._risk_block(alert, "qty<=0")
+            if pretrade is None:
+                pretrade = self._pretrade(alert, alert_price)
+            if not pretrade.allowed:
+                self._risk_block(alert, "throttled")
+                return
+            market_price = pretrade.market_price
+            if market_price is None:
+                self._risk_block(alert, "no_quote")
                 return
 
-            notional = qty * market_price
-            checks = [
-                self.risk.check_slippage(alert_price, market_price),
-                self.risk.check_position_limits(alert.symbol, qty, market_price, side),
-                self.risk.check_daily_risk(notional),
-            ]
-            for check in checks:
-                if not check.ok:
-                    self._risk_block(alert, check.reason or "risk_failed")
-                    return
+            with trade_stage_latency.labels("checks").time():
+                cash = float(self.settings.paper_cash_usd)
+                qty, sizing_mode = sizing.position_size_vol_scaled(
+                    market_price,
+                    self.volatility.atr(alert.symbol),
+                    self.settings.max_pos_pct,
+                    cash,
+                )
+                # in-memory checks short-circuit before the daily-risk reservation (a write)
+                if qty <= 0:
+                    check = RiskResult(False, "qty<=0")
+                else:
+                    check = self.risk.check_slippage(alert_price, market_price)
+                if check.ok:
+                    check = self.risk.check_position_limits(alert.symbol, qty, market_price, side)
+            if check.ok:
+                with trade_stage_latency.labels("reserve").time():
+                    check = self.risk.check_daily_risk(qty * market_price, alert.id)
+            if not check.ok:
+                self._risk_block(alert, check.reason or "risk_failed")
+                return
+            reservation = check.reservation
+            reserved.append(reservation)
 
             direction = 1 if side == "buy" else -1
             slippage_factor = self.settings.order_slippage_pct
             limit_price = market_price * (1 + direction * slippage_factor)
 
             if self.settings.trading_mode == "paper":
-                self._paper_fill(alert, qty, limit_price, market_price, sizing_mode, side)
-            else:
-                self._live_order(alert, qty, limit_price, sizing_mode, side)
+                with trade_stage_latency.labels("fill").time():
+                    self._paper_fill(alert, qty, limit_price, market_price, sizing_mode, side)
+                return
+            with trade_stage_latency.labels("order").time():
+                accepted = self._live_order(alert, qty, limit_price, sizing_mode, side)
+            if not accepted:
+                reserved.remove(reservation)
+                self.risk.release_daily_risk(reservation)
+                self._risk_block(alert, "order_rejected")
+
+    def _pretrade(self, alert: models.Alert, alert_price: float) -> PreTrade:
+        # the quote fetch overlaps the throttle round-trip; a throttled alert never waits on it
+        quote = _stage_pool(self.settings.pretrade_threads).submit(
+            self._fetch_quote, alert.symbol, alert_price
+        )
+        with trade_stage_latency.labels("throttle").time():
+            allowed = throttle_symbol(alert.symbol, self.settings.throttle_seconds, alert.strategy)
+        if not allowed:
+            quote.cancel()
+            return PreTrade(False)
+        with trade_stage_latency.labels("quote_wait").time():
+            try:
+                return PreTrade(True, quote.result())
+            except marketdata.QuoteUnavailable:
+                logger.warning("no usable quote", extra={"symbol": alert.symbol})
+                return PreTrade(True)
+
+    def _fetch_quote(self, symbol: str, fallback: float) -> float:
+        with trade_stage_latency.labels("quote").time():
+            return self.marketdata.get_mid_price(symbol, fallback=fallback)
 
     def _paper_fill(
         self,
@@ -87,7 +234,9 @@ class TradingService:
         sizing_mode: str,
         side: str,
     ) -> None:
+        # id assigned up front so the fill can reference it without a flush round-trip
         order = models.Order(
+            id=uuid.uuid4(),
             alert_id=alert.id,
             symbol=alert.symbol,
             side=side,
@@ -97,26 +246,13 @@ class TradingService:
             mode="paper",
         )
         self.db.add(order)
-        self.db.flush()
         orders_sent.inc()
         fill = models.Fill(order_id=order.id, symbol=alert.symbol, qty=qty, price=fill_price, fee=0)
         self.db.add(fill)
 
-        position = self.db.get(models.Position, alert.symbol)
-        if not position:
-            position = models.Position(symbol=alert.symbol, qty=0, avg_price=0)
-            self.db.add(position)
-        if side == "buy":
-            total_qty = float(position.qty) + qty
-            position.avg_price = (
-                (float(position.qty) * float(position.avg_price) + qty * fill_price) / total_qty
-                if total_qty
-                else fill_price
-            )
-            position.qty = total_qty
-        else:
-            position.qty = float(position.qty) - qty
-        self.db.commit()
+        self._staged_positions[alert.symbol] = self.positions.apply_fill(
+            self.db, alert.symbol, side, qty, fill_price
+        )
         orders_filled.inc()
         self.risk.record_risk_event(
             "paper_fill",
@@ -125,30 +261,48 @@ class TradingService:
 
     def _live_order(
         self, alert: models.Alert, qty: float, limit_price: float, sizing_mode: str, side: str
-    ) -> None:
-        response = self.coinbase_client.place_order(alert.symbol, side, qty, limit_price)
+    ) -> bool:
+        """Place and record a live order; False when the exchange rejected it.
+
+        The client order id is derived from the alert, so a redelivered alert or a hedged
+        re-send finds the order already placed instead of placing a second one.
+        """
+        client_order_id = client_order_id_for(alert.id)
+        response = self.coinbase_client.submit_order(
+            alert.symbol, side, qty, limit_price, client_order_id=client_order_id
+        )
+        accepted = response.get("success", True) is not False
         order = models.Order(
             alert_id=alert.id,
             symbol=alert.symbol,
             side=side,
             qty=qty,
             limit_price=limit_price,
-            status="submitted",
+            status="submitted" if accepted else "rejected",
             mode="live",
+            client_order_id=client_order_id,
+            exchange_order_id=(response.get("success_response") or {}).get("order_id"),
         )
         self.db.add(order)
-        self.db.commit()
         orders_sent.inc()
-        self.risk.record_risk_event(
-            "live_order",
-            {
-                "symbol": alert.symbol,
-                "qty": qty,
-                "side": side,
-                "resp": response,
-                "sizing": sizing_mode,
-            },
-        )
+        details = {
+            "symbol": alert.symbol,
+            "qty": qty,
+            "side": side,
+            "resp": response,
+            "sizing": sizing_mode,
+        }
+        if get_event_sink() is not None:
+            # the write-behind sink only queues the event: there is no row to fail here
+            self.risk.record_risk_event("live_order", details)
+            return accepted
+        # the order exists on the exchange now: a bad audit row must not lose the order row
+        try:
+            with self.db.begin_nested():
+                self.risk.record_risk_event("live_order", details)
+        except Exception:  # noqa: BLE001
+            logger.exception("live order audit failed", extra={"alert_id": str(alert.id)})
+        return accepted
 
     def _risk_block(self, alert: models.Alert, reason: str) -> None:
         risk_blocked.inc()
@@ -0,0 +1,202 @@
+"""Per-symbol rolling volatility for position sizing.
+
+Each symbol keeps a NumPy ring buffer of its last ``window`` log returns and three estimates that
+advance in O(1) per closed bar: Wilder ATR, EWMA volatility (RiskMetrics) and realized
+volatility (sample stdev of the window's log returns, from running sums). A cold symbol is
+warmed from history with one vectorized pass, so reads never touch the history.
+
+With a ``CandleStore`` attached, reads first pick up candles appended since the last one seen:
+a cold symbol is warmed from the whole file, a warm one advances one O(1) update per new bar.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.candles import CandleStore, get_candle_store
+
+
+@dataclass(frozen=True)
+class VolSnapshot:
+    atr: float
+    ewma_vol: float
+    realized_vol: float
+    bars: int
+
+
+def _decayed(values: np.ndarray, alpha: float, seed: float) -> float:
+    """Final value of ``x_t = x_{t-1} + alpha * (v_t - x_{t-1})`` started at ``seed``."""
+    if values.size == 0:
+        return seed
+    keep = 1.0 - alpha
+    weights = alpha * keep ** np.arange(values.size - 1, -1, -1, dtype=np.float64)
+    return float(keep**values.size * seed + weights @ values)
+
+
+class _SymbolVol:
+    def __init__(self, window: int, ewma_lambda: float) -> None:
+        self.window = window
+        self.ewma_lambda = ewma_lambda
+        self.returns = np.zeros(window, dtype=np.float64)
+        self.bars = 0
+        self.last_ts: int | None = None
+        self.last_close = 0.0
+        self.atr = 0.0
+        self.ewma_var = 0.0
+        self._pos = 0
+        self._count = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._tr_seed = 0.0
+
+    def update(self, high: float, low: float, close: float) -> None:
+        if self.bars == 0:
+            self.last_close = close
+            self.bars = 1
+            self._tr_seed = high - low
+            return
+        prev = self.last_close
+        true_range = max(high - low, abs(high - prev), abs(low - prev))
+        if self.bars < self.window:
+            # average the first ``window`` true ranges as the Wilder seed
+            self._tr_seed += true_range
+            self.atr = self._tr_seed / (self.bars + 1)
+        else:
+            self.atr += (true_range - self.atr) / self.window
+
+        r = math.log(close / prev) if prev > 0 and close > 0 else 0.0
+        self.ewma_var = self.ewma_lambda * self.ewma_var + (1 - self.ewma_lambda) * r * r
+        old = self.returns[self._pos]
+        if self._count == self.window:
+            self._sum -= old
+            self._sumsq -= old * old
+        else:
+            self._count += 1
+        self.returns[self._pos] = r
+        self._sum += r
+        self._sumsq += r * r
+        self._pos = (self._pos + 1) % self.window
+
+        self.last_close = close
+        self.bars += 1
+
+    def warm(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> None:
+        """Replace the state with the result of replaying ``closes`` bar by bar, vectorized."""
+        n = closes.size
+        self.__init__(self.window, self.ewma_lambda)
+        if n == 0:
+            return
+        prev = closes[:-1]
+        true_range = np.maximum.reduce(
+            [highs[1:] - lows[1:], np.abs(highs[1:] - prev), np.abs(lows[1:] - prev)]
+        )
+        seeded = min(true_range.size, self.window - 1)
+        self._tr_seed = float(highs[0] - lows[0] + true_range[:seeded].sum())
+        self.atr = self._tr_seed / (seeded + 1) if seeded else 0.0
+        self.atr = _decayed(true_range[seeded:], 1 / self.window, self.atr)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.where((prev > 0) & (closes[1:] > 0), np.log(closes[1:] / prev), 0.0)
+        self.ewma_var = _decayed(returns * returns, 1 - self.ewma_lambda, 0.0)
+        tail = returns[-self.window :]
+        self._count = tail.size
+        self.returns[: tail.size] = tail
+        self._pos = tail.size % self.window
+        self._sum = float(tail.sum())
+        self._sumsq = float(tail @ tail)
+
+        self.last_close = float(closes[-1])
+        self.bars = n
+
+    def realized_vol(self) -> float:
+        if self._count < 2:
+            return 0.0
+        mean = self._sum / self._count
+        variance = (self._sumsq - self._count * mean * mean) / (self._count - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def snapshot(self) -> VolSnapshot:
+        return VolSnapshot(self.atr, math.sqrt(self.ewma_var), self.realized_vol(), self.bars)
+
+
+class VolatilityEngine:
+    def __init__(
+        self,
+        window: int = 14,
+        ewma_lambda: float = 0.94,
+        candles: CandleStore | None = None,
+        granularity: str = "1h",
+    ) -> None:
+        self.window = window
+        self.ewma_lambda = ewma_lambda
+        self.candles = candles
+        self.granularity = granularity
+        self._symbols: dict[str, _SymbolVol] = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def _state(self, symbol: str) -> _SymbolVol:
+        state = self._symbols.get(symbol)
+        if state is None:
+            with self._lock:
+                state = self._symbols.setdefault(symbol, _SymbolVol(self.window, self.ewma_lambda))
+        return state
+
+    def update(self, symbol: str, high: float, low: float, close: float) -> None:
+        """Advance ``symbol`` by one closed bar."""
+        self._state(symbol).update(high, low, close)
+
+    def warm(self, symbol: str, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray) -> None:
+        self._state(symbol).warm(
+            np.asarray(highs, dtype=np.float64),
+            np.asarray(lows, dtype=np.float64),
+            np.asarray(closes, dtype=np.float64),
+        )
+
+    def sync(self, symbol: str) -> int:
+        """Fold in candles appended to the store since the last sync; returns bars applied."""
+        if self.candles is None:
+            return 0
+        state = self._state(symbol)
+        with self._sync_lock:
+            if state.last_ts is None:
+                history = self.candles.read(symbol, self.granularity)
+                state.warm(history["high"], history["low"], history["close"])
+            else:
+                history = self.candles.read(symbol, self.granularity, start=state.last_ts + 1)
+                for bar in history:
+                    state.update(float(bar["high"]), float(bar["low"]), float(bar["close"]))
+            if len(history):
+                state.last_ts = int(history["ts"][-1])
+        return len(history)
+
+    def snapshot(self, symbol: str) -> VolSnapshot | None:
+        self.sync(symbol)
+        state = self._symbols.get(symbol)
+        return state.snapshot() if state is not None and state.bars else None
+
+    def atr(self, symbol: str) -> float | None:
+        """Current ATR once ``window`` bars have been seen, else None (fixed-fraction sizing)."""
+        self.sync(symbol)
+        state = self._symbols.get(symbol)
+        if state is None or state.bars <= self.window:
+            return None
+        return state.atr
+
+
+@lru_cache
+def get_volatility_engine() -> VolatilityEngine:
+    settings = get_settings()
+    candles = get_candle_store() if settings.vol_granularity else None
+    return VolatilityEngine(
+        settings.vol_window,
+        settings.vol_ewma_lambda,
+        candles=candles,
+        granularity=settings.vol_granularity or "1h",
+    )
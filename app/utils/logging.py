@@ -1,13 +1,30 @@
 import logging
 import sys
-from typing import Any, Dict
+from typing import Any
 
 from pythonjsonlogger import jsonlogger
 
+from app.utils.serialization import default_encoder, dumps
+
+
+def _log_default(obj: Any) -> Any:
+    # a log line is never dropped over an ``extra`` value orjson cannot encode
+    try:
+        return default_encoder(obj)
+    except TypeError:
+        pass
+    if isinstance(obj, BaseException):
+        return f"{type(obj).__name__}: {obj}"
+    return str(obj)
+
+
+def _serialize(log_record: dict[str, Any], default: Any = None, **_kwargs: Any) -> str:
+    return dumps(log_record, default=_log_default).decode()
+
 
 class RequestJsonFormatter(jsonlogger.JsonFormatter):
     def add_fields(
-        self, log_record: Dict[str, Any], record: logging.LogRecord, message_dict: Dict[str, Any]
+        self, log_record: dict[str, Any], record: logging.LogRecord, message_dict: dict[str, Any]
     ) -> None:
         super().add_fields(log_record, record, message_dict)
         if not log_record.get("level"):
@@ -17,7 +34,9 @@ class RequestJsonFormatter(jsonlogger.JsonFormatter):
 
 def configure_logging() -> None:
     handler = logging.StreamHandler(sys.stdout)
-    formatter = RequestJsonFormatter("%(asctime)s %(level)s %(name)s %(message)s")
+    formatter = RequestJsonFormatter(
+        "%(asctime)s %(level)s %(name)s %(message)s", json_serializer=_serialize
+    )
     handler.setFormatter(formatter)
 
     logging.basicConfig(level=logging.INFO, handlers=[handler])
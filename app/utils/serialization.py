@@ -0,0 +1,52 @@
+"""orjson-backed JSON helpers shared by the API, Coinbase client, Celery and logging."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from kombu.serialization import register
+from starlette.responses import JSONResponse
+
+CELERY_SERIALIZER = "orjson"
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def default_encoder(obj: Any) -> Any:
+    """orjson ``default`` hook for the types the app serializes beyond orjson's own."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any, default: Callable[[Any], Any] | None = None) -> bytes:
+    return orjson.dumps(obj, default=default or default_encoder, option=_OPTIONS)
+
+
+def loads(data: bytes | bytearray | memoryview | str) -> Any:
+    return orjson.loads(data)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Installed as the app default; routes with a ``response_model`` still take FastAPI's
+    pydantic fast path when the installed FastAPI has one.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def register_celery_serializer() -> None:
+    register(
+        CELERY_SERIALIZER,
+        dumps,
+        loads,
+        content_type="application/x-orjson",
+        content_encoding="utf-8",
+    )
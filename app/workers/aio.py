@@ -0,0 +1,316 @@
+"""asyncio trade worker: ``python -m app.workers.aio -Q trades --concurrency 15``.
+
+An alternative to the Celery prefork worker for the same trade queues and task messages. One
+process keeps up to ``--concurrency`` alerts in flight: the alert load, throttle and quote are
+awaited on async Postgres, Redis and httpx clients, and the rest of the ``TradingService``
+pipeline runs through ``AsyncSession.run_sync`` so its queries go through the async driver too.
+Alerts of the same symbol still run one at a time, so the single-writer-per-symbol guarantee of
+sharded queues holds. Each alert in flight may hold two pooled connections, so the concurrency
+must fit in half of ``DB_POOL_SIZE + DB_MAX_OVERFLOW``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import queue
+import signal
+import threading
+import uuid
+import weakref
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import redis.asyncio as aioredis
+from kombu import Connection, Exchange, Queue
+from kombu.message import Message
+from prometheus_client import start_http_server
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.util import await_only
+
+from app.config import Settings, get_settings
+from app.db import models
+from app.db.session import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.metrics import collector_registry, trade_stage_latency
+from app.services.coinbase import AsyncCoinbaseClient
+from app.services.events import close_event_sink, install_event_sink
+from app.services.idempotency import AsyncThrottle, ThrottlePolicy, parse_policies
+from app.services.marketdata import AsyncMarketDataService, QuoteUnavailable
+from app.services.positions import get_position_book
+from app.services.ratelimit import AsyncRateLimiter
+from app.services.topofbook import AsyncTopOfBookStore
+from app.services.trading import PreTrade, TradingService
+from app.services.volatility import get_volatility_engine
+from app.utils.logging import configure_logging
+from app.utils.serialization import CELERY_SERIALIZER, register_celery_serializer
+
+logger = logging.getLogger(__name__)
+
+
+# an alert in flight holds its session's connection and, on Postgres, a second one for the
+# daily-risk ledger transaction (RiskEngine._ledger), both from the async engine's pool
+CONNECTIONS_PER_ALERT = 2
+
+
+def max_concurrency(settings: Settings) -> int | None:
+    """Alerts the async pool can keep in flight, or None when the pool is not size-limited."""
+    if async_engine.dialect.name == "sqlite":
+        return None
+    return (settings.db_pool_size + settings.db_max_overflow) // CONNECTIONS_PER_ALERT
+
+
+class _GreenletCoinbase:
+    """Sync facade over the async client for code running inside ``run_sync``.
+
+    ``await_only`` suspends the greenlet that ``run_sync`` runs in, so a live order placed by
+    ``TradingService`` waits on the event loop instead of blocking it.
+    """
+
+    def __init__(self, client: AsyncCoinbaseClient) -> None:
+        self.client = client
+
+    def place_order(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        return await_only(self.client.place_order(*args, **kwargs))
+
+    def submit_order(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        return await_only(self.client.submit_order(*args, **kwargs))
+
+
+class AsyncTradeWorker:
+    def __init__(
+        self,
+        settings: Settings,
+        concurrency: int,
+        redis_client: aioredis.Redis | None = None,
+        coinbase: AsyncCoinbaseClient | None = None,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+    ) -> None:
+        self.settings = settings
+        self.session_factory = session_factory
+        self.limit = asyncio.Semaphore(concurrency)
+        self.coinbase = coinbase or AsyncCoinbaseClient(
+            settings, limiter=AsyncRateLimiter.from_settings(redis_client, settings)
+        )
+        books = (
+            AsyncTopOfBookStore(redis_client)
+            if redis_client is not None
+            and (settings.quote_stream_enabled or settings.quote_prefetch_seconds > 0)
+            else None
+        )
+        self.marketdata = AsyncMarketDataService(self.coinbase, settings, books=books)
+        self.throttle = AsyncThrottle(redis_client, parse_policies(settings.throttle_policies))
+        self._symbol_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+
+    async def handle(self, task: str, args: list, kwargs: dict) -> None:
+        """Run one Celery trade task message (protocol 2 ``args`` / ``kwargs``)."""
+        if task == "enqueue_trade_task":
+            alert_ids = [args[0] if args else kwargs["alert_id"]]
+        elif task == "enqueue_trade_batch":
+            alert_ids = args[0] if args else kwargs["alert_ids"]
+        else:
+            raise ValueError(f"unsupported task {task!r}")
+        results = await asyncio.gather(
+            *(self.run_alert(uuid.UUID(alert_id)) for alert_id in alert_ids),
+            return_exceptions=True,
+        )
+        for alert_id, result in zip(alert_ids, results, strict=True):
+            if isinstance(result, Exception):
+                logger.error(
+                    "trade task failed", exc_info=result, extra={"alert_id": str(alert_id)}
+                )
+
+    async def run_alert(self, alert_id: uuid.UUID) -> None:
+        async with self.limit:
+            # no pooled connection is held while waiting on the symbol lock or the pretrade
+            async with self.session_factory() as session:
+                alert = await session.get(models.Alert, alert_id)
+            lock = self._symbol_lock(alert.symbol) if alert else asyncio.Lock()
+            async with lock:
+                pretrade = await self._pretrade(alert) if alert else None
+                async with self.session_factory() as session:
+                    await session.run_sync(self._execute, alert_id, pretrade)
+
+    def _symbol_lock(self, symbol: str) -> asyncio.Lock:
+        lock = self._symbol_locks.get(symbol)
+        if lock is None:
+            lock = self._symbol_locks[symbol] = asyncio.Lock()
+        return lock
+
+    async def _pretrade(self, alert: models.Alert) -> PreTrade | None:
+        if (alert.side or "").lower() not in {"buy", "sell"}:
+            return None
+        quote = asyncio.ensure_future(
+            self._timed("quote", self.marketdata.get_mid_price(alert.symbol, float(alert.price)))
+        )
+        allowed = await self._timed(
+            "throttle",
+            self.throttle.allow(
+                alert.symbol,
+                ThrottlePolicy.per_window(self.settings.throttle_seconds),
+                alert.strategy,
+            ),
+        )
+        if not allowed:
+            quote.cancel()
+            return PreTrade(False)
+        try:
+            return PreTrade(True, await quote)
+        except QuoteUnavailable:
+            logger.warning("no usable quote", extra={"symbol": alert.symbol})
+            return PreTrade(True)
+
+    @staticmethod
+    async def _timed(stage: str, awaitable: Awaitable[Any]) -> Any:
+        with trade_stage_latency.labels(stage).time():
+            return await awaitable
+
+    def _execute(self, session, alert_id: uuid.UUID, pretrade: PreTrade | None) -> None:
+        service = TradingService(session, self.settings, _GreenletCoinbase(self.coinbase))
+        service.execute_alert(alert_id, pretrade)
+
+    async def close(self) -> None:
+        await self.coinbase.close()
+
+
+class _Consumer:
+    """Kombu consumer thread feeding task messages to the event loop.
+
+    Kombu channels are not thread-safe, so messages are acked on this thread once the loop
+    reports them done; ``prefetch_count`` bounds how many are in flight.
+    """
+
+    def __init__(
+        self,
+        broker_url: str,
+        queues: list[str],
+        prefetch: int,
+        loop: asyncio.AbstractEventLoop,
+        handle: Callable[[str, list, dict], Awaitable[None]],
+    ) -> None:
+        self.broker_url = broker_url
+        self.queues = [Queue(name, Exchange(name), routing_key=name) for name in queues]
+        self.prefetch = prefetch
+        self.loop = loop
+        self.handle = handle
+        self.stopping = threading.Event()
+        self._done: queue.Queue[Message] = queue.Queue()
+        self._inflight = 0
+
+    def _on_message(self, body: Any, message: Message) -> None:
+        task = message.headers.get("task")
+        args, kwargs = (body[0], body[1]) if isinstance(body, (list, tuple)) else ([], {})
+        future = asyncio.run_coroutine_threadsafe(self.handle(task, args, kwargs), self.loop)
+        self._inflight += 1
+        future.add_done_callback(lambda f: self._finished(message, task, f))
+
+    def _finished(self, message: Message, task: str, future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("task message failed", exc_info=future.exception(), extra={"task": task})
+        self._done.put(message)
+
+    def _ack_done(self) -> None:
+        while True:
+            try:
+                message = self._done.get_nowait()
+            except queue.Empty:
+                return
+            message.ack()
+            self._inflight -= 1
+
+    def run(self) -> None:
+        with (
+            Connection(self.broker_url) as conn,
+            conn.Consumer(
+                self.queues,
+                callbacks=[self._on_message],
+                accept=[CELERY_SERIALIZER, "json"],
+                prefetch_count=self.prefetch,
+            ),
+        ):
+            while not self.stopping.is_set():
+                self._ack_done()
+                try:
+                    conn.drain_events(timeout=0.2)
+                except TimeoutError:
+                    pass
+            # stop taking messages, but wait for and ack everything already started
+            while self._inflight:
+                self._done.get().ack()
+                self._inflight -= 1
+
+
+async def serve(queues: list[str], concurrency: int) -> None:
+    settings = get_settings()
+    register_celery_serializer()
+    redis_client = aioredis.from_url(
+        settings.redis_url,
+        max_connections=settings.redis_max_connections,
+        socket_timeout=settings.redis_socket_timeout,
+    )
+    try:
+        await redis_client.ping()
+    except Exception:  # noqa: BLE001
+        logger.warning("throttle redis unavailable, using in-process buckets")
+        await redis_client.aclose()
+        redis_client = None
+    install_event_sink(
+        engine,
+        max_buffer=settings.risk_event_buffer,
+        flush_rows=settings.risk_event_flush_rows,
+        flush_interval=settings.risk_event_flush_ms / 1000,
+        block_timeout=settings.risk_event_block_ms / 1000,
+    )
+    with SessionLocal() as session:
+        get_position_book().load(session)
+    if settings.vol_granularity:
+        volatility = get_volatility_engine()
+        for symbol in settings.base_assets:
+            volatility.sync(symbol)
+
+    worker = AsyncTradeWorker(settings, concurrency, redis_client)
+    loop = asyncio.get_running_loop()
+    consumer = _Consumer(settings.redis_url, queues, concurrency, loop, worker.handle)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, consumer.stopping.set)
+    logger.info("async trade worker started", extra={"queues": queues, "concurrency": concurrency})
+    try:
+        await asyncio.to_thread(consumer.run)
+    finally:
+        await worker.close()
+        if redis_client is not None:
+            await redis_client.aclose()
+        close_event_sink()
+        await async_engine.dispose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="asyncio trade worker")
+    parser.add_argument(
+        "-Q", "--queues", default=settings.trade_queue, help="comma-separated queues to consume"
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=settings.aio_worker_concurrency,
+        help="alerts in flight per process",
+    )
+    args = parser.parse_args(argv)
+    limit = max_concurrency(settings)
+    if limit is not None and args.concurrency > limit:
+        parser.error(
+            f"--concurrency {args.concurrency} needs {args.concurrency * CONNECTIONS_PER_ALERT} "
+            f"DB connections; DB_POOL_SIZE + DB_MAX_OVERFLOW allow {limit} alerts in flight"
+        )
+    configure_logging()
+    start_http_server(settings.prometheus_port, registry=collector_registry())
+    queues = [name.strip() for name in args.queues.split(",") if name.strip()]
+    asyncio.run(serve(queues, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
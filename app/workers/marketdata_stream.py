@@ -0,0 +1,187 @@
+"""Market-data stream: ``python -m app.workers.marketdata_stream``.
+
+Keeps one websocket subscription to the Coinbase Advanced Trade ``ticker`` channel for
+``BASE_ASSETS`` and writes each product's best bid/ask into the ``quote:{symbol}`` Redis hashes
+that ``MarketDataService`` reads before falling back to REST. Reconnects with backoff.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import datetime as dt
+import logging
+import signal
+import time
+from collections.abc import Iterable
+from typing import Any
+
+import redis
+import redis.asyncio as aioredis
+import websockets
+from prometheus_client import start_http_server
+
+from app.config import get_settings
+from app.metrics import collector_registry, quote_stream_updates
+from app.services.topofbook import AsyncTopOfBookStore, TopOfBook
+from app.utils.logging import configure_logging
+from app.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch(timestamp: str | None, default: float) -> float:
+    if not timestamp:
+        return default
+    # Coinbase sends nanoseconds ("...T20:19:35.396251353Z"); fromisoformat takes microseconds
+    head, _, frac = timestamp.rstrip("Z").partition(".")
+    value = f"{head}.{frac[:6]}" if frac else head
+    return dt.datetime.fromisoformat(value).replace(tzinfo=dt.UTC).timestamp()
+
+
+def parse_ticker(message: dict, received_at: float | None = None) -> dict[str, TopOfBook]:
+    """Latest top of book per product in one ``ticker`` channel message."""
+    if message.get("channel") != "ticker":
+        return {}
+    received_at = time.time() if received_at is None else received_at
+    exchange_ts = _epoch(message.get("timestamp"), received_at)
+    books = {}
+    for event in message.get("events") or []:
+        for ticker in event.get("tickers") or []:
+            bid = float(ticker.get("best_bid") or 0)
+            ask = float(ticker.get("best_ask") or 0)
+            if bid or ask:
+                books[ticker["product_id"]] = TopOfBook(bid, ask, exchange_ts, received_at)
+    return books
+
+
+def _subscriptions(symbols: Iterable[str]) -> list[bytes]:
+    products = list(symbols)
+    # heartbeats keep the connection open through quiet periods
+    return [
+        dumps({"type": "subscribe", "product_ids": products, "channel": "ticker"}),
+        dumps({"type": "subscribe", "product_ids": products, "channel": "heartbeats"}),
+    ]
+
+
+async def _pause(stop: asyncio.Event, seconds: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except TimeoutError:
+        pass
+
+
+class _StoreWriter:
+    """Writes books to the store; after a Redis failure, drops updates for a growing backoff."""
+
+    def __init__(self, store: AsyncTopOfBookStore, backoff: float, max_backoff: float) -> None:
+        self.store = store
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._delay = backoff
+        self._paused_until = 0.0
+
+    async def write(self, books: dict[str, TopOfBook]) -> None:
+        if time.monotonic() < self._paused_until:
+            return
+        try:
+            await self.store.write_many(books)
+        except (redis.RedisError, OSError) as exc:
+            # the quote TTL sends readers to REST while writes are paused
+            logger.warning(
+                "top-of-book write failed, pausing writes",
+                extra={"error": str(exc), "seconds": self._delay},
+            )
+            self._paused_until = time.monotonic() + self._delay
+            self._delay = min(self._delay * 2, self.max_backoff)
+            return
+        self._delay = self.backoff
+        quote_stream_updates.inc(len(books))
+
+
+async def _relay(ws: Any, writer: _StoreWriter, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        receive = asyncio.ensure_future(ws.recv())
+        halt = asyncio.ensure_future(stop.wait())
+        done, _ = await asyncio.wait({receive, halt}, return_when=asyncio.FIRST_COMPLETED)
+        halt.cancel()
+        if receive not in done:
+            receive.cancel()
+            return
+        try:
+            books = parse_ticker(loads(receive.result()))
+        except (ValueError, KeyError, TypeError):
+            logger.warning("unparseable market data message")
+            continue
+        if books:
+            await writer.write(books)
+
+
+async def stream(
+    url: str,
+    symbols: list[str],
+    store: AsyncTopOfBookStore,
+    stop: asyncio.Event,
+    backoff: float = 1.0,
+    max_backoff: float = 30.0,
+) -> None:
+    """Mirror ticker updates into ``store`` until ``stop`` is set, reconnecting on errors.
+
+    Connect failures the websockets client does not retry itself are retried here with
+    exponential backoff; Redis failures pause writes (see ``_StoreWriter``) but keep the stream.
+    """
+    writer = _StoreWriter(store, backoff, max_backoff)
+    delay = backoff
+    while not stop.is_set():
+        try:
+            async for ws in websockets.connect(url, max_size=2**22, open_timeout=10):
+                try:
+                    for subscription in _subscriptions(symbols):
+                        await ws.send(subscription.decode())
+                    logger.info("market data stream subscribed", extra={"symbols": symbols})
+                    delay = backoff
+                    await _relay(ws, writer, stop)
+                except websockets.ConnectionClosed:
+                    logger.warning("market data stream disconnected, reconnecting")
+                    continue
+                await ws.close()
+                return
+        except (OSError, TimeoutError, websockets.WebSocketException) as exc:
+            logger.warning(
+                "market data stream connect failed, retrying",
+                extra={"error": str(exc), "seconds": delay},
+            )
+            await _pause(stop, delay)
+            delay = min(delay * 2, max_backoff)
+
+
+async def serve(url: str, symbols: list[str]) -> None:
+    settings = get_settings()
+    redis_client = aioredis.from_url(settings.redis_url)
+    store = AsyncTopOfBookStore(redis_client, ttl_seconds=settings.quote_stream_ttl_seconds)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stream(url, symbols, store, stop)
+    finally:
+        await redis_client.aclose()
+
+
+def main(argv: list[str] | None = None) -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Coinbase ticker stream into Redis")
+    parser.add_argument("--url", default=settings.quote_stream_url)
+    parser.add_argument(
+        "--symbols", nargs="*", default=None, help="products to stream (default BASE_ASSETS)"
+    )
+    args = parser.parse_args(argv)
+    configure_logging()
+    # tradingbot_quote_stream_updates_total is only counted in this process
+    start_http_server(settings.prometheus_port, registry=collector_registry())
+    asyncio.run(serve(args.url, args.symbols or settings.base_assets))
+
+
+if __name__ == "__main__":
+    main()
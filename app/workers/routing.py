@@ -0,0 +1,84 @@
+"""Consistent-hash routing of trade tasks onto symbol-sharded queues.
+
+Every symbol maps to exactly one ``trades.<n>`` queue, and each queue is consumed by a single
+worker process (``-c 1``), so position and daily-risk updates for a symbol are serialized
+without row locks. Adding shards only moves the symbols whose ring segment changes owner.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+from functools import lru_cache
+from typing import Any
+
+from app.config import get_settings
+
+TRADE_TASKS = {"enqueue_trade_task", "enqueue_trade_batch"}
+_REPLICAS = 128
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, nodes: list[str], replicas: int = _REPLICAS) -> None:
+        points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self._keys = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[index]
+
+
+def shard_queues(shards: int, base: str = "trades") -> list[str]:
+    if shards <= 1:
+        return [base]
+    return [f"{base}.{index}" for index in range(shards)]
+
+
+@lru_cache
+def _ring(shards: int, base: str) -> HashRing:
+    return HashRing(shard_queues(shards, base))
+
+
+def queue_for_symbol(symbol: str, shards: int | None = None, base: str | None = None) -> str:
+    settings = get_settings()
+    shards = settings.trade_shards if shards is None else shards
+    base = base or settings.trade_queue
+    if shards <= 1:
+        return base
+    return _ring(shards, base).node_for(symbol.upper())
+
+
+def route_trade_task(
+    name: str, args: Any, kwargs: dict | None, options: dict, task: Any = None, **_kw: Any
+) -> dict | None:
+    """Celery router: trade tasks carry a ``shard_key`` (a symbol) that picks their queue."""
+    if name not in TRADE_TASKS:
+        return None
+    shard_key = (kwargs or {}).get("shard_key")
+    if not shard_key:
+        return {"queue": get_settings().trade_queue}
+    return {"queue": queue_for_symbol(shard_key)}
+
+
+def group_by_queue(items: list[tuple[str, str]]) -> dict[str, list[tuple[str, str]]]:
+    """Group ``(alert_id, symbol)`` pairs by the shard queue their symbol routes to."""
+    groups: dict[str, list[tuple[str, str]]] = {}
+    for alert_id, symbol in items:
+        groups.setdefault(queue_for_symbol(symbol), []).append((alert_id, symbol))
+    return groups
+
+
+def rebalance_plan(symbols: list[str], old_shards: int, new_shards: int) -> dict[str, tuple]:
+    """Symbols whose queue changes between two shard counts, as ``{symbol: (old, new)}``."""
+    plan = {}
+    for symbol in symbols:
+        old = queue_for_symbol(symbol, old_shards)
+        new = queue_for_symbol(symbol, new_shards)
+        if old != new:
+            plan[symbol] = (old, new)
+    return plan
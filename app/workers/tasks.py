@@ -1,29 +1,233 @@
 from __future__ import annotations
 
+import logging
+import time
 import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
 
 from celery import Celery
+from celery.signals import (
+    worker_process_init,
+    worker_process_shutdown,
+    worker_ready,
+    worker_shutdown,
+)
+from prometheus_client import start_http_server
+from sqlalchemy.orm import Session
 
 from app.config import get_settings
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, engine
+from app.metrics import collector_registry, mark_process_dead
+from app.services.coinbase import close_coinbase_client, get_coinbase_client
+from app.services.events import close_event_sink, install_event_sink
+from app.services.positions import get_position_book
+from app.services.risk import RiskEngine
+from app.services.topofbook import TopOfBook, get_top_of_book_store
 from app.services.trading import TradingService
+from app.services.volatility import get_volatility_engine
+from app.utils.serialization import CELERY_SERIALIZER, register_celery_serializer
+from app.workers.routing import group_by_queue, route_trade_task
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+register_celery_serializer()
+
 celery_app = Celery(
     "tradingbot",
     broker=settings.redis_url,
     backend=settings.redis_url,
 )
-celery_app.conf.task_routes = {"enqueue_trade_task": {"queue": "trades"}}
+celery_app.conf.update(
+    task_serializer=CELERY_SERIALIZER,
+    result_serializer=CELERY_SERIALIZER,
+    # plain json stays accepted so messages from older producers still drain
+    accept_content=[CELERY_SERIALIZER, "json"],
+)
+# trade tasks go to the shard queue of their shard_key symbol (see app/workers/routing.py)
+celery_app.conf.task_routes = (route_trade_task,)
+celery_app.conf.beat_schedule = {
+    "reclaim-daily-risk": {
+        "task": "reclaim_daily_risk",
+        "schedule": settings.risk_reservation_ttl_seconds,
+        "options": {"expires": settings.risk_reservation_ttl_seconds},
+    }
+}
+if settings.quote_prefetch_seconds > 0:
+    celery_app.conf.beat_schedule["prefetch-quotes"] = {
+        "task": "prefetch_quotes",
+        "schedule": settings.quote_prefetch_seconds,
+        # a prefetch that waited a whole period in the queue is worthless
+        "options": {"expires": settings.quote_prefetch_seconds},
+    }
+
+
+@worker_ready.connect
+def _serve_metrics(**_kwargs) -> None:
+    # the parent process serves the aggregated view of all prefork children
+    start_http_server(settings.prometheus_port, registry=collector_registry())
+
+
+def _install_event_sink() -> None:
+    install_event_sink(
+        engine,
+        max_buffer=settings.risk_event_buffer,
+        flush_rows=settings.risk_event_flush_rows,
+        flush_interval=settings.risk_event_flush_ms / 1000,
+        block_timeout=settings.risk_event_block_ms / 1000,
+    )
+
+
+def _load_position_book() -> None:
+    with SessionLocal() as session:
+        get_position_book().load(session)
+
+
+def _warm_volatility() -> None:
+    if settings.vol_granularity:
+        volatility = get_volatility_engine()
+        for symbol in settings.base_assets:
+            volatility.sync(symbol)
+
+
+@worker_process_init.connect
+def _open_coinbase_pool(**_kwargs) -> None:
+    # one keep-alive pool, risk-event writer, position book and volatility state per prefork
+    # child, after fork
+    get_coinbase_client()
+    _install_event_sink()
+    _load_position_book()
+    _warm_volatility()
+
+
+@worker_ready.connect
+def _open_solo_worker_state(**_kwargs) -> None:
+    # solo/threads pools run tasks in this process and never fire worker_process_init
+    if celery_app.conf.worker_pool in {"solo", "threads"}:
+        _install_event_sink()
+        _load_position_book()
+        _warm_volatility()
+
+
+@worker_process_shutdown.connect
+def _drop_child_metrics(pid: int | None = None, **_kwargs) -> None:
+    close_event_sink()
+    close_coinbase_client()
+    mark_process_dead(pid)
+
+
+@worker_shutdown.connect
+def _close_coinbase_pool(**_kwargs) -> None:
+    # solo/threads pools never fire the per-process signals
+    close_event_sink()
+    close_coinbase_client()
 
 
 @celery_app.task(name="enqueue_trade_task")
-def enqueue_trade_task(alert_id: str) -> str:
+def enqueue_trade_task(alert_id: str, shard_key: str | None = None) -> str:
+    # shard_key is only read by the router to pick the symbol's queue
     session = SessionLocal()
     try:
-        service = TradingService(session, settings)
+        service = TradingService(session, settings, get_coinbase_client())
         service.execute_alert(uuid.UUID(alert_id))
         return alert_id
     finally:
         session.close()
+
+
+@celery_app.task(name="reclaim_daily_risk", ignore_result=True)
+def reclaim_daily_risk() -> float:
+    """Give back daily-risk reservations orphaned by workers that died mid-alert."""
+    with SessionLocal() as session:
+        reclaimed = RiskEngine(session, settings).reclaim_daily_risk(
+            settings.risk_reservation_ttl_seconds
+        )
+        session.commit()
+    if reclaimed:
+        logger.warning("daily risk reclaimed", extra={"notional": reclaimed})
+    return reclaimed
+
+
+@celery_app.task(name="prefetch_quotes", ignore_result=True)
+def prefetch_quotes() -> int:
+    """Refresh the shared top of book for every BASE_ASSETS product in one request."""
+    store = get_top_of_book_store()
+    if store is None:
+        return 0
+    quotes = get_coinbase_client().get_best_bid_asks(settings.base_assets)
+    now = time.time()
+    store.write_many(
+        {
+            symbol: TopOfBook(quote.best_bid, quote.best_ask, now, now)
+            for symbol, quote in quotes.items()
+        },
+        ttl_seconds=settings.quote_stream_ttl_seconds,
+    )
+    return len(quotes)
+
+
+@contextmanager
+def _batch_service() -> Iterator[TradingService]:
+    """Trading service for a trade batch.
+
+    In paper mode the whole batch runs inside one connection-level transaction and every
+    commit the pipeline makes is only a SAVEPOINT release, so a batch costs one real commit.
+    Audit events go to the sink only after that commit; if it fails, the position book is
+    dropped and the batch's daily-risk reservations are released. Live orders are external
+    side effects, so live batches keep committing per alert.
+    """
+    if settings.trading_mode != "paper":
+        session = SessionLocal()
+        try:
+            yield TradingService(session, settings, get_coinbase_client())
+        finally:
+            session.close()
+        return
+    with engine.connect() as conn:
+        session = Session(
+            bind=conn,
+            join_transaction_mode="create_savepoint",
+            autoflush=False,
+            expire_on_commit=False,
+        )
+        service = TradingService(session, settings, get_coinbase_client(), batch_commit=True)
+        try:
+            with conn.begin():
+                try:
+                    yield service
+                finally:
+                    session.close()
+        except BaseException:
+            service.batch_failed()
+            raise
+        service.batch_committed()
+
+
+@celery_app.task(name="enqueue_trade_batch")
+def enqueue_trade_batch(alert_ids: list[str], shard_key: str | None = None) -> list[str]:
+    """Run up to TRADE_BATCH_SIZE alerts with one session and shared clients."""
+    with _batch_service() as service:
+        service.execute_alerts([uuid.UUID(alert_id) for alert_id in alert_ids])
+    return alert_ids
+
+
+def send_trade_batches(items: list[tuple[str, str]], size: int) -> int:
+    """Publish ``(alert_id, symbol)`` pairs as ``enqueue_trade_batch`` messages.
+
+    One message per shard queue and ``size`` ids, all over a single producer connection.
+    Blocking; returns the number of messages sent.
+    """
+    sent = 0
+    with celery_app.producer_or_acquire() as producer:
+        for group in group_by_queue(items).values():
+            for start in range(0, len(group), size):
+                chunk = group[start : start + size]
+                enqueue_trade_batch.apply_async(
+                    ([alert_id for alert_id, _ in chunk],),
+                    {"shard_key": chunk[0][1]},
+                    producer=producer,
+                )
+                sent += 1
+    return sent
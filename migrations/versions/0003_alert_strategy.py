@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("alerts", sa.Column("strategy", sa.String(length=50), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("alerts", "strategy")
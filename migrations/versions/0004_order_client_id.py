@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("orders", sa.Column("client_order_id", sa.String(length=64), nullable=True))
+    op.add_column("orders", sa.Column("exchange_order_id", sa.String(length=64), nullable=True))
+    op.create_unique_constraint("uq_orders_client_order_id", "orders", ["client_order_id"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_orders_client_order_id", "orders", type_="unique")
+    op.drop_column("orders", "exchange_order_id")
+    op.drop_column("orders", "client_order_id")
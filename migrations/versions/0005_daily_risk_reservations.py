@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_risk_reservations",
+        sa.Column("trade_day", sa.String(length=10), nullable=False),
+        sa.Column("alert_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("notional", sa.Numeric(18, 2), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("trade_day", "alert_id"),
+    )
+    # reclaiming orphaned reservations looks up each alert's orders
+    op.create_index("ix_orders_alert_id", "orders", ["alert_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_orders_alert_id", table_name="orders")
+    op.drop_table("daily_risk_reservations")
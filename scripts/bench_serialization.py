@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""Compare stdlib json with the orjson layer on the per-alert serialization hot path."""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import timeit
+import uuid
+
+from app.utils import serialization
+
+
+def _alert() -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "symbol": "BTC-USD",
+        "side": "buy",
+        "confidence": 0.82,
+        "timeframe": "1h",
+        "price": 20123.45,
+        "ts": "2024-01-01T00:00:00Z",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=50_000, help="iterations per case")
+    args = parser.parse_args()
+
+    alert = _alert()
+    alert_bytes = json.dumps(alert).encode()
+    batch = json.dumps([_alert() for _ in range(100)]).encode()
+    order = {
+        "client_order_id": str(uuid.uuid4()),
+        "product_id": "BTC-USD",
+        "side": "BUY",
+        "order_configuration": {
+            "limit_limit_gtc": {"base_size": "0.01", "limit_price": "20000", "post_only": False}
+        },
+    }
+    task_body = [[str(uuid.uuid4())], {}, {"callbacks": None, "errbacks": None, "chain": None}]
+    response = {"status": "queued", "alert_id": alert["id"]}
+    log_fields = {
+        "asctime": dt.datetime.utcnow().isoformat(),
+        "level": "INFO",
+        "name": "app.services.trading",
+        "message": "paper fill",
+        "alert_id": alert["id"],
+        "symbol": "BTC-USD",
+        "side": "buy",
+        "logger": "app.services.trading",
+    }
+
+    cases = {
+        "alert parse (batch item)": (
+            lambda: json.loads(alert_bytes),
+            lambda: serialization.loads(alert_bytes),
+        ),
+        "batch parse (100 alerts)": (
+            lambda: json.loads(batch),
+            lambda: serialization.loads(batch),
+        ),
+        "webhook response": (
+            lambda: json.dumps(response).encode(),
+            lambda: serialization.dumps(response),
+        ),
+        "coinbase order body": (
+            lambda: json.dumps(order).encode(),
+            lambda: serialization.dumps(order),
+        ),
+        "celery task payload": (
+            lambda: json.dumps(task_body),
+            lambda: serialization.dumps(task_body),
+        ),
+        "json log line": (
+            lambda: json.dumps(log_fields),
+            lambda: serialization.dumps(log_fields),
+        ),
+    }
+
+    print(f"{'case':28} {'json us':>10} {'orjson us':>10} {'saved us':>10}")
+    saved_total = 0.0
+    for name, (stdlib_fn, orjson_fn) in cases.items():
+        stdlib_us = timeit.timeit(stdlib_fn, number=args.number) / args.number * 1e6
+        orjson_us = timeit.timeit(orjson_fn, number=args.number) / args.number * 1e6
+        saved = stdlib_us - orjson_us
+        if not name.startswith("batch"):
+            saved_total += saved
+        print(f"{name:28} {stdlib_us:10.2f} {orjson_us:10.2f} {saved:10.2f}")
+    print(f"{'per alert (excl. batch)':28} {'':10} {'':10} {saved_total:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Compare the GET+SET throttle with the single-EVALSHA token bucket against a live Redis.
+
+Reports calls per second for each implementation and, for a burst of concurrent calls on one
+symbol, how many were let through (the atomic version must admit exactly one).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+from app.services.idempotency import Throttle, ThrottlePolicy
+
+
+def legacy_throttle(client: redis.Redis, symbol: str, window_seconds: int) -> bool:
+    # the implementation this replaced: two round-trips, check-then-set race
+    key = f"bench:legacy:{symbol}"
+    now = int(time.time())
+    last = client.get(key)
+    if last and now - int(last) < window_seconds:
+        return False
+    client.set(key, now, ex=window_seconds)
+    return True
+
+
+def _rate(fn, number: int) -> float:
+    start = time.perf_counter()
+    for i in range(number):
+        fn(f"SYM{i % 100}")
+    return number / (time.perf_counter() - start)
+
+
+def _admitted(fn, threads: int) -> int:
+    symbol = f"RACE-{uuid.uuid4().hex[:8]}"
+    with ThreadPoolExecutor(threads) as pool:
+        return sum(pool.map(lambda _: fn(symbol), range(threads)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--redis-url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+    )
+    parser.add_argument("--number", type=int, default=20_000, help="calls per case")
+    parser.add_argument("--threads", type=int, default=32, help="concurrent calls in the race")
+    args = parser.parse_args()
+
+    client = redis.Redis.from_url(args.redis_url)
+    client.ping()
+    throttle = Throttle(client)
+    throttle.key_prefix = f"bench:bucket:{uuid.uuid4().hex[:8]}:"
+    policy = ThrottlePolicy.per_window(30)
+
+    cases = {
+        "get+set": lambda symbol: legacy_throttle(client, symbol, 30),
+        "token bucket": lambda symbol: throttle.allow(symbol, policy),
+    }
+    for name, fn in cases.items():
+        rate = _rate(fn, args.number)
+        admitted = _admitted(fn, args.threads)
+        print(f"{name:>13}: {rate:10.0f} calls/s   race admitted {admitted}/{args.threads}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import uuid
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+import pytest  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import AsyncSessionLocal, SessionLocal, engine  # noqa: E402
+from app.workers import aio  # noqa: E402
+from app.workers.aio import AsyncTradeWorker  # noqa: E402
+
+Base.metadata.create_all(bind=engine)
+
+
+def _alerts(count: int, symbol: str | None = None) -> list[uuid.UUID]:
+    ids = []
+    with SessionLocal() as session:
+        for _ in range(count):
+            alert_id = uuid.uuid4()
+            session.add(
+                models.Alert(
+                    id=alert_id,
+                    symbol=symbol or f"A{alert_id.hex[:6]}-USD",
+                    side="buy",
+                    price=100,
+                )
+            )
+            ids.append(alert_id)
+        session.commit()
+    return ids
+
+
+async def test_batch_message_runs_alerts_concurrently_to_orders():
+    settings = get_settings().model_copy(update={"max_daily_risk_pct": 1000.0})
+    worker = AsyncTradeWorker(settings, concurrency=4)
+    alert_ids = _alerts(3)
+    try:
+        await worker.handle("enqueue_trade_batch", [[str(a) for a in alert_ids]], {})
+    finally:
+        await worker.close()
+
+    with SessionLocal() as session:
+        orders = (
+            session.execute(select(models.Order).where(models.Order.alert_id.in_(alert_ids)))
+            .scalars()
+            .all()
+        )
+    assert {order.alert_id for order in orders} == set(alert_ids)
+
+
+async def test_same_symbol_is_throttled_once_through_async_throttle():
+    settings = get_settings().model_copy(update={"max_daily_risk_pct": 1000.0})
+    worker = AsyncTradeWorker(settings, concurrency=4)
+    symbol = f"T{uuid.uuid4().hex[:6]}-USD"
+    alert_ids = _alerts(2, symbol)
+    try:
+        for alert_id in alert_ids:
+            await worker.handle("enqueue_trade_task", [str(alert_id)], {"shard_key": symbol})
+        with pytest.raises(ValueError):
+            await worker.handle("unknown_task", [], {})
+    finally:
+        await worker.close()
+
+    with SessionLocal() as session:
+        orders = (
+            session.execute(select(models.Order).where(models.Order.alert_id.in_(alert_ids)))
+            .scalars()
+            .all()
+        )
+    assert len(orders) == 1
+
+
+async def test_alert_waiting_on_its_symbol_holds_no_session():
+    open_sessions = 0
+
+    class CountingSession:
+        def __init__(self):
+            self.session = AsyncSessionLocal()
+
+        async def __aenter__(self):
+            nonlocal open_sessions
+            open_sessions += 1
+            return await self.session.__aenter__()
+
+        async def __aexit__(self, *exc):
+            nonlocal open_sessions
+            open_sessions -= 1
+            return await self.session.__aexit__(*exc)
+
+    settings = get_settings().model_copy(update={"max_daily_risk_pct": 1000.0})
+    worker = AsyncTradeWorker(settings, concurrency=4, session_factory=CountingSession)
+    symbol = f"L{uuid.uuid4().hex[:6]}-USD"
+    (alert_id,) = _alerts(1, symbol)
+    try:
+        async with worker._symbol_lock(symbol):
+            task = asyncio.ensure_future(worker.run_alert(alert_id))
+            await asyncio.sleep(0.05)
+            assert not task.done()
+            assert open_sessions == 0
+        await task
+    finally:
+        await worker.close()
+
+
+def test_concurrency_beyond_the_pool_is_refused(monkeypatch):
+    monkeypatch.setattr(aio, "max_concurrency", lambda settings: 4)
+    with pytest.raises(SystemExit):
+        aio.main(["-c", "5"])
@@ -0,0 +1,216 @@
+import os
+from unittest import mock
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app.services.breaker import (  # noqa: E402
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BreakerConfig,
+    Breakers,
+    CallPolicy,
+    CircuitBreaker,
+    call_type_for,
+    parse_call_policies,
+)
+
+CONFIG = BreakerConfig(
+    window=4, min_calls=4, failure_rate=0.5, slow_seconds=1.0, slow_rate=0.75, open_seconds=10
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _breaker(changes: list | None = None) -> tuple[CircuitBreaker, _Clock]:
+    clock = _Clock()
+    on_change = (lambda name, state: changes.append(state)) if changes is not None else None
+    return CircuitBreaker("quote", CONFIG, on_change, clock), clock
+
+
+def test_opens_on_failure_rate_once_the_window_fills():
+    changes = []
+    breaker, _ = _breaker(changes)
+    for ok in (False, True, False):
+        breaker.record(ok, 0.1)
+    assert breaker.state == CLOSED
+    breaker.record(True, 0.1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert changes == [OPEN]
+
+
+def test_opens_on_slow_calls():
+    breaker, _ = _breaker()
+    for seconds in (1.5, 2.0, 0.1, 3.0):
+        breaker.record(True, seconds)
+    assert breaker.state == OPEN
+
+
+def test_old_outcomes_leave_the_window():
+    breaker, _ = _breaker()
+    for ok in (False, True, True, True, True, False):
+        breaker.record(ok, 0.1)
+    # the window holds the last four: one failure
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens():
+    changes = []
+    breaker, clock = _breaker(changes)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    clock.now = 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # one probe at a time
+    assert not breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    clock.now = 20
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+    assert changes == [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED]
+
+
+def test_call_policies():
+    policies = parse_call_policies("quote=2;order=5/pass", 10)
+    assert policies["quote"] == CallPolicy(2.0, True)
+    assert policies["order"] == CallPolicy(5.0, False)
+    assert policies["account"] == CallPolicy(10.0, True)
+    with pytest.raises(ValueError):
+        parse_call_policies("fills=2", 10)
+    assert call_type_for("POST", "/brokerage/orders") == "order"
+    assert call_type_for("GET", "/brokerage/orders/historical/1") == "account"
+    assert call_type_for("GET", "/brokerage/best_bid_ask?product_ids=BTC-USD") == "quote"
+
+
+def _client(policies: dict[str, CallPolicy]):
+    from app.services.coinbase import CoinbaseClient
+    from app.services.ratelimit import RateLimit, RateLimiter
+
+    limiter = RateLimiter(None, {"private": RateLimit(100, 100), "public": RateLimit(100, 100)})
+    breakers = Breakers(CONFIG, policies)
+    return CoinbaseClient(http_client=mock.Mock(), limiter=limiter, breakers=breakers), breakers
+
+
+def test_open_breaker_fails_fast_without_retrying():
+    from app.services.coinbase import CoinbaseCircuitOpen
+
+    policies = parse_call_policies("quote=0.5", 10)
+    client, breakers = _client(policies)
+    client.client.request.side_effect = httpx.ConnectTimeout("down")
+    for _ in range(4):
+        with pytest.raises(httpx.ConnectTimeout):
+            client._request("GET", "/brokerage/products/BTC-USD")
+    assert breakers.states()["quote"] == OPEN
+    assert client.client.request.call_args.kwargs["timeout"] == 0.5
+
+    calls = client.client.request.call_count
+    with pytest.raises(CoinbaseCircuitOpen):
+        client.get_best_bid_ask("BTC-USD")
+    assert client.client.request.call_count == calls
+    # other call types are unaffected
+    client.client.request.side_effect = None
+    client.client.request.return_value = mock.Mock(status_code=200, headers={}, content=b"{}")
+    assert client.get_accounts() == {}
+
+
+def test_pass_policy_keeps_sending():
+    policies = parse_call_policies("order=10/pass", 10)
+    client, breakers = _client(policies)
+    client.client.request.return_value = mock.Mock(status_code=503, headers={}, content=b"")
+    client.client.request.return_value.raise_for_status.side_effect = httpx.HTTPError("503")
+    for _ in range(5):
+        with pytest.raises(httpx.HTTPError):
+            client._request("POST", "/brokerage/orders", {"a": 1})
+    assert breakers.states()["order"] == OPEN
+    assert client.client.request.call_count == 5
+
+
+def test_abandoned_probe_gives_its_slot_back():
+    import asyncio
+    import time
+
+    client, breakers = _client(parse_call_policies("", 10))
+    breaker = breakers.get("quote")
+    client.client.request.side_effect = httpx.ConnectTimeout("down")
+    for _ in range(4):
+        with pytest.raises(httpx.ConnectTimeout):
+            client._request("GET", "/brokerage/products/BTC-USD")
+    reopen_at = time.monotonic() + CONFIG.open_seconds
+    breaker.clock = lambda: reopen_at
+
+    # the probe is cancelled before any answer, e.g. a hedge leg that lost the race
+    client.client.request.side_effect = asyncio.CancelledError()
+    with pytest.raises(asyncio.CancelledError):
+        client._request("GET", "/brokerage/products/BTC-USD")
+    assert breaker.state == HALF_OPEN
+
+    client.client.request.side_effect = None
+    client.client.request.return_value = mock.Mock(status_code=200, headers={}, content=b"{}")
+    assert client._request("GET", "/brokerage/products/BTC-USD") == {}
+    assert breaker.state == CLOSED
+
+
+def test_publisher_writes_markers_off_the_calling_thread():
+    import threading
+
+    from app.services.breaker import _StatePublisher
+
+    unblock, written = threading.Event(), threading.Event()
+    redis_client = mock.Mock()
+    redis_client.set.side_effect = lambda *args, **kwargs: unblock.wait(2)
+    redis_client.delete.side_effect = lambda key: written.set()
+    publisher = _StatePublisher(redis_client, 10)
+
+    publisher("order", OPEN)
+    publisher("order", CLOSED)
+    assert not written.is_set()
+    unblock.set()
+    assert written.wait(2)
+    key = redis_client.set.call_args.args[0]
+    assert key.startswith("coinbase:breaker:order:")
+    assert redis_client.delete.call_args.args[0] == key
+
+
+async def test_health_reports_worst_breaker_state():
+    from app.config import get_settings
+    from app.services.health import HealthProber
+
+    markers = {
+        b"coinbase:breaker:quote:host-a:11": b"open",
+        b"coinbase:breaker:quote:host-b:12": b"half_open",
+        b"coinbase:breaker:order:host-b:12": b"half_open",
+    }
+
+    class FakeRedis:
+        async def scan_iter(self, match, count):
+            for key in markers:
+                yield key
+
+        async def get(self, key):
+            return markers[key]
+
+    prober = HealthProber(mock.Mock(), FakeRedis(), get_settings())
+    assert await prober._breaker_states() == {
+        "quote": "open",
+        "order": "half_open",
+        "account": "closed",
+    }
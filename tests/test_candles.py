@@ -0,0 +1,73 @@
+import os
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+
+from app.services.candles import (  # noqa: E402
+    CANDLE_DTYPE,
+    CandleStore,
+    candles_from_rows,
+    read_csv,
+)
+
+
+def _rows(start: int, count: int) -> list[tuple]:
+    return [(60 * i, i, i + 1, i - 1, i + 0.5, 10.0) for i in range(start, start + count)]
+
+
+def test_append_skips_known_and_duplicate_candles(tmp_path):
+    store = CandleStore(tmp_path)
+    assert store.append("BTC-USD", "1m", candles_from_rows(_rows(0, 10))) == 10
+    # overlapping batch, unsorted, with a duplicate whose last row wins
+    batch = candles_from_rows(_rows(8, 5)[::-1] + [(60 * 12, 0, 0, 0, 99.0, 0)])
+    assert store.append("BTC-USD", "1m", batch) == 3
+
+    candles = store.read("BTC-USD", "1m")
+    assert len(candles) == 13
+    assert np.all(np.diff(candles["ts"]) == 60)
+    assert candles["close"][-1] == 99.0
+    assert store.path("BTC-USD", "1m").stat().st_size == 13 * CANDLE_DTYPE.itemsize
+
+
+def test_range_read_is_a_view_of_the_mapping(tmp_path):
+    store = CandleStore(tmp_path)
+    store.append("BTC-USD", "1m", candles_from_rows(_rows(0, 100)))
+    window = store.read("BTC-USD", "1m", start=600, end=1200)
+    assert window["ts"].tolist() == list(range(600, 1200, 60))
+    assert not window.flags.writeable
+    assert np.shares_memory(window, store.read("BTC-USD", "1m"))
+
+
+def test_reader_sees_appends_and_ignores_torn_tail(tmp_path):
+    store = CandleStore(tmp_path)
+    store.append("BTC-USD", "1m", candles_from_rows(_rows(0, 5)))
+    reader = CandleStore(tmp_path)
+    assert len(reader.read("BTC-USD", "1m")) == 5
+
+    with open(store.path("BTC-USD", "1m"), "ab") as handle:
+        handle.write(b"\x00" * 7)
+    assert reader.last_ts("BTC-USD", "1m") == 240
+    store.append("BTC-USD", "1m", candles_from_rows(_rows(5, 5)))
+    assert len(reader.read("BTC-USD", "1m")) == 10
+    assert reader.read("BTC-USD", "1m")["ts"][-1] == 540
+
+
+def test_missing_file_and_unknown_granularity(tmp_path):
+    store = CandleStore(tmp_path)
+    assert len(store.read("ETH-USD", "1h")) == 0
+    assert store.last_ts("ETH-USD", "1h") is None
+    with pytest.raises(ValueError):
+        store.read("ETH-USD", "7m")
+
+
+def test_read_csv(tmp_path):
+    path = tmp_path / "candles.csv"
+    path.write_text("ts,open,high,low,close,volume\n60,1,2,0.5,1.5,3\n0,1,2,0.5,1.2,4\n")
+    candles = read_csv(path)
+    assert candles["ts"].tolist() == [60, 0]
+    assert candles["close"].tolist() == [1.5, 1.2]
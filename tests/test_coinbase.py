@@ -1,4 +1,9 @@
+import asyncio
+import json
 import os
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest import mock
 
 os.environ.setdefault("WEBHOOK_SECRET", "test")
@@ -9,18 +14,254 @@ os.environ.setdefault("COINBASE_API_SECRET", "abc")
 os.environ.setdefault("COINBASE_API_KEY", "abc")
 os.environ.setdefault("COINBASE_API_PASSPHRASE", "pass")
 
-from app.services.coinbase import CoinbaseClient  # noqa: E402
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app.metrics import coinbase_connections_opened, coinbase_requests  # noqa: E402
+from app.services.breaker import BreakerConfig, Breakers, parse_call_policies  # noqa: E402
+from app.services.coinbase import (  # noqa: E402
+    AsyncCoinbaseClient,
+    BidAsk,
+    CoinbaseClient,
+    client_order_id_for,
+    close_coinbase_client,
+    get_coinbase_client,
+)
+from app.services.ratelimit import RateLimit, RateLimiter  # noqa: E402
+from app.workers import tasks  # noqa: E402
 
 
 def test_place_order(monkeypatch):
     client = CoinbaseClient()
     mock_response = mock.Mock()
     mock_response.status_code = 200
-    mock_response.json.return_value = {"order_id": "1"}
+    mock_response.content = b'{"order_id": "1"}'
 
-    def fake_request(method, url, headers=None, json=None):  # noqa: ANN001
+    def fake_request(method, url, headers=None, content=None, timeout=None):  # noqa: ANN001
         return mock_response
 
     monkeypatch.setattr(client.client, "request", fake_request)
-    resp = client.place_order("BTC-USD", "BUY", 0.1, 20000)
+    resp = client.place_order("BTC-USD", "BUY", 0.1, 20000, client_order_id="cid-0")
     assert resp["order_id"] == "1"
+
+
+def test_request_signs_the_bytes_it_sends(monkeypatch):
+    client = CoinbaseClient()
+    sent = {}
+    mock_response = mock.Mock(status_code=200, content=b"{}")
+
+    def fake_request(method, url, headers=None, content=None, timeout=None):  # noqa: ANN001
+        sent.update(headers=headers, content=content)
+        return mock_response
+
+    monkeypatch.setattr(client.client, "request", fake_request)
+    monkeypatch.setattr("app.services.coinbase.time.time", lambda: 1700000000)
+    client.place_order("BTC-USD", "buy", 0.1, 20000, client_order_id="cid-0")
+
+    expected = client._signed_headers("POST", "/brokerage/orders", sent["content"].decode())
+    assert sent["headers"]["CB-ACCESS-SIGN"] == expected["CB-ACCESS-SIGN"]
+
+
+def test_shared_client_reuses_connections():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # noqa: N802
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):  # noqa: ANN002
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = get_coinbase_client()
+        assert get_coinbase_client() is client
+        opened = coinbase_connections_opened._value.get()
+        requests = coinbase_requests._value.get()
+        for _ in range(3):
+            client.client.get(f"http://127.0.0.1:{server.server_port}/")
+        assert coinbase_requests._value.get() - requests == 3
+        assert coinbase_connections_opened._value.get() - opened == 1
+
+        close_coinbase_client()
+        assert get_coinbase_client() is not client
+    finally:
+        close_coinbase_client()
+        server.shutdown()
+
+
+def test_bulk_best_bid_ask_is_one_request(monkeypatch):
+    client = CoinbaseClient()
+    urls = []
+    body = (
+        b'{"pricebooks": ['
+        b'{"product_id": "BTC-USD", "bids": [{"price": "100", "size": "1"}],'
+        b' "asks": [{"price": "102", "size": "1"}]},'
+        b'{"product_id": "ETH-USD", "bids": [], "asks": [{"price": "10", "size": "1"}]}]}'
+    )
+
+    def fake_request(method, url, headers=None, content=None, timeout=None):  # noqa: ANN001
+        urls.append(url)
+        return mock.Mock(status_code=200, content=body)
+
+    monkeypatch.setattr(client.client, "request", fake_request)
+    books = client.get_best_bid_asks(["BTC-USD", "ETH-USD"])
+
+    assert len(urls) == 1
+    assert urls[0].endswith("/brokerage/best_bid_ask?product_ids=BTC-USD&product_ids=ETH-USD")
+    assert (books["BTC-USD"].best_bid, books["BTC-USD"].best_ask) == (100.0, 102.0)
+    assert (books["ETH-USD"].best_bid, books["ETH-USD"].best_ask) == (0.0, 10.0)
+
+
+def test_prefetch_task_writes_every_base_asset(monkeypatch):
+    written = {}
+
+    class Store:
+        def write_many(self, books, ttl_seconds):
+            written.update(books)
+
+    class Client:
+        def get_best_bid_asks(self, symbols):
+            return {symbol: BidAsk(1.0, 3.0) for symbol in symbols}
+
+    settings = tasks.settings.model_copy(update={"base_assets": ["BTC-USD", "SOL-USD"]})
+    monkeypatch.setattr(tasks, "settings", settings)
+    monkeypatch.setattr(tasks, "get_top_of_book_store", lambda: Store())
+    monkeypatch.setattr(tasks, "get_coinbase_client", lambda: Client())
+
+    assert tasks.prefetch_quotes() == 2
+    assert set(written) == {"BTC-USD", "SOL-USD"}
+    assert written["SOL-USD"].mid == 2.0
+
+
+def _order_client(responses):
+    """Client whose order POSTs run ``responses`` (callables of the payload) in order."""
+    limiter = RateLimiter(None, {"private": RateLimit(100, 100), "public": RateLimit(100, 100)})
+    breakers = Breakers(BreakerConfig(), parse_call_policies("", 10))
+    client = CoinbaseClient(http_client=mock.Mock(), limiter=limiter, breakers=breakers)
+    sent, lookups = [], []
+    lock = threading.Lock()
+
+    def fake_request(method, url, headers=None, content=None, timeout=None):  # noqa: ANN001
+        if method == "GET":
+            lookups.append(url)
+            return responses["lookup"]()
+        payload = json.loads(content)
+        with lock:
+            sent.append(payload["client_order_id"])
+            respond = responses["orders"][len(sent) - 1]
+        return respond(payload)
+
+    client.client.request.side_effect = fake_request
+    return client, sent, lookups
+
+
+def _ok(payload):
+    body = {
+        "success": True,
+        "success_response": {"order_id": "ex-1", "client_order_id": payload["client_order_id"]},
+    }
+    return mock.Mock(status_code=200, headers={}, content=json.dumps(body).encode())
+
+
+def test_client_order_id_is_deterministic():
+    alert_id = uuid.uuid4()
+    assert client_order_id_for(alert_id) == client_order_id_for(alert_id)
+    assert client_order_id_for(uuid.uuid4()) != client_order_id_for(alert_id)
+
+
+def test_slow_order_is_hedged_with_the_same_client_id():
+    release = threading.Event()
+
+    def slow(payload):
+        release.wait(2)
+        return _ok(payload)
+
+    client, sent, lookups = _order_client({"orders": [slow, _ok]})
+    response = client.submit_order("BTC-USD", "buy", 0.1, 100, "cid-1", hedge_after=0.05)
+    release.set()
+    assert response["success_response"]["order_id"] == "ex-1"
+    assert sent == ["cid-1", "cid-1"]
+    assert lookups == []
+
+
+def test_lost_response_is_recovered_by_client_id():
+    def lost(payload):
+        raise httpx.ReadTimeout("no response")
+
+    def duplicate(payload):
+        body = b'{"success": false, "error_response": {"error": "DUPLICATE_CLIENT_ORDER_ID"}}'
+        return mock.Mock(status_code=200, headers={}, content=body)
+
+    orders = b'{"orders": [{"order_id": "ex-9", "client_order_id": "cid-2"}]}'
+    client, sent, lookups = _order_client(
+        {
+            "orders": [lost, duplicate],
+            "lookup": lambda: mock.Mock(status_code=200, headers={}, content=orders),
+        }
+    )
+    response = client.submit_order("BTC-USD", "buy", 0.1, 100, "cid-2", hedge_after=0)
+    assert response["recovered"] and response["success_response"]["order_id"] == "ex-9"
+    assert len(lookups) == 1 and "client_order_id=cid-2" in lookups[0]
+
+    # nothing on the exchange under that id: the original error surfaces
+    client, _, _ = _order_client(
+        {
+            "orders": [lost],
+            "lookup": lambda: mock.Mock(status_code=200, headers={}, content=b'{"orders": []}'),
+        }
+    )
+    with pytest.raises(httpx.ReadTimeout):
+        client.submit_order("BTC-USD", "buy", 0.1, 100, "cid-3", hedge_after=0)
+
+
+def test_place_order_never_resends_under_a_new_client_id():
+    def lost(payload):
+        raise httpx.ReadTimeout("no response")
+
+    client, sent, lookups = _order_client(
+        {
+            "orders": [lost, lost, lost],
+            "lookup": lambda: mock.Mock(status_code=200, headers={}, content=b'{"orders": []}'),
+        }
+    )
+    with pytest.raises(httpx.ReadTimeout):
+        client.place_order("BTC-USD", "buy", 0.1, 100, client_order_id="cid-6")
+    assert sent == ["cid-6"]
+    assert len(lookups) == 1
+
+
+def test_rejection_is_returned_without_lookup():
+    def rejected(payload):
+        body = b'{"success": false, "error_response": {"error": "INSUFFICIENT_FUND"}}'
+        return mock.Mock(status_code=200, headers={}, content=body)
+
+    client, sent, lookups = _order_client({"orders": [rejected]})
+    response = client.submit_order("BTC-USD", "buy", 0.1, 100, "cid-4", hedge_after=0.5)
+    assert response["success"] is False
+    assert lookups == []
+
+
+async def test_async_hedge_returns_first_acceptance():
+    sent = []
+
+    async def request(method, url, headers=None, content=None, timeout=None):  # noqa: ANN001
+        payload = json.loads(content)
+        sent.append(payload["client_order_id"])
+        if len(sent) == 1:
+            await asyncio.sleep(5)
+        return _ok(payload)
+
+    client = AsyncCoinbaseClient(
+        http_client=mock.Mock(request=request),
+        breakers=Breakers(BreakerConfig(), parse_call_policies("", 10)),
+    )
+    response = await asyncio.wait_for(
+        client.submit_order("BTC-USD", "buy", 0.1, 100, "cid-5", hedge_after=0.05), 1
+    )
+    assert response["success"] is True
+    assert sent == ["cid-5", "cid-5"]
@@ -0,0 +1,65 @@
+import os
+import uuid
+
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+
+from app.services.dedupe import SeenAlertFilter  # noqa: E402
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, int] = {}
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=False):  # noqa: ANN001
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.ops: list[str] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):  # noqa: ANN002
+        return False
+
+    def set(self, key, value, ex=None):  # noqa: ANN001
+        self.ops.append(key)
+
+    async def execute(self):
+        for key in self.ops:
+            self.redis.data[key] = 1
+
+
+async def test_local_lru_marks_and_evicts():
+    seen_filter = SeenAlertFilter(max_local=2)
+    ids = [uuid.uuid4() for _ in range(3)]
+    assert await seen_filter.seen(ids[0]) is False
+    await seen_filter.mark(ids)
+    assert await seen_filter.seen_many(ids) == [False, True, True]
+
+
+async def test_shared_redis_hit_is_cached_locally():
+    redis = FakeRedis()
+    alert_id = uuid.uuid4()
+    await SeenAlertFilter(redis).mark([alert_id])
+
+    other_replica = SeenAlertFilter(redis)
+    assert await other_replica.seen(alert_id) is True
+    redis.data.clear()
+    assert await other_replica.seen(alert_id) is True
+
+
+async def test_unreachable_redis_is_treated_as_unseen():
+    class BrokenRedis:
+        async def mget(self, keys):
+            raise ConnectionError("down")
+
+    seen_filter = SeenAlertFilter(BrokenRedis())
+    assert await seen_filter.seen(uuid.uuid4()) is False
+    assert seen_filter._redis_available() is False
@@ -0,0 +1,66 @@
+import os
+import uuid
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.metrics import risk_events_backpressure, risk_events_dropped  # noqa: E402
+from app.services import events  # noqa: E402
+from app.services.risk import RiskEngine  # noqa: E402
+
+Base.metadata.create_all(bind=engine)
+
+
+def _count(event_type: str) -> int:
+    with SessionLocal() as session:
+        return session.scalar(
+            select(func.count())
+            .select_from(models.RiskEvent)
+            .where(models.RiskEvent.type == event_type)
+        )
+
+
+def test_sink_flushes_buffered_events_on_close():
+    event_type = f"test-{uuid.uuid4().hex[:8]}"
+    sink = events.RiskEventSink(engine, flush_rows=3, flush_interval=5)
+    sink.start()
+    for i in range(7):
+        assert sink.emit(event_type, {"i": i})
+    sink.close()
+    assert sink.pending() == 0
+    assert _count(event_type) == 7
+
+
+def test_full_buffer_counts_backpressure_and_drops():
+    sink = events.RiskEventSink(engine, max_buffer=1, block_timeout=0.01)
+    waited = risk_events_backpressure._value.get()
+    dropped = risk_events_dropped._value.get()
+    assert sink.emit("test-drop", {})
+    assert sink.emit("test-drop", {}) is False
+    assert risk_events_backpressure._value.get() == waited + 1
+    assert risk_events_dropped._value.get() == dropped + 1
+
+
+def test_risk_engine_hands_events_to_sink_only_after_commit(monkeypatch):
+    sink = events.RiskEventSink(engine)
+    monkeypatch.setattr(events, "_sink", sink)
+    session = SessionLocal()
+    risk = RiskEngine(session, get_settings())
+
+    risk.record_risk_event("blocked", {"reason": "rolled back"})
+    risk.discard_events()
+    risk.record_risk_event("blocked", {"reason": "committed"})
+    assert sink.pending() == 0
+    risk.publish_events()
+
+    assert sink.pending() == 1
+    assert not session.new
+    session.close()
@@ -8,3 +8,34 @@ from app.services.idempotency import throttle_symbol  # noqa: E402
 def test_throttle_symbol_blocks_second_call():
     assert throttle_symbol("BTC-USD", 60) is True
     assert throttle_symbol("BTC-USD", 60) is False
+
+
+def test_token_bucket_policies_for_symbol_and_strategy():
+    from app.services.idempotency import Throttle, ThrottlePolicy, parse_policies
+
+    policies = parse_policies("ETH-USD=2/60; strategy:scalp=1/60")
+    assert policies["ETH-USD"] == ThrottlePolicy(2, 2 / 60)
+    throttle = Throttle(None, policies)
+    default = ThrottlePolicy.per_window(60)
+
+    assert throttle.allow("ETH-USD", default) is True
+    assert throttle.allow("ETH-USD", default) is True
+    assert throttle.allow("ETH-USD", default) is False
+
+    assert throttle.allow("SOL-USD", default, strategy="scalp") is True
+    # the strategy bucket is empty, and the symbol bucket is not spent by the refusal
+    assert throttle.allow("SUI-USD", default, strategy="scalp") is False
+    assert throttle.allow("SUI-USD", default) is True
+
+
+def test_memory_buckets_are_bounded_and_swept():
+    from app.services.idempotency import ThrottlePolicy, _MemoryBuckets
+
+    policy = ThrottlePolicy.per_window(10)
+    memory = _MemoryBuckets(max_keys=3, sweep_interval=0)
+    for i in range(5):
+        assert memory.take([(f"k{i}", policy)], now=100.0)
+    assert len(memory) == 3
+
+    assert memory.take([("late", policy)], now=200.0)
+    assert len(memory) == 1
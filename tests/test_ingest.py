@@ -0,0 +1,67 @@
+import asyncio
+import datetime as dt
+import os
+import uuid
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+from app.db.base import Base  # noqa: E402
+from app.db.session import engine  # noqa: E402
+from app.services.ingest import AlertIngestor, TradeDispatcher  # noqa: E402
+
+Base.metadata.create_all(bind=engine)
+
+
+def _row(alert_id: uuid.UUID) -> dict:
+    return {
+        "id": alert_id,
+        "symbol": "BTC-USD",
+        "side": "buy",
+        "price": 20000,
+        "confidence": None,
+        "timeframe": None,
+        "strategy": None,
+        "received_at": dt.datetime.utcnow(),
+    }
+
+
+async def test_group_commit_resolves_inserted_and_duplicates():
+    ingestor = AlertIngestor(max_rows=10, max_delay=0.05)
+    flushes = []
+    original = ingestor._flush
+
+    async def counting_flush(rows):
+        flushes.append(len(rows))
+        return await original(rows)
+
+    ingestor._flush = counting_flush
+    first, second = uuid.uuid4(), uuid.uuid4()
+    results = await asyncio.gather(
+        ingestor.submit(_row(first)),
+        ingestor.submit(_row(second)),
+        ingestor.submit(_row(first)),
+    )
+    assert results == [True, True, False]
+    assert flushes == [3]
+
+    assert await ingestor.submit(_row(second)) is False
+
+
+async def test_group_commit_flushes_when_batch_is_full():
+    ingestor = AlertIngestor(max_rows=2, max_delay=10)
+    results = await asyncio.wait_for(
+        ingestor.submit_many([_row(uuid.uuid4()), _row(uuid.uuid4())]), timeout=1
+    )
+    assert results == [True, True]
+
+
+async def test_trade_dispatcher_coalesces_ids_into_one_message():
+    published = []
+    dispatcher = TradeDispatcher(
+        lambda ids, shard_key: published.append(ids), max_rows=50, max_delay=0.05
+    )
+    await asyncio.gather(*(dispatcher.dispatch(str(i), "BTC-USD") for i in range(3)))
+    assert published == [["0", "1", "2"]]
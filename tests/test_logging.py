@@ -0,0 +1,32 @@
+import io
+import json
+import logging
+from decimal import Decimal
+
+from app.utils.logging import RequestJsonFormatter, _serialize
+
+
+def test_unknown_extra_values_fall_back_to_str():
+    class Custom:
+        def __str__(self) -> str:
+            return "custom"
+
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(
+        RequestJsonFormatter("%(level)s %(name)s %(message)s", json_serializer=_serialize)
+    )
+    logger = logging.getLogger("tests.logging")
+    logger.addHandler(handler)
+    try:
+        logger.warning(
+            "x", extra={"e": ValueError("boom"), "obj": Custom(), "size": Decimal("0.5")}
+        )
+    finally:
+        logger.removeHandler(handler)
+
+    line = json.loads(stream.getvalue())
+    assert line["message"] == "x"
+    assert line["e"] == "ValueError: boom"
+    assert line["obj"] == "custom"
+    assert line["size"] == 0.5
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+import pytest  # noqa: E402
+import redis  # noqa: E402
+import websockets  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.services.coinbase import BidAsk  # noqa: E402
+from app.services.marketdata import MarketDataService, QuoteUnavailable  # noqa: E402
+from app.services.quotes import QuoteCache  # noqa: E402
+from app.services.topofbook import TopOfBook  # noqa: E402
+from app.workers.marketdata_stream import parse_ticker, stream  # noqa: E402
+
+# recorded from the Advanced Trade ticker channel (trimmed)
+RECORDED_TICKS = [
+    {
+        "channel": "ticker",
+        "timestamp": "2024-03-01T12:00:00.123456789Z",
+        "sequence_num": 0,
+        "events": [
+            {
+                "type": "snapshot",
+                "tickers": [
+                    {
+                        "type": "ticker",
+                        "product_id": "BTC-USD",
+                        "price": "61000.10",
+                        "best_bid": "61000.00",
+                        "best_ask": "61000.20",
+                    },
+                    {
+                        "type": "ticker",
+                        "product_id": "ETH-USD",
+                        "price": "3400.5",
+                        "best_bid": "3400.40",
+                        "best_ask": "3400.60",
+                    },
+                ],
+            }
+        ],
+    },
+    {"channel": "heartbeats", "timestamp": "2024-03-01T12:00:01Z", "events": []},
+    "not json",
+    {
+        "channel": "ticker",
+        "timestamp": "2024-03-01T12:00:01.5Z",
+        "sequence_num": 2,
+        "events": [
+            {
+                "type": "update",
+                "tickers": [
+                    {
+                        "type": "ticker",
+                        "product_id": "BTC-USD",
+                        "price": "61010.00",
+                        "best_bid": "61009.90",
+                        "best_ask": "61010.10",
+                    },
+                ],
+            }
+        ],
+    },
+]
+
+
+class _RecordingStore:
+    def __init__(self, stop: asyncio.Event, expected_writes: int) -> None:
+        self.books: dict[str, TopOfBook] = {}
+        self.writes = 0
+        self.stop = stop
+        self.expected_writes = expected_writes
+
+    async def write_many(self, books):
+        self.books.update(books)
+        self.writes += 1
+        if self.writes == self.expected_writes:
+            self.stop.set()
+
+
+async def test_stream_mirrors_replayed_ticks_into_store():
+    subscriptions = []
+
+    async def replay(ws):
+        for _ in range(2):
+            subscriptions.append(json.loads(await ws.recv()))
+        for tick in RECORDED_TICKS:
+            await ws.send(tick if isinstance(tick, str) else json.dumps(tick))
+        await ws.wait_closed()
+
+    async with websockets.serve(replay, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        stop = asyncio.Event()
+        store = _RecordingStore(stop, expected_writes=2)
+        await asyncio.wait_for(
+            stream(f"ws://127.0.0.1:{port}", ["BTC-USD", "ETH-USD"], store, stop), timeout=5
+        )
+
+    assert {sub["channel"] for sub in subscriptions} == {"ticker", "heartbeats"}
+    assert subscriptions[0]["product_ids"] == ["BTC-USD", "ETH-USD"]
+    assert store.books["BTC-USD"].mid == 61010.0
+    assert store.books["ETH-USD"].mid == 3400.5
+    assert (
+        store.books["BTC-USD"].exchange_ts == parse_ticker(RECORDED_TICKS[3])["BTC-USD"].exchange_ts
+    )
+
+
+class _FlakyStore(_RecordingStore):
+    async def write_many(self, books):
+        if self.writes == 0:
+            self.writes += 1
+            raise redis.ConnectionError("redis down")
+        await super().write_many(books)
+
+
+async def test_stream_survives_store_failures():
+    async def replay(ws):
+        for _ in range(2):
+            await ws.recv()
+        for tick in RECORDED_TICKS:
+            await ws.send(tick if isinstance(tick, str) else json.dumps(tick))
+        await ws.wait_closed()
+
+    async with websockets.serve(replay, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        stop = asyncio.Event()
+        store = _FlakyStore(stop, expected_writes=2)
+        await asyncio.wait_for(
+            stream(f"ws://127.0.0.1:{port}", ["BTC-USD"], store, stop, backoff=0), timeout=5
+        )
+
+    # the failed update was dropped and the next one written
+    assert store.books["BTC-USD"].mid == 61010.0
+
+
+class _Books:
+    def __init__(self, book):
+        self.book = book
+
+    def read(self, symbol):
+        return self.book
+
+
+class _Rest:
+    def __init__(self):
+        self.calls = 0
+
+    def get_best_bid_ask(self, symbol):
+        self.calls += 1
+        return BidAsk(best_bid=99.0, best_ask=101.0)
+
+
+def test_marketdata_prefers_fresh_stream_and_falls_back_to_rest():
+    settings = get_settings().model_copy(
+        update={"coinbase_api_key": "key", "quote_stream_max_age_ms": 1000}
+    )
+    now = time.time()
+    rest = _Rest()
+    fresh = MarketDataService(
+        rest, settings, cache=QuoteCache(max_age=0), books=_Books(TopOfBook(49, 51, now, now))
+    )
+    assert fresh.get_mid_price("BTC-USD") == 50
+    assert rest.calls == 0
+
+    stale = MarketDataService(
+        rest,
+        settings,
+        cache=QuoteCache(max_age=0),
+        books=_Books(TopOfBook(49, 51, now - 10, now - 10)),
+    )
+    assert stale.get_mid_price("BTC-USD") == 100
+    assert rest.calls == 1
+
+
+class _DownRest:
+    def get_best_bid_ask(self, symbol):
+        raise ConnectionError("exchange unreachable")
+
+
+def test_live_trading_never_prices_at_the_alert_without_a_quote():
+    settings = get_settings().model_copy(update={"coinbase_api_key": "key", "trading_mode": "live"})
+    live = MarketDataService(_DownRest(), settings, cache=QuoteCache(), books=_Books(None))
+    with pytest.raises(QuoteUnavailable):
+        live.get_mid_price("BTC-USD", fallback=100.0)
+
+    paper = MarketDataService(
+        _DownRest(),
+        settings.model_copy(update={"trading_mode": "paper"}),
+        cache=QuoteCache(),
+        books=_Books(None),
+    )
+    assert paper.get_mid_price("BTC-USD", fallback=100.0) == 100.0
@@ -0,0 +1,71 @@
+import os
+import uuid
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+from sqlalchemy import event, update  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.db import models  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.metrics import position_conflicts  # noqa: E402
+from app.services.positions import PositionBook  # noqa: E402
+from app.services.risk import RiskEngine  # noqa: E402
+
+Base.metadata.create_all(bind=engine)
+
+
+def _symbol() -> str:
+    return f"P{uuid.uuid4().hex[:6]}-USD"
+
+
+def test_position_check_reads_book_without_queries():
+    symbol = _symbol()
+    with SessionLocal() as session:
+        session.add(models.Position(symbol=symbol, qty=2, avg_price=100))
+        session.commit()
+        book = PositionBook()
+        book.load(session)
+        risk = RiskEngine(session, get_settings(), positions=book)
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])  # noqa: E731
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            assert book.get(session, symbol).qty == 2
+            risk.check_position_limits(symbol, 1, 100, "buy")
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert statements == []
+
+
+def test_fill_refreshes_symbol_after_version_conflict():
+    symbol = _symbol()
+    with SessionLocal() as session:
+        book = PositionBook()
+        record = book.apply_fill(session, symbol, "buy", 1, 100)
+        session.commit()
+        book.publish({symbol: record})
+        assert record.version == 0
+
+        # another writer moves the row behind the book's back
+        session.execute(
+            update(models.Position)
+            .where(models.Position.symbol == symbol)
+            .values(qty=5, version=models.Position.version + 1)
+        )
+        session.commit()
+
+        conflicts = position_conflicts._value.get()
+        record = book.apply_fill(session, symbol, "sell", 2, 100)
+        session.commit()
+        book.publish({symbol: record})
+
+        assert position_conflicts._value.get() == conflicts + 1
+        assert record.qty == 3 and record.version == 2
+        row = session.get(models.Position, symbol)
+        assert float(row.qty) == 3 and row.version == 2
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+import pytest  # noqa: E402
+
+from app.services.quotes import QuoteCache, parse_max_ages  # noqa: E402
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = QuoteCache(max_age=10)
+    calls = []
+    gate = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        gate.wait(1)
+        return 100.0
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(cache.get, "BTC-USD", fetch) for _ in range(8)]
+        time.sleep(0.05)
+        gate.set()
+        assert [f.result() for f in futures] == [100.0] * 8
+    assert len(calls) == 1
+    assert cache.get("BTC-USD", lambda: 0.0) == 100.0
+
+
+async def test_async_misses_share_one_fetch():
+    cache = QuoteCache(max_age=10)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 50.0
+
+    results = await asyncio.gather(*(cache.aget("ETH-USD", fetch) for _ in range(5)))
+    assert results == [50.0] * 5
+    assert len(calls) == 1
+
+
+def test_stale_quote_served_only_within_tolerance():
+    cache = QuoteCache(max_age=0.0, max_stale=60)
+    cache.put("SOL-USD", 100.0, fetched_at=time.monotonic() - 1)
+
+    def failing():
+        raise RuntimeError("coinbase down")
+
+    assert cache.get("SOL-USD", failing, reference=101.0, tolerance=0.02) == 100.0
+    with pytest.raises(RuntimeError):
+        cache.get("SOL-USD", failing, reference=110.0, tolerance=0.02)
+
+
+def test_per_symbol_max_age():
+    cache = QuoteCache(max_age=0.0, max_ages=parse_max_ages("BTC-USD=60000"))
+    cache.put("BTC-USD", 1.0)
+    cache.put("SUI-USD", 1.0)
+    assert cache.get("BTC-USD", lambda: 2.0) == 1.0
+    assert cache.get("SUI-USD", lambda: 2.0) == 2.0
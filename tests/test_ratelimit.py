@@ -0,0 +1,165 @@
+import os
+import time
+from unittest import mock
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+import pytest  # noqa: E402
+
+from app.services.ratelimit import (  # noqa: E402
+    ORDER,
+    READ,
+    AsyncRateLimiter,
+    RateLimit,
+    RateLimiter,
+    pause_seconds,
+    priority_for,
+    scope_for,
+)
+
+
+def _limiter(**kwargs) -> RateLimiter:
+    return RateLimiter(
+        None,
+        {"private": RateLimit(burst=5, rate=1), "public": RateLimit(burst=5, rate=1)},
+        order_reserve=2,
+        max_wait={ORDER: 0.0, READ: 0.0},
+        **kwargs,
+    )
+
+
+def test_reads_leave_the_order_reserve():
+    limiter = _limiter()
+    assert [limiter.acquire("private", READ) for _ in range(4)] == [True, True, True, False]
+    # the reserved tokens still go to orders
+    assert limiter.acquire("private", ORDER)
+    assert limiter.acquire("private", ORDER)
+    assert not limiter.acquire("private", ORDER)
+    # scopes have separate buckets
+    assert limiter.acquire("public", READ)
+
+
+class _Clock:
+    """Stands in for ``time`` in the limiter: sleeping advances both clocks."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept: list[float] = []
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_acquire_waits_within_max_wait(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr("app.services.ratelimit.time", clock)
+    limiter = _limiter()
+    limiter.max_wait[ORDER] = 1.5
+    for _ in range(5):
+        assert limiter.acquire("private", ORDER)
+    assert limiter.acquire("private", ORDER)
+    assert clock.slept == [pytest.approx(1.0)]
+    # the next token is another second away; reads would also have to wait for the reserve
+    limiter.max_wait[ORDER] = 0.5
+    assert not limiter.acquire("private", ORDER)
+
+
+def test_redis_failure_falls_back_for_the_cooldown(monkeypatch):
+    import redis
+
+    clock = _Clock()
+    monkeypatch.setattr("app.services.ratelimit.time", clock)
+    script = mock.Mock(side_effect=redis.ConnectionError("down"))
+    client = mock.Mock(register_script=mock.Mock(return_value=script))
+    limiter = RateLimiter(
+        client, {"private": RateLimit(burst=5, rate=1)}, max_wait={READ: 0.0}, redis_cooldown=5
+    )
+
+    assert limiter.acquire("private", READ)
+    assert limiter.acquire("private", READ)
+    limiter.observe("private", 429, {"retry-after": "1"})
+    # one failed round trip, then the process-local buckets until the cooldown ends
+    assert script.call_count == 1
+    client.set.assert_not_called()
+
+    clock.now += 5
+    script.side_effect, script.return_value = None, 0
+    assert limiter.acquire("private", READ)
+    assert script.call_count == 2
+
+
+def test_retry_after_pauses_the_scope():
+    limiter = _limiter()
+    limiter.observe("private", 429, {"retry-after": "30"})
+    assert not limiter.acquire("private", ORDER)
+    assert limiter.acquire("public", ORDER)
+
+
+def test_pause_seconds_from_headers():
+    assert pause_seconds(429, {"retry-after": "2.5"}, 0) == 2.5
+    assert pause_seconds(429, {}, 0) == 1.0
+    assert pause_seconds(
+        429, {"retry-after": "Wed, 21 Oct 2015 07:28:30 GMT"}, 1445412480
+    ) == pytest.approx(30)
+    assert pause_seconds(200, {"x-ratelimit-remaining": "0", "x-ratelimit-reset": "3"}, 0) == 3
+    assert pause_seconds(200, {"x-ratelimit-remaining": "4", "x-ratelimit-reset": "3"}, 0) == 0
+
+
+def test_scope_and_priority():
+    assert scope_for("/brokerage/market/products/BTC-USD") == "public"
+    assert scope_for("/brokerage/products/BTC-USD") == "private"
+    assert priority_for("POST", "/brokerage/orders") == ORDER
+    assert priority_for("GET", "/brokerage/orders/historical/1") == READ
+
+
+def test_client_fails_fast_without_budget():
+    from app.services.coinbase import CoinbaseBudgetExceeded, CoinbaseClient
+
+    limiter = _limiter()
+    limiter.observe("private", 429, {"retry-after": "60"})
+    client = CoinbaseClient(http_client=mock.Mock(), limiter=limiter)
+    with pytest.raises(CoinbaseBudgetExceeded):
+        client.get_best_bid_ask("BTC-USD")
+    client.client.request.assert_not_called()
+
+
+def test_client_429_pauses_and_retries_without_backoff(monkeypatch):
+    from app.services.coinbase import CoinbaseClient
+
+    clock = _Clock()
+    monkeypatch.setattr("app.services.ratelimit.time", clock)
+    limiter = _limiter()
+    limiter.max_wait[READ] = 5.0
+    responses = iter(
+        [
+            mock.Mock(status_code=429, headers={"retry-after": "0.5"}),
+            mock.Mock(status_code=200, headers={}, content=b'{"price": {"best_bid": "1"}}'),
+        ]
+    )
+    client = CoinbaseClient(http_client=mock.Mock(), limiter=limiter)
+    client.client.request.side_effect = lambda *args, **kwargs: next(responses)
+    started = time.monotonic()
+    assert client.get_best_bid_ask("BTC-USD").best_bid == 1.0
+    # the retry waited out Retry-After in the limiter instead of tenacity's 1s+ backoff
+    assert clock.slept == [pytest.approx(0.5)]
+    assert time.monotonic() - started < 0.5
+
+
+async def test_async_limiter_shares_the_policy():
+    limiter = AsyncRateLimiter(
+        None, {"private": RateLimit(burst=2, rate=1)}, order_reserve=1, max_wait={READ: 0.0}
+    )
+    assert await limiter.acquire("private", READ)
+    assert not await limiter.acquire("private", READ)
+    await limiter.observe("private", 429, {"retry-after": "10"})
+    assert limiter.memory._paused["private"] > 0
@@ -1,14 +1,18 @@
+import datetime as dt
 import os
+import uuid
 
 os.environ.setdefault("WEBHOOK_SECRET", "test")
 os.environ.setdefault("DB_URL", "sqlite:///./test.db")
 os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
 os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
 
+from sqlalchemy import select  # noqa: E402
+
 from app.config import get_settings  # noqa: E402
-from app.db.base import Base  # noqa: E402
-from app.db.session import engine, SessionLocal  # noqa: E402
 from app.db import models  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
 from app.services.risk import RiskEngine  # noqa: E402
 
 Base.metadata.create_all(bind=engine)
@@ -25,3 +29,89 @@ def test_position_limit_block():
         assert not result.ok
     finally:
         session.close()
+
+
+def _used(session) -> float:
+    today = dt.datetime.utcnow().date().isoformat()
+    value = session.scalar(
+        select(models.DailyRisk.notional_used).where(models.DailyRisk.trade_day == today)
+    )
+    return float(value or 0)
+
+
+def test_daily_risk_reservation_is_bounded_and_releasable():
+    session = SessionLocal()
+    try:
+        used = _used(session)
+        base = get_settings()
+        settings = base.model_copy(
+            update={"paper_cash_usd": (used + 100) / base.max_daily_risk_pct}
+        )
+        risk = RiskEngine(session, settings)
+
+        reservation = risk.reserve_daily_risk(60, uuid.uuid4())
+        assert reservation is not None
+        assert risk.reserve_daily_risk(60, uuid.uuid4()) is None
+        assert not risk.check_daily_risk(60, uuid.uuid4()).ok
+
+        risk.release_daily_risk(reservation)
+        again = risk.check_daily_risk(60, uuid.uuid4())
+        assert again.ok
+        risk.release_daily_risk(again.reservation)
+    finally:
+        session.close()
+
+
+def test_sqlite_reservation_stays_in_the_callers_transaction():
+    session = SessionLocal()
+    try:
+        before = _used(session)
+        risk = RiskEngine(session, get_settings().model_copy(update={"paper_cash_usd": 1e12}))
+        reservation = risk.reserve_daily_risk(1, uuid.uuid4())
+        assert reservation is not None and not reservation.shared
+        assert _used(session) == before + 1
+        # nothing was committed behind the caller's back
+        session.rollback()
+        assert _used(session) == before
+    finally:
+        session.close()
+
+
+def test_redelivered_alert_reuses_its_reservation():
+    session = SessionLocal()
+    try:
+        before = _used(session)
+        risk = RiskEngine(session, get_settings().model_copy(update={"paper_cash_usd": 1e12}))
+        alert_id = uuid.uuid4()
+        risk.reserve_daily_risk(3, alert_id)
+        again = risk.reserve_daily_risk(4, alert_id)
+        assert again.notional == 3
+        assert _used(session) == before + 3
+        risk.release_daily_risk(again)
+        assert _used(session) == before
+    finally:
+        session.rollback()
+        session.close()
+
+
+def test_reclaim_gives_back_only_reservations_without_an_order():
+    session = SessionLocal()
+    try:
+        risk = RiskEngine(session, get_settings().model_copy(update={"paper_cash_usd": 1e12}))
+        orphaned, traded = uuid.uuid4(), uuid.uuid4()
+        session.add(models.Alert(id=traded, symbol="BTC-USD", side="buy", price=1))
+        session.flush()
+        session.add(
+            models.Order(alert_id=traded, symbol="BTC-USD", side="buy", qty=1, limit_price=1)
+        )
+        session.flush()
+        before = _used(session)
+        risk.reserve_daily_risk(5, orphaned)
+        risk.reserve_daily_risk(7, traded)
+
+        assert risk.reclaim_daily_risk(3600) == 0
+        assert risk.reclaim_daily_risk(0) == 5
+        assert _used(session) == before + 7
+    finally:
+        session.rollback()
+        session.close()
@@ -0,0 +1,34 @@
+import os
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+from app.workers.routing import (  # noqa: E402
+    queue_for_symbol,
+    rebalance_plan,
+    route_trade_task,
+    shard_queues,
+)
+
+SYMBOLS = [f"C{i:03d}-USD" for i in range(400)]
+
+
+def test_single_shard_keeps_legacy_queue():
+    assert queue_for_symbol("BTC-USD", shards=1) == "trades"
+    assert route_trade_task("enqueue_trade_task", ("id",), {}, {}) == {"queue": "trades"}
+    assert route_trade_task("other_task", (), {}, {}) is None
+
+
+def test_symbols_spread_over_all_shards_deterministically():
+    queues = {queue_for_symbol(symbol, shards=4) for symbol in SYMBOLS}
+    assert queues == set(shard_queues(4))
+    assert queue_for_symbol("btc-usd", shards=4) == queue_for_symbol("BTC-USD", shards=4)
+
+
+def test_adding_a_shard_moves_only_its_share():
+    plan = rebalance_plan(SYMBOLS, 4, 5)
+    # ideal is 1/5 of the symbols, all moving onto the new shard
+    assert 0 < len(plan) < len(SYMBOLS) * 0.35
+    assert {new for _, new in plan.values()} == {"trades.4"}
@@ -1,22 +1,75 @@
+import datetime as dt
 import os
+import time
 import uuid
-import datetime as dt
+from types import SimpleNamespace
+from unittest import mock
 
 os.environ.setdefault("WEBHOOK_SECRET", "test")
 os.environ.setdefault("DB_URL", "sqlite:///./test.db")
 os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
 os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
 
+import pytest  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.engine import Connection  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
 from app.config import get_settings  # noqa: E402
-from app.db.base import Base  # noqa: E402
-from app.db.session import engine, SessionLocal  # noqa: E402
 from app.db import models  # noqa: E402
-from app.services.trading import TradingService  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from app.metrics import trade_stage_latency  # noqa: E402
+from app.services import events, trading  # noqa: E402
+from app.services.coinbase import client_order_id_for  # noqa: E402
+from app.services.marketdata import QuoteUnavailable  # noqa: E402
+from app.services.positions import get_position_book  # noqa: E402
 from app.services.reporting import daily_pnl_report  # noqa: E402
+from app.services.trading import TradingService  # noqa: E402
+from app.services.volatility import VolatilityEngine  # noqa: E402
+from app.workers import tasks  # noqa: E402
 
 Base.metadata.create_all(bind=engine)
 
 
+@pytest.fixture
+def session():
+    db = SessionLocal()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def settings():
+    # a daily budget no earlier test can exhaust
+    return get_settings().model_copy(update={"max_daily_risk_pct": 1000.0})
+
+
+@pytest.fixture
+def quote_at_alert_price(monkeypatch):
+    monkeypatch.setattr(
+        "app.services.marketdata.MarketDataService.get_mid_price",
+        lambda self, symbol, fallback=None: fallback,
+    )
+
+
+def _alert(session, prefix: str) -> tuple[uuid.UUID, str]:
+    """A committed buy alert at 100 on a symbol of its own."""
+    alert_id = uuid.uuid4()
+    symbol = f"{prefix}{alert_id.hex[:6]}-USD"
+    session.add(models.Alert(id=alert_id, symbol=symbol, side="buy", price=100))
+    session.commit()
+    return alert_id, symbol
+
+
+def _orders(session, *alert_ids: uuid.UUID) -> list[models.Order]:
+    return (
+        session.execute(select(models.Order).where(models.Order.alert_id.in_(alert_ids)))
+        .scalars()
+        .all()
+    )
+
+
 def test_paper_trade_updates_position(monkeypatch):
     session = SessionLocal()
     settings = get_settings()
@@ -41,3 +94,158 @@ def test_paper_trade_updates_position(monkeypatch):
     report = daily_pnl_report(session, dt.datetime.utcnow().date())
     assert report
     session.close()
+
+
+@pytest.mark.usefixtures("quote_at_alert_price")
+def test_trade_batch_runs_alerts_in_one_session(monkeypatch, session, settings):
+    monkeypatch.setattr(tasks, "settings", settings)
+    alert_ids = [_alert(session, "B")[0] for _ in range(2)]
+    missing = uuid.uuid4()
+
+    tasks.enqueue_trade_batch([str(alert_ids[0]), str(missing), str(alert_ids[1])])
+
+    assert {order.alert_id for order in _orders(session, *alert_ids)} == set(alert_ids)
+
+
+@pytest.mark.usefixtures("quote_at_alert_price")
+def test_trade_batch_publishes_only_after_the_outer_commit(monkeypatch, session, settings):
+    monkeypatch.setattr(tasks, "settings", settings)
+    emitted = []
+    monkeypatch.setattr(events, "_sink", SimpleNamespace(emit=lambda *event: emitted.append(event)))
+    failed_id, _ = _alert(session, "K")
+    committed_id, _ = _alert(session, "K")
+
+    failure = OperationalError("COMMIT", {}, Exception("disk I/O error"))
+    with mock.patch.object(Connection, "_commit_impl", side_effect=failure):
+        with pytest.raises(OperationalError):
+            tasks.enqueue_trade_batch([str(failed_id)])
+    # the alert's savepoint was released, but nothing of the batch reached the sink or the book
+    assert emitted == []
+    assert not get_position_book()._loaded
+
+    tasks.enqueue_trade_batch([str(committed_id)])
+    assert [event_type for event_type, _ in emitted] == ["paper_fill"]
+
+
+@pytest.mark.usefixtures("quote_at_alert_price")
+def test_failed_fill_rolls_back_whole_alert(monkeypatch, session, settings):
+    alert_id, symbol = _alert(session, "U")
+    today = dt.datetime.utcnow().date().isoformat()
+    before = session.get(models.DailyRisk, today)
+    used_before = float(before.notional_used) if before else 0.0
+
+    service = TradingService(session, settings)
+
+    def broken_event(event_type, details):
+        if event_type == "paper_fill":
+            raise RuntimeError("audit write failed")
+
+    monkeypatch.setattr(service.risk, "record_risk_event", broken_event)
+    with pytest.raises(RuntimeError):
+        service.execute_alert(alert_id)
+
+    session.expire_all()
+    assert _orders(session, alert_id) == []
+    assert session.get(models.Position, symbol) is None
+    after = session.get(models.DailyRisk, today)
+    assert (float(after.notional_used) if after else 0.0) == pytest.approx(used_before)
+
+
+def test_quote_fetch_overlaps_throttle(monkeypatch, session, settings):
+    alert_id, symbol = _alert(session, "C")
+
+    def slow_throttle(*args):
+        time.sleep(0.2)
+        return True
+
+    def slow_quote(symbol, fallback=None):
+        time.sleep(0.2)
+        return fallback
+
+    monkeypatch.setattr(trading, "throttle_symbol", slow_throttle)
+    service = TradingService(session, settings)
+    monkeypatch.setattr(service.marketdata, "get_mid_price", slow_quote)
+    quotes = trade_stage_latency.labels("quote")._sum.get()
+
+    started = time.perf_counter()
+    service.execute_alert(alert_id)
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35
+    assert trade_stage_latency.labels("quote")._sum.get() - quotes >= 0.2
+    assert session.get(models.Position, symbol) is not None
+
+
+@pytest.mark.usefixtures("quote_at_alert_price")
+def test_warm_volatility_scales_size(session, settings):
+    alert_id, symbol = _alert(session, "V")
+    volatility = VolatilityEngine(window=3)
+    for _ in range(5):
+        volatility.update(symbol, 105.0, 95.0, 100.0)
+
+    TradingService(session, settings, volatility=volatility).execute_alert(alert_id)
+
+    (order,) = _orders(session, alert_id)
+    fixed = settings.paper_cash_usd * settings.max_pos_pct / 100
+    # ATR 10 on a 100 price: 10% smaller than fixed-fraction sizing
+    assert float(order.qty) == pytest.approx(fixed * 0.9)
+
+
+class _Exchange:
+    def __init__(self):
+        self.calls = []
+
+    def submit_order(self, symbol, side, size, limit_price, client_order_id):
+        self.calls.append(client_order_id)
+        return {"success": True, "success_response": {"order_id": "ex-42"}}
+
+
+@pytest.mark.usefixtures("quote_at_alert_price")
+def test_live_order_uses_the_alert_client_order_id(session, settings):
+    settings = settings.model_copy(update={"trading_mode": "live"})
+    alert_id, _ = _alert(session, "L")
+
+    exchange = _Exchange()
+    TradingService(session, settings, exchange).execute_alert(alert_id)
+
+    (order,) = _orders(session, alert_id)
+    assert exchange.calls == [client_order_id_for(alert_id)]
+    assert (order.client_order_id, order.exchange_order_id) == (exchange.calls[0], "ex-42")
+    assert order.status == "submitted"
+
+
+def test_live_alert_without_a_usable_quote_is_blocked(monkeypatch, session, settings):
+    settings = settings.model_copy(update={"trading_mode": "live"})
+    alert_id, _ = _alert(session, "N")
+    exchange = _Exchange()
+    service = TradingService(session, settings, exchange)
+
+    def no_quote(symbol, fallback=None):
+        raise QuoteUnavailable(symbol)
+
+    monkeypatch.setattr(service.marketdata, "get_mid_price", no_quote)
+    monkeypatch.setattr(trading, "throttle_symbol", lambda *args: True)
+    blocked = []
+    monkeypatch.setattr(
+        service.risk, "record_risk_event", lambda event_type, details: blocked.append(details)
+    )
+    service.execute_alert(alert_id)
+
+    assert exchange.calls == []
+    assert _orders(session, alert_id) == []
+    assert blocked == [{"reason": "no_quote", "alert_id": str(alert_id)}]
+
+
+@pytest.mark.usefixtures("quote_at_alert_price")
+def test_live_order_audit_skips_the_savepoint_with_a_sink(monkeypatch, session, settings):
+    settings = settings.model_copy(update={"trading_mode": "live"})
+    emitted = []
+    monkeypatch.setattr(events, "_sink", SimpleNamespace(emit=lambda *event: emitted.append(event)))
+    alert_id, _ = _alert(session, "S")
+    savepoints = mock.Mock(wraps=session.begin_nested)
+    monkeypatch.setattr(session, "begin_nested", savepoints)
+
+    TradingService(session, settings, _Exchange()).execute_alert(alert_id)
+
+    savepoints.assert_not_called()
+    assert [event_type for event_type, _ in emitted] == ["live_order"]
@@ -0,0 +1,74 @@
+import os
+
+os.environ.setdefault("WEBHOOK_SECRET", "test")
+os.environ.setdefault("DB_URL", "sqlite:///./test.db")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+
+from app.services.volatility import VolatilityEngine  # noqa: E402
+
+
+def _candles(n: int, seed: int = 7) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    spread = closes * rng.uniform(0.001, 0.02, n)
+    return closes + spread, closes - spread, closes
+
+
+def test_vectorized_warm_matches_incremental_updates():
+    highs, lows, closes = _candles(500)
+    incremental = VolatilityEngine(window=14)
+    for high, low, close in zip(highs, lows, closes, strict=True):
+        incremental.update("BTC-USD", high, low, close)
+    batch = VolatilityEngine(window=14)
+    batch.warm("BTC-USD", highs, lows, closes)
+
+    a, b = incremental.snapshot("BTC-USD"), batch.snapshot("BTC-USD")
+    assert a.bars == b.bars == 500
+    assert b.atr == pytest.approx(a.atr, rel=1e-9)
+    assert b.ewma_vol == pytest.approx(a.ewma_vol, rel=1e-9)
+    assert b.realized_vol == pytest.approx(a.realized_vol, rel=1e-9)
+
+    # the warmed state keeps advancing identically
+    for engine in (incremental, batch):
+        engine.update("BTC-USD", 120.0, 95.0, 101.0)
+    assert batch.atr("BTC-USD") == pytest.approx(incremental.atr("BTC-USD"), rel=1e-9)
+
+
+def test_realized_vol_is_stdev_of_window_returns():
+    highs, lows, closes = _candles(60)
+    engine = VolatilityEngine(window=20)
+    for high, low, close in zip(highs, lows, closes, strict=True):
+        engine.update("ETH-USD", high, low, close)
+    returns = np.diff(np.log(closes))[-20:]
+    assert engine.snapshot("ETH-USD").realized_vol == pytest.approx(returns.std(ddof=1))
+
+
+def test_atr_needs_a_full_window():
+    engine = VolatilityEngine(window=3)
+    assert engine.atr("BTC-USD") is None
+    for close in (100.0, 101.0, 102.0):
+        engine.update("BTC-USD", close + 1, close - 1, close)
+    assert engine.atr("BTC-USD") is None
+    engine.update("BTC-USD", 104.0, 102.0, 103.0)
+    # seed: mean of the first bar's range and the next three true ranges, all 2.0
+    assert engine.atr("BTC-USD") == pytest.approx(2.0)
+
+
+def test_sync_follows_candle_store(tmp_path):
+    from app.services.candles import CandleStore, candles_from_rows
+
+    store = CandleStore(tmp_path)
+    rows = [(60 * i, c, c + 1, c - 1, c, 10) for i, c in enumerate(range(100, 130))]
+    store.append("BTC-USD", "1m", candles_from_rows(rows[:20]))
+    engine = VolatilityEngine(window=14, candles=store, granularity="1m")
+    assert engine.atr("BTC-USD") == pytest.approx(2.0)
+    assert engine.snapshot("BTC-USD").bars == 20
+
+    store.append("BTC-USD", "1m", candles_from_rows(rows[20:]))
+    assert engine.sync("BTC-USD") == 10
+    assert engine.snapshot("BTC-USD").bars == 30
+    assert engine.atr("ETH-USD") is None
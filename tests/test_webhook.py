@@ -13,8 +13,8 @@ os.environ.setdefault("INTERNAL_AUTH_TOKEN", "testtoken")
 
 from app.main import app  # noqa: E402
 from app.db.base import Base  # noqa: E402
-from app.db.session import engine, SessionLocal  # noqa: E402
-
+from app.db.session import engine, SessionLocal, _pool_options  # noqa: E402
+from app.workers import tasks  # noqa: E402
 
 Base.metadata.create_all(bind=engine)
 client = TestClient(app)
@@ -94,3 +94,124 @@ def test_webhook_duplicate_alert(monkeypatch):
 
     response2 = client.post("/webhook/tradingview", data=body, headers={"X-Signature": sign(body)})
     assert response2.json()["status"] == "duplicate"
+
+
+def test_daily_report_with_internal_token():
+    response = client.get("/reports/daily", headers={"X-Internal-Token": "testtoken"})
+    assert response.status_code == 200
+    assert isinstance(response.json(), list)
+
+
+def test_healthz_reports_db():
+    response = client.get("/healthz")
+    assert response.status_code == 200
+    assert response.json()["db"] == "ok"
+
+
+def test_webhook_batch_json_array(monkeypatch):
+    alerts = [
+        {
+            "id": "223e4567-e89b-12d3-a456-426614174001",
+            "symbol": "BTC-USD",
+            "side": "buy",
+            "price": 1,
+        },
+        {
+            "id": "223e4567-e89b-12d3-a456-426614174002",
+            "symbol": "SOL-USD",
+            "side": "sell",
+            "price": 2,
+        },
+        {
+            "id": "223e4567-e89b-12d3-a456-426614174001",
+            "symbol": "BTC-USD",
+            "side": "buy",
+            "price": 1,
+        },
+        {"symbol": "BTC-USD", "side": "buy"},
+    ]
+    body = json.dumps(alerts).encode()
+    send = mock.Mock(return_value=1)
+    monkeypatch.setattr("app.api.routes.send_trade_batches", send)
+
+    response = client.post(
+        "/webhook/tradingview/batch", content=body, headers={"X-Signature": sign(body)}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["status"] for item in data["results"]] == [
+        "queued",
+        "queued",
+        "duplicate",
+        "invalid",
+    ]
+    assert (data["queued"], data["duplicate"], data["invalid"]) == (2, 1, 1)
+    send.assert_called_once_with([(alerts[0]["id"], "BTC-USD"), (alerts[1]["id"], "SOL-USD")], 50)
+
+
+def test_webhook_batch_ndjson(monkeypatch):
+    lines = [
+        json.dumps(
+            {
+                "id": "223e4567-e89b-12d3-a456-426614174003",
+                "symbol": "BTC-USD",
+                "side": "buy",
+                "price": 1,
+            }
+        ),
+        "{not json",
+    ]
+    body = "\n".join(lines).encode()
+    send = mock.Mock(return_value=1)
+    monkeypatch.setattr("app.api.routes.send_trade_batches", send)
+
+    response = client.post(
+        "/webhook/tradingview/batch", content=body, headers={"X-Signature": sign(body)}
+    )
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["results"]] == ["queued", "invalid"]
+    send.assert_called_once()
+
+
+def test_trade_batches_share_one_producer(monkeypatch):
+    producer = mock.MagicMock()
+    acquire = mock.MagicMock()
+    acquire.return_value.__enter__.return_value = producer
+    apply_async = mock.Mock()
+    monkeypatch.setattr(tasks.celery_app, "producer_or_acquire", acquire)
+    monkeypatch.setattr(tasks.enqueue_trade_batch, "apply_async", apply_async)
+
+    items = [(f"id-{i}", "BTC-USD") for i in range(5)]
+    assert tasks.send_trade_batches(items, 2) == 3
+    acquire.assert_called_once_with()
+    assert [c.args for c in apply_async.call_args_list] == [
+        ((["id-0", "id-1"],), {"shard_key": "BTC-USD"}),
+        ((["id-2", "id-3"],), {"shard_key": "BTC-USD"}),
+        ((["id-4"],), {"shard_key": "BTC-USD"}),
+    ]
+    assert all(c.kwargs == {"producer": producer} for c in apply_async.call_args_list)
+
+
+def test_healthz_serves_cached_snapshot():
+    first = client.get("/healthz").json()
+    second = client.get("/healthz").json()
+    assert second["checked_at"] == first["checked_at"]
+    assert set(second["checks"]) == {"db", "redis", "broker"}
+    assert set(second["breakers"]) <= {"quote", "order", "account"}
+
+
+def test_metrics_label_routes_by_template():
+    client.get("/scanner/probe-8c1f2a")
+    client.get("/healthz")
+    text = client.get("/metrics").text
+    assert 'endpoint="unmatched"' in text
+    assert 'endpoint="/healthz"' in text
+    assert "probe-8c1f2a" not in text
+
+
+def test_async_engine_pool_options():
+    assert _pool_options("sqlite+aiosqlite://") == {}
+    assert set(_pool_options("postgresql+psycopg://bot@db/tradingbot")) == {
+        "pool_size",
+        "max_overflow",
+    }